@@ -0,0 +1,95 @@
+# backend/analysis/aggregate.py
+import re
+from typing import Optional, Dict, Any, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+# aggregation functions besides percentiles ("p90", "p25", ...)
+AGG_FUNCS = ("mean", "sum", "median", "min", "max", "count")
+
+_PERCENTILE_RE = re.compile(r"^p(\d{1,2}(?:\.\d+)?|100)$")
+
+
+def parse_agg(name: str) -> Tuple[str, Optional[float]]:
+    """
+    Normalize an aggregation name; percentiles ("p90") also return their quantile (0.9).
+    Raises ValueError for unknown names.
+    """
+    name = name.strip().lower()
+    if name in AGG_FUNCS:
+        return name, 0.5 if name == "median" else None
+    m = _PERCENTILE_RE.match(name)
+    if m:
+        return name, float(m.group(1)) / 100
+    raise ValueError(f"Unknown aggregation '{name}'. Use {', '.join(AGG_FUNCS)} or a percentile like p90.")
+
+
+def _sorted_quantile(values: np.ndarray, starts: np.ndarray, counts: np.ndarray, q: float) -> np.ndarray:
+    """
+    Linear-interpolated quantile of every group, for values sorted by (group, value)
+    with each group's non-missing values at values[starts[g]:starts[g] + counts[g]].
+    """
+    out = np.full(len(counts), np.nan)
+    has = counts > 0
+    pos = starts[has] + q * (counts[has] - 1)
+    lo = np.floor(pos).astype(np.int64)
+    hi = np.minimum(lo + 1, starts[has] + counts[has] - 1)
+    frac = pos - lo
+    out[has] = values[lo] + (values[hi] - values[lo]) * frac
+    return out
+
+
+def aggregate_metrics(keys: pd.Series, frame: pd.DataFrame, metrics: List[str], aggs: List[str]) -> Dict[str, Any]:
+    """
+    Aggregate every metric column of `frame` with every function in `aggs`, grouped by `keys`
+    (aligned with the frame's rows). Groups are factorized once; sums and counts come from
+    np.bincount and order statistics (min/max/median/percentiles) from one (group, value) sort
+    per metric, so no Python code runs per group. Returns series aligned on the sorted group labels:
+      { labels: [...], rows: [...], series: [{label, metric, agg, data}] }
+    Groups without values are None (sum and count give 0). Rows with a missing key are skipped.
+    """
+    parsed = [parse_agg(a) for a in aggs]
+    codes, uniques = pd.factorize(keys, sort=True)
+    n = len(uniques)
+    valid = codes >= 0
+    group_rows = np.bincount(codes[valid], minlength=n)
+
+    series = []
+    for metric in metrics:
+        values = pd.to_numeric(frame[metric], errors="coerce").to_numpy(dtype=float, na_value=np.nan)
+        ok = valid & ~np.isnan(values)
+        g, v = codes[ok], values[ok]
+        count = np.bincount(g, minlength=n)
+        total = np.bincount(g, weights=v, minlength=n)
+        ordered = starts = None
+        if any(q is not None or name in ("min", "max") for name, q in parsed):
+            # sort by value, then stably by group: faster than np.lexsort for small-int group codes
+            by_value = np.argsort(v)
+            ordered = v[by_value[np.argsort(g[by_value], kind="stable")]]
+            starts = np.cumsum(count) - count
+        for name, q in parsed:
+            if name == "sum":
+                data = total
+            elif name == "count":
+                data = count.astype(float)
+            elif name == "mean":
+                data = np.divide(total, count, out=np.full(n, np.nan), where=count > 0)
+            elif name == "min":
+                data = _sorted_quantile(ordered, starts, count, 0.0)
+            elif name == "max":
+                data = _sorted_quantile(ordered, starts, count, 1.0)
+            else:
+                data = _sorted_quantile(ordered, starts, count, q)
+            series.append({
+                "label": f"{metric} ({name})",
+                "metric": metric,
+                "agg": name,
+                "data": [None if np.isnan(x) else round(float(x), 4) for x in data],
+            })
+
+    return {
+        "labels": [str(u) for u in uniques],
+        "rows": group_rows.tolist(),
+        "series": series,
+    }
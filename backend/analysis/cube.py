@@ -0,0 +1,184 @@
+# backend/analysis/cube.py
+from typing import Optional, Dict, List
+
+import numpy as np
+import pandas as pd
+
+
+def _sum_by_year(year_idx: np.ndarray, values: np.ndarray, n_years: int) -> np.ndarray:
+    out = np.zeros(n_years, dtype=values.dtype)
+    np.add.at(out, year_idx, values)
+    return out
+
+
+class CubeBuilder:
+    """
+    Accumulates an AggregateCube chunk by chunk. Locality codes are assigned in
+    order of first appearance, exactly as pd.factorize would on the whole column.
+    """
+
+    def __init__(self, key_col: str, metrics: List[str]):
+        self.key_col = key_col
+        self.metrics = list(metrics)
+        self._localities: Dict[str, int] = {}
+        self._codes: List[np.ndarray] = []
+        self._partials: List[pd.DataFrame] = []
+        self._integral = {m: True for m in self.metrics}
+
+    def add(self, df: pd.DataFrame, years: pd.Series) -> "CubeBuilder":
+        keys = df[self.key_col].astype(str).str.lower()
+        chunk_codes, uniques = pd.factorize(keys)
+        mapping = np.empty(len(uniques), dtype=np.int64)
+        for i, value in enumerate(uniques):
+            mapping[i] = self._localities.setdefault(value, len(self._localities))
+        codes = np.where(chunk_codes >= 0, mapping[np.maximum(chunk_codes, 0)] if len(mapping) else -1, -1).astype(np.int64)
+        self._codes.append(codes)
+
+        values = pd.DataFrame({m: pd.to_numeric(df[m], errors="coerce") for m in self.metrics})
+        # integer metrics keep integer sums, as a groupby sum on the raw rows would
+        for m in self.metrics:
+            self._integral[m] = self._integral[m] and pd.api.types.is_integer_dtype(values[m].dtype)
+        year_values = pd.to_numeric(years, errors="coerce").astype("Int64").to_numpy(dtype="float64", na_value=np.nan)
+        valid = ~np.isnan(year_values)
+        grouped = values[valid].groupby([codes[valid], year_values[valid].astype(np.int64)], sort=True)
+        partial = pd.concat(
+            [grouped.sum(min_count=0).add_prefix("sum:"), grouped.count().add_prefix("count:"), grouped.size().rename("rows")],
+            axis=1,
+        )
+        self._partials.append(partial)
+        return self
+
+    def build(self) -> "AggregateCube":
+        codes = np.concatenate(self._codes) if self._codes else np.empty(0, dtype=np.int64)
+        if self._partials:
+            cells = pd.concat(self._partials)
+            if len(self._partials) > 1:
+                cells = cells.groupby(level=[0, 1], sort=True).sum()
+        else:
+            cells = pd.DataFrame()
+        localities = np.array(list(self._localities), dtype=object)
+
+        cell_codes = cells.index.get_level_values(0).to_numpy(dtype=np.int64) if len(cells) else np.empty(0, dtype=np.int64)
+        cell_years = cells.index.get_level_values(1).to_numpy(dtype=np.int64) if len(cells) else np.empty(0, dtype=np.int64)
+
+        def column(name: str, dtype: str) -> np.ndarray:
+            if name not in cells:
+                return np.zeros(len(cells), dtype=dtype)
+            return np.ascontiguousarray(cells[name].to_numpy(dtype=dtype))
+
+        return AggregateCube(
+            key_col=self.key_col,
+            metrics=self.metrics,
+            codes=codes,
+            localities=localities,
+            cell_codes=cell_codes,
+            cell_years=cell_years,
+            sums={m: column(f"sum:{m}", "int64" if self._integral[m] else "float64") for m in self.metrics},
+            counts={m: column(f"count:{m}", "int64") for m in self.metrics},
+            cell_rows=column("rows", "int64"),
+        )
+
+
+class AggregateCube:
+    """
+    Pre-aggregated (locality, year) cube of a dataset.
+    For every numeric metric it stores the sum and the non-null count of each
+    (locality, year) cell in contiguous arrays, sorted by locality so that the
+    cells of one locality form a contiguous slice. Means are recombined as
+    sum / count, so any union of whole localities can be charted without
+    touching the raw rows.
+    """
+
+    def __init__(self, key_col: str, metrics: List[str], codes: np.ndarray, localities: np.ndarray,
+                 cell_codes: np.ndarray, cell_years: np.ndarray, sums: Dict[str, np.ndarray],
+                 counts: Dict[str, np.ndarray], cell_rows: np.ndarray):
+        self.key_col = key_col
+        self.metrics = list(metrics)
+        self.codes = codes
+        self.localities = localities
+        # rows per locality including rows without a year, used to verify a selection is whole
+        self.group_sizes = np.bincount(codes + 1, minlength=len(localities) + 1)
+
+        self.cell_codes = cell_codes
+        self.cell_years = cell_years
+        self.years = np.unique(cell_years)
+        self.cell_year_idx = np.searchsorted(self.years, cell_years)
+        self.sums = sums
+        self.counts = counts
+        self.cell_rows = cell_rows
+
+        # CSR-style offsets: cells of locality code k are offsets[k+1]:offsets[k+2] (code -1 first)
+        self.offsets = np.searchsorted(cell_codes, np.arange(-1, len(localities) + 1))
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, key_col: str, years: pd.Series, metrics: List[str]) -> "AggregateCube":
+        return CubeBuilder(key_col, metrics).add(df, years).build()
+
+    def to_arrays(self) -> Dict[str, np.ndarray]:
+        """
+        Plain NumPy arrays (no pickled objects) for persisting the cube next to a dataset.
+        """
+        arrays = {
+            "key_col": np.array(self.key_col, dtype=str),
+            "metrics": np.array(self.metrics, dtype=str),
+            "codes": self.codes,
+            "localities": np.array(self.localities.tolist(), dtype=str),
+            "cell_codes": self.cell_codes,
+            "cell_years": self.cell_years,
+            "cell_rows": self.cell_rows,
+        }
+        for i, m in enumerate(self.metrics):
+            arrays[f"sums_{i}"] = self.sums[m]
+            arrays[f"counts_{i}"] = self.counts[m]
+        return arrays
+
+    @classmethod
+    def from_arrays(cls, arrays: Dict[str, np.ndarray]) -> "AggregateCube":
+        metrics = arrays["metrics"].tolist()
+        return cls(
+            key_col=str(arrays["key_col"]),
+            metrics=metrics,
+            codes=arrays["codes"],
+            localities=np.array(arrays["localities"].tolist(), dtype=object),
+            cell_codes=arrays["cell_codes"],
+            cell_years=arrays["cell_years"],
+            sums={m: arrays[f"sums_{i}"] for i, m in enumerate(metrics)},
+            counts={m: arrays[f"counts_{i}"] for i, m in enumerate(metrics)},
+            cell_rows=arrays["cell_rows"],
+        )
+
+    def codes_covering(self, positions: np.ndarray) -> Optional[np.ndarray]:
+        """
+        Return the locality codes whose rows are exactly `positions`, or None
+        when the selection contains only part of some locality (e.g. truncated by top).
+        """
+        selected = np.unique(self.codes[positions])
+        if int(self.group_sizes[selected + 1].sum()) != len(positions):
+            return None
+        return selected
+
+    def combine(self, codes: np.ndarray, price_col: Optional[str], demand_col: Optional[str]) -> Dict[str, List]:
+        """
+        Year-wise average of price_col and sum of demand_col over the given localities.
+        """
+        cells = np.concatenate([np.arange(self.offsets[c + 1], self.offsets[c + 2]) for c in codes]) if len(codes) else np.empty(0, dtype=np.int64)
+        year_idx = self.cell_year_idx[cells]
+        n_years = len(self.years)
+        present = _sum_by_year(year_idx, self.cell_rows[cells], n_years) > 0
+
+        if price_col in self.sums:
+            price_sum = _sum_by_year(year_idx, self.sums[price_col][cells], n_years)
+            price_cnt = _sum_by_year(year_idx, self.counts[price_col][cells], n_years)
+            price = np.divide(price_sum, price_cnt, out=np.zeros(n_years), where=price_cnt > 0)
+        else:
+            price = np.zeros(n_years)
+        if demand_col in self.sums:
+            demand = _sum_by_year(year_idx, self.sums[demand_col][cells], n_years)
+        else:
+            demand = np.zeros(n_years)
+
+        return {
+            "labels": [str(y) for y in self.years[present]],
+            "price": np.round(price[present], 4).tolist(),
+            "demand": np.round(demand[present], 4).tolist(),
+        }
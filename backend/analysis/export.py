@@ -0,0 +1,142 @@
+# backend/analysis/export.py
+import os
+import zlib
+import logging
+from typing import Iterator, Iterable, Dict, Tuple
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.DEBUG)
+
+# pyarrow is optional: only the parquet export needs it
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except Exception:
+    pa = None
+    pq = None
+
+EXPORT_CHUNK_ROWS = int(os.getenv("EXPORT_CHUNK_ROWS", "10000"))
+
+# format -> (content type, file extension)
+EXPORT_FORMATS: Dict[str, Tuple[str, str]] = {
+    "csv": ("text/csv", "csv"),
+    "csv.gz": ("application/gzip", "csv.gz"),
+    "ndjson": ("application/x-ndjson", "ndjson"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+}
+
+
+def _chunks(df: pd.DataFrame, positions: np.ndarray, chunk_rows: int) -> Iterator[pd.DataFrame]:
+    for start in range(0, len(positions), chunk_rows):
+        yield df.iloc[positions[start:start + chunk_rows]]
+
+
+def _iter_csv(chunks: Iterable[pd.DataFrame], empty: pd.DataFrame) -> Iterator[bytes]:
+    header = True
+    for chunk in chunks:
+        yield chunk.to_csv(index=False, header=header).encode("utf-8")
+        header = False
+    if header:
+        # nothing selected: still send the header row
+        yield empty.to_csv(index=False).encode("utf-8")
+
+
+def _iter_csv_gz(chunks: Iterable[pd.DataFrame], empty: pd.DataFrame) -> Iterator[bytes]:
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits=31 -> gzip container
+    for data in _iter_csv(chunks, empty):
+        out = compressor.compress(data)
+        if out:
+            yield out
+    yield compressor.flush()
+
+
+def _iter_ndjson(chunks: Iterable[pd.DataFrame], empty: pd.DataFrame) -> Iterator[bytes]:
+    for chunk in chunks:
+        text = chunk.to_json(orient="records", lines=True, date_format="iso")
+        if text and not text.endswith("\n"):
+            text += "\n"
+        yield text.encode("utf-8")
+
+
+class _DrainableSink:
+    """
+    Minimal writable file object that hands written bytes back to the generator.
+    """
+
+    def __init__(self):
+        self._parts = []
+        self.closed = False
+
+    def write(self, data) -> int:
+        self._parts.append(bytes(data))
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data = b"".join(self._parts)
+        self._parts = []
+        return data
+
+
+def _iter_parquet(chunks: Iterable[pd.DataFrame], empty: pd.DataFrame) -> Iterator[bytes]:
+    sink = _DrainableSink()
+    writer = None
+    try:
+        for chunk in chunks:
+            if writer is None:
+                table = pa.Table.from_pandas(chunk, preserve_index=False)
+                writer = pq.ParquetWriter(sink, table.schema)
+            else:
+                table = pa.Table.from_pandas(chunk, schema=writer.schema, preserve_index=False)
+            # one row group per chunk
+            writer.write_table(table)
+            data = sink.drain()
+            if data:
+                yield data
+        if writer is None:
+            writer = pq.ParquetWriter(sink, pa.Schema.from_pandas(empty, preserve_index=False))
+    finally:
+        if writer is not None:
+            writer.close()
+    yield sink.drain()
+
+
+def stream_export(df: pd.DataFrame, positions: np.ndarray, fmt: str = "csv", chunk_rows: int = EXPORT_CHUNK_ROWS) -> Iterator[bytes]:
+    """
+    Encode the rows of df at `positions` in the requested format, chunk by chunk.
+    Only one chunk of rows is materialized at a time, so memory does not grow with the export size.
+    """
+    return stream_export_chunks(_chunks(df, positions, max(1, chunk_rows)), df.iloc[:0], fmt)
+
+
+def check_export_format(fmt: str) -> None:
+    """
+    Raise ValueError if `fmt` is not an export format or its optional dependency is not installed.
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unsupported format '{fmt}'. Use one of: {', '.join(EXPORT_FORMATS)}")
+    if fmt == "parquet" and pq is None:
+        raise ValueError("Parquet export requires the pyarrow package.")
+
+
+def stream_export_chunks(chunks: Iterable[pd.DataFrame], empty: pd.DataFrame, fmt: str = "csv") -> Iterator[bytes]:
+    """
+    Encode a stream of row chunks (e.g. ingest.iter_columnar_rows) in the requested format.
+    `empty` is a zero-row frame with the export's columns, used when there are no chunks.
+    """
+    check_export_format(fmt)
+    encoder = {
+        "csv": _iter_csv,
+        "csv.gz": _iter_csv_gz,
+        "ndjson": _iter_ndjson,
+        "parquet": _iter_parquet,
+    }[fmt]
+    return encoder(chunks, empty)
@@ -0,0 +1,447 @@
+# backend/analysis/federation.py
+import os
+import re
+import json
+import time
+import tempfile
+import logging
+import threading
+import multiprocessing
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional, Dict, Any, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .ingest import convert_to_columnar, fresh_columnar_path, read_columnar, resolve_upload_path
+from .aggregate import parse_agg
+from .schema import profile_schema, column_signature, year_values
+from .response_cache import dataset_version
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.DEBUG)
+
+# manifests are updated read-modify-write; fcntl serializes appends across worker processes
+try:
+    import fcntl
+except Exception:
+    fcntl = None
+
+# processes that parse/convert/profile the files of a dataset being registered
+FEDERATION_WORKERS = int(os.getenv("FEDERATION_WORKERS", str(min(4, os.cpu_count() or 1))))
+# threads that load and filter the partitions of one query (reads are memory-mapped and release the GIL)
+FEDERATION_QUERY_THREADS = int(os.getenv("FEDERATION_QUERY_THREADS", "4"))
+# dataset manifests are small JSON files, so every worker process sees the same registry
+DATASETS_DIR = os.getenv("FEDERATION_DIR", os.path.join(tempfile.gettempdir(), "analysis_datasets"))
+
+_NAME_RE = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+_process_pool: Optional[ProcessPoolExecutor] = None
+_thread_pool: Optional[ThreadPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def _get_process_pool() -> ProcessPoolExecutor:
+    global _process_pool
+    with _pool_lock:
+        if _process_pool is None:
+            # spawn, not fork: the web worker holds threads and locks a forked child would inherit
+            _process_pool = ProcessPoolExecutor(max_workers=max(1, FEDERATION_WORKERS), mp_context=multiprocessing.get_context("spawn"))
+        return _process_pool
+
+
+def _get_thread_pool() -> ThreadPoolExecutor:
+    global _thread_pool
+    with _pool_lock:
+        if _thread_pool is None:
+            _thread_pool = ThreadPoolExecutor(max_workers=max(1, FEDERATION_QUERY_THREADS), thread_name_prefix="federation")
+        return _thread_pool
+
+
+def _city_keys(df: pd.DataFrame) -> Optional[pd.Series]:
+    profile = profile_schema(df)
+    if not profile.city_col:
+        return None
+    return df[profile.city_col].astype(str).str.strip().str.lower()
+
+
+def _numeric_years(df: pd.DataFrame) -> Optional[pd.Series]:
+    years = year_values(df)
+    return pd.to_numeric(years, errors="coerce") if years is not None else None
+
+
+def _year_stats(df: pd.DataFrame) -> Dict[str, Dict[str, Any]]:
+    """
+    Per-year row count and, for every aggregatable column, the sum and non-null count.
+    Sums of integer columns are kept as ints, so they stay exact when partitions are merged.
+    """
+    profile = profile_schema(df)
+    years = _numeric_years(df)
+    if years is None:
+        return {}
+    metrics = profile.aggregatable_cols
+    values = pd.DataFrame({m: pd.to_numeric(df[m], errors="coerce") for m in metrics}, index=df.index)
+    cast = {m: int if pd.api.types.is_integer_dtype(values[m]) else float for m in metrics}
+    grouped = values.groupby(years.astype("Int64").to_numpy(), sort=True, dropna=True)
+    sums, counts, rows = grouped.sum(min_count=0), grouped.count(), grouped.size()
+    return {
+        str(int(year)): {
+            "rows": int(rows[year]),
+            "sums": {m: cast[m](sums.at[year, m]) for m in metrics},
+            "counts": {m: int(counts.at[year, m]) for m in metrics},
+        }
+        for year in rows.index
+    }
+
+
+def profile_partition(path: str) -> Dict[str, Any]:
+    """
+    Convert one file to its columnar form (unless already converted) and record what partition
+    pruning and the dataset summary need: row count, column kinds, cities, localities, year
+    column, year range and per-year sums/counts. The locality index and cube of the file are
+    saved by the conversion. Runs in a worker process, so it only takes and returns plain data.
+    """
+    from .utils import load_dataset_from_path
+
+    if fresh_columnar_path(path) is None:
+        convert_to_columnar(path)
+    df = load_dataset_from_path(path, top=None, use_cache=False)
+    profile = profile_schema(df)
+    cities = _city_keys(df)
+    years = _numeric_years(df)
+    years = years.dropna() if years is not None else None
+    # values of every location column: a query is matched against all of them
+    localities = set()
+    for c in profile.location_cols:
+        localities.update(df[c].dropna().astype(str).str.strip().str.lower().unique().tolist())
+    return {
+        "path": path,
+        "rows": int(len(df)),
+        "columns": [str(c) for c in df.columns],
+        "kinds": dict(column_signature(df)),
+        "cities": sorted(cities.unique().tolist()) if cities is not None else None,
+        "localities": sorted(localities),
+        "year_min": int(years.min()) if years is not None and len(years) else None,
+        "year_max": int(years.max()) if years is not None and len(years) else None,
+        "year_col": str(years.name or "year") if years is not None else None,
+        "years": _year_stats(df),
+        "version": dataset_version(path),
+        "added_at": time.time(),
+    }
+
+
+def _empty_summary() -> Dict[str, Any]:
+    return {"rows": 0, "columns": {}, "years": {}, "localities": {}}
+
+
+def _merge_partition(summary: Dict[str, Any], part: Dict[str, Any], idx: int) -> None:
+    """
+    Fold one partition into a dataset summary in place: total rows, column profile (a column
+    whose kind differs between files becomes "mixed"), per-year sums/counts and the
+    locality -> partition numbers map. Touches only the partition's own statistics.
+    """
+    summary["rows"] += part["rows"]
+    for name, kind in part.get("kinds", {}).items():
+        known = summary["columns"].setdefault(name, kind)
+        if known != kind:
+            summary["columns"][name] = "mixed"
+    for year, stats in part.get("years", {}).items():
+        into = summary["years"].setdefault(year, {"rows": 0, "sums": {}, "counts": {}})
+        into["rows"] += stats["rows"]
+        for m, v in stats["sums"].items():
+            into["sums"][m] = into["sums"].get(m, 0) + v
+        for m, v in stats["counts"].items():
+            into["counts"][m] = into["counts"].get(m, 0) + v
+    for locality in part.get("localities", []):
+        summary["localities"].setdefault(locality, []).append(idx)
+
+
+def _build_summary(partitions: List[Dict[str, Any]]) -> Dict[str, Any]:
+    summary = _empty_summary()
+    for idx, part in enumerate(partitions):
+        _merge_partition(summary, part, idx)
+    return summary
+
+
+def _manifest_file(name: str) -> str:
+    return os.path.join(DATASETS_DIR, f"{name}.json")
+
+
+def _write_manifest(manifest: Dict[str, Any]) -> None:
+    os.makedirs(DATASETS_DIR, exist_ok=True)
+    target = _manifest_file(manifest["name"])
+    tmp_target = f"{target}.{threading.get_ident()}.tmp"
+    with open(tmp_target, "w") as fh:
+        json.dump(manifest, fh)
+    os.replace(tmp_target, target)
+
+
+@contextmanager
+def _manifest_lock(name: str):
+    os.makedirs(DATASETS_DIR, exist_ok=True)
+    with open(os.path.join(DATASETS_DIR, f".{name}.lock"), "w") as fh:
+        if fcntl is not None:
+            fcntl.flock(fh, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(fh, fcntl.LOCK_UN)
+
+
+def get_dataset(name: str) -> Optional[Dict[str, Any]]:
+    """
+    Return the manifest of a registered dataset, or None for an unknown name.
+    """
+    if not _NAME_RE.match(name or ""):
+        return None
+    try:
+        with open(_manifest_file(name)) as fh:
+            return json.load(fh)
+    except (OSError, ValueError):
+        return None
+
+
+def list_datasets() -> List[Dict[str, Any]]:
+    """
+    Registered datasets with their partition count and total rows.
+    """
+    try:
+        names = sorted(f[:-5] for f in os.listdir(DATASETS_DIR) if f.endswith(".json"))
+    except OSError:
+        return []
+    out = []
+    for name in names:
+        manifest = get_dataset(name)
+        if manifest:
+            parts = manifest["partitions"]
+            out.append({"name": name, "partitions": len(parts), "rows": sum(p["rows"] for p in parts)})
+    return out
+
+
+def register_dataset(name: str, paths: List[str]) -> Dict[str, Any]:
+    """
+    Group files (e.g. one IGR export per city and year) into one logical dataset.
+    Files are converted and profiled in parallel in a process pool; the manifest is
+    written once every partition is profiled. Registering an existing name replaces it.
+    Raises ValueError for an invalid name, a missing file or one outside the upload directory.
+    """
+    global _process_pool
+    if not _NAME_RE.match(name or ""):
+        raise ValueError("Dataset name must be 1-64 letters, digits, '-' or '_'.")
+    paths = list(dict.fromkeys(resolve_upload_path(p) for p in paths))
+    if not paths:
+        raise ValueError("A dataset needs at least one file.")
+
+    start = time.perf_counter()
+    if len(paths) == 1:
+        partitions = [profile_partition(paths[0])]
+    else:
+        pool = _get_process_pool()
+        try:
+            partitions = list(pool.map(profile_partition, paths))
+        except BrokenProcessPool:
+            # a worker died (e.g. out of memory); start a fresh pool for the next registration
+            with _pool_lock:
+                if _process_pool is pool:
+                    _process_pool = None
+            raise
+    manifest = {"name": name, "partitions": partitions, "summary": _build_summary(partitions), "created_at": time.time()}
+    with _manifest_lock(name):
+        _write_manifest(manifest)
+    logger.debug("Registered dataset %s: %d partitions profiled in %.2fs", name, len(partitions), time.perf_counter() - start)
+    return manifest
+
+
+def append_partition(name: str, path: str) -> Dict[str, Any]:
+    """
+    Add the rows of a new file (e.g. a monthly IGR update) to a registered dataset.
+    Only the new file is parsed, indexed and profiled, and its statistics are merged into
+    the dataset summary, so the cost follows the new rows, not the history; the other
+    partitions and their cached frames, indexes and cubes stay as they are.
+    Appending a path that is already a partition replaces it (the summary is then re-merged
+    from the stored partition statistics). Raises ValueError for an unknown dataset, a missing
+    file or one outside the upload directory.
+    """
+    if get_dataset(name) is None:
+        raise ValueError(f"Unknown dataset '{name}'.")
+    path = resolve_upload_path(path)
+
+    part = profile_partition(path)
+    with _manifest_lock(name):
+        manifest = get_dataset(name)
+        if manifest is None:
+            raise ValueError(f"Unknown dataset '{name}'.")
+        partitions = manifest["partitions"]
+        replaced = next((i for i, p in enumerate(partitions) if p["path"] == path), None)
+        if replaced is None:
+            summary = manifest.get("summary") or _build_summary(partitions)
+            _merge_partition(summary, part, len(partitions))
+            partitions.append(part)
+        else:
+            partitions[replaced] = part
+            summary = _build_summary(partitions)
+        manifest.update(summary=summary, updated_at=time.time())
+        _write_manifest(manifest)
+    logger.debug("Appended %s to dataset %s (%d rows, %d partitions)", path, name, part["rows"], len(partitions))
+    return manifest
+
+
+def _locality_partitions(manifest: Dict[str, Any], query: str) -> Optional[set]:
+    """
+    Numbers of the partitions that can hold rows for a locality query, from the summary's
+    locality -> partitions map: a partition is needed when one of its values contains a term of
+    the query or is contained in it, as in the index matching. None when any partition may
+    match: an empty query, or a term no recorded value matches (typo matching may still resolve it).
+    """
+    from .utils import is_comparison_query, parse_comparison_query
+
+    localities = (manifest.get("summary") or {}).get("localities")
+    q = (query or "").strip().lower()
+    if not q or not localities:
+        return None
+    # a comparison with no resolvable part falls back to matching the whole query
+    terms = [q] + ([p.lower() for p in parse_comparison_query(q)] if is_comparison_query(q) else [])
+    keep = set()
+    for term in terms:
+        hits = [parts for value, parts in localities.items() if term in value or value in term]
+        if not hits:
+            return None
+        for parts in hits:
+            keep.update(parts)
+    return keep
+
+
+def prune_partitions(manifest: Dict[str, Any], city: Optional[str] = None, year_from: Optional[int] = None,
+                     year_to: Optional[int] = None, query: str = "") -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """
+    Split a dataset's partitions into (those that can hold matching rows, pruned ones)
+    from the cities, year range and localities recorded at registration. Partitions without
+    city or year information are never pruned on that dimension.
+    """
+    city = city.strip().lower() if city else None
+    needed = _locality_partitions(manifest, query)
+    keep, pruned = [], []
+    for idx, part in enumerate(manifest["partitions"]):
+        ok = needed is None or idx in needed
+        if ok and city and part.get("cities") is not None:
+            ok = city in part["cities"]
+        if ok and year_from is not None and part.get("year_max") is not None:
+            ok = part["year_max"] >= year_from
+        if ok and year_to is not None and part.get("year_min") is not None:
+            ok = part["year_min"] <= year_to
+        (keep if ok else pruned).append(part)
+    return keep, pruned
+
+
+def _scan_partition(path: str, query: str, city: Optional[str], year_from: Optional[int], year_to: Optional[int]) -> pd.DataFrame:
+    from .utils import load_dataset_from_path, select_query
+
+    # the whole file: partitions are split by city / period, so their last rows are as relevant as the first
+    df = load_dataset_from_path(path, top=None)
+    mask = np.ones(len(df), dtype=bool)
+    if city:
+        cities = _city_keys(df)
+        if cities is not None:
+            mask &= (cities == city.strip().lower()).to_numpy()
+    if year_from is not None or year_to is not None:
+        years = _numeric_years(df)
+        if years is not None:
+            years = years.to_numpy(dtype=float, na_value=np.nan)
+            if year_from is not None:
+                mask &= years >= year_from
+            if year_to is not None:
+                mask &= years <= year_to
+    if query:
+        selected = np.zeros(len(df), dtype=bool)
+        selected[select_query(df, query, top=None)[2]] = True
+        mask &= selected
+    return df.iloc[np.flatnonzero(mask)]
+
+
+def federated_frame(manifest: Dict[str, Any], query: str = "", city: Optional[str] = None, year_from: Optional[int] = None,
+                    year_to: Optional[int] = None) -> Tuple[pd.DataFrame, Dict[str, Any]]:
+    """
+    Rows of a federated dataset matching a locality query, city and year range.
+    Only partitions that survive pruning (see prune_partitions) are loaded whole (through
+    the dataset cache) and filtered, in parallel; the matches are concatenated in partition order.
+    Returns (rows, {scanned, pruned}) with the partition paths of each.
+    """
+    keep, pruned = prune_partitions(manifest, city, year_from, year_to, query)
+    futures = [_get_thread_pool().submit(_scan_partition, p["path"], query, city, year_from, year_to) for p in keep]
+    frames = [f.result() for f in futures]
+    frames = [f for f in frames if len(f)]
+    if frames:
+        df = pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0].reset_index(drop=True)
+    else:
+        df = pd.DataFrame(columns=manifest["partitions"][0]["columns"] if manifest["partitions"] else [])
+    info = {"scanned": [p["path"] for p in keep], "pruned": [p["path"] for p in pruned]}
+    return df, info
+
+
+# aggregations that per-year sums and counts can answer
+SUMMARY_AGGS = ("mean", "sum", "count")
+
+
+def summary_aggregate(manifest: Dict[str, Any], metrics: List[str], aggs: List[str], year_from: Optional[int] = None,
+                      year_to: Optional[int] = None) -> Optional[Tuple[Dict[str, Any], int, pd.DataFrame]]:
+    """
+    The per-year aggregate of every row of a dataset (see utils.aggregate_by) answered from its
+    summary, without opening the partitions. Only the first partition's header is read, for the
+    default metrics and the table columns. Returns (aggregate, rows in the year range, zero-row
+    frame with the dataset's columns), or None when the summary cannot answer: other functions
+    than SUMMARY_AGGS, metrics without sums, or partitions whose columns differ.
+    """
+    parts = manifest["partitions"]
+    summary = manifest.get("summary")
+    aggs = [parse_agg(a)[0] for a in aggs] or ["mean"]
+    if not parts or not summary or any(a not in SUMMARY_AGGS for a in aggs):
+        return None
+    if any(p.get("kinds") != parts[0].get("kinds") or p.get("year_col") != parts[0].get("year_col") for p in parts):
+        return None
+    if parts[0].get("year_col") is None:
+        return None
+    columnar = fresh_columnar_path(parts[0]["path"])
+    if columnar is None:
+        return None
+    empty = read_columnar(columnar, 0)
+    profile = profile_schema(empty)
+    metrics = metrics or [c for c in (profile.price_col, profile.demand_col) if c]
+    missing = [m for m in metrics if m not in empty.columns]
+    if missing:
+        raise ValueError(f"Unknown metric column(s): {', '.join(missing)}")
+
+    years = sorted((int(y), stats) for y, stats in summary["years"].items()
+                   if (year_from is None or int(y) >= year_from) and (year_to is None or int(y) <= year_to))
+    if any(m not in stats["sums"] for m in metrics for _, stats in years):
+        return None
+    series = []
+    for metric in metrics:
+        # back in the column's dtype: integer sums are exact, as a scan of the partitions gives them
+        dtype = np.int64 if pd.api.types.is_integer_dtype(empty[metric]) else float
+        sums = np.array([stats["sums"].get(metric, 0) for _, stats in years], dtype=dtype)
+        counts = np.array([stats["counts"].get(metric, 0) for _, stats in years], dtype=float)
+        for name in aggs:
+            if name == "sum":
+                data = sums.astype(float)
+            elif name == "count":
+                data = counts
+            else:
+                data = np.divide(sums, counts, out=np.full(len(years), np.nan), where=counts > 0)
+            series.append({
+                "label": f"{metric} ({name})",
+                "metric": metric,
+                "agg": name,
+                "data": [None if np.isnan(x) else round(float(x), 4) for x in data],
+            })
+    aggregate = {
+        "group_by": "year",
+        "group_col": parts[0]["year_col"],
+        "labels": [str(y) for y, _ in years],
+        "rows": [stats["rows"] for _, stats in years],
+        "series": series,
+    }
+    rows = summary["rows"] if year_from is None and year_to is None else sum(stats["rows"] for _, stats in years)
+    return aggregate, rows, empty
@@ -0,0 +1,175 @@
+# backend/analysis/geo.py
+import os
+from typing import Optional, Dict, Any, List
+
+import numpy as np
+import pandas as pd
+
+# grid cell edge in degrees (0.01 deg is about 1.1 km of latitude)
+GEO_GRID_CELL_DEG = float(os.getenv("GEO_GRID_CELL_DEG", "0.01"))
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEG_LAT = EARTH_RADIUS_KM * np.pi / 180
+# no two points on the earth are farther apart than this
+MAX_DISTANCE_KM = EARTH_RADIUS_KM * np.pi
+
+
+def check_point(lat: float, lng: float) -> None:
+    """
+    Raise ValueError unless -90 <= lat <= 90 and -180 <= lng <= 180 (NaN and infinities fail).
+    """
+    if not (-90.0 <= lat <= 90.0 and -180.0 <= lng <= 180.0):
+        raise ValueError(f"Coordinates ({lat}, {lng}) are out of range: lat must be in [-90, 90] and lng in [-180, 180].")
+
+
+def check_radius(radius_km: float) -> None:
+    """
+    Raise ValueError unless radius_km is a positive, finite distance.
+    """
+    if not (0.0 < radius_km < np.inf):
+        raise ValueError(f"radius_km must be a positive number, got {radius_km}.")
+
+
+def haversine_km(lat1: float, lng1: float, lat2: np.ndarray, lng2: np.ndarray) -> np.ndarray:
+    lat1, lng1 = np.radians(lat1), np.radians(lng1)
+    lat2, lng2 = np.radians(lat2), np.radians(lng2)
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lng2 - lng1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+class GeoIndex:
+    """
+    One aggregated point per locality (mean coordinates, row count, average price and
+    total demand), indexed by a uniform lat/lng grid.
+    Points are sorted by grid cell id, so each grid row of a bounding box is one
+    contiguous slice found with two binary searches.
+    """
+
+    def __init__(self, labels: np.ndarray, lat: np.ndarray, lng: np.ndarray, rows: np.ndarray,
+                 price: np.ndarray, demand: np.ndarray, price_col: Optional[str], demand_col: Optional[str],
+                 cell_deg: float = GEO_GRID_CELL_DEG):
+        self.cell_deg = cell_deg
+        self.price_col = price_col
+        self.demand_col = demand_col
+        if len(lat):
+            self.lat0 = float(np.floor(lat.min() / cell_deg) * cell_deg)
+            self.lng0 = float(np.floor(lng.min() / cell_deg) * cell_deg)
+            self.n_cols = int((lng.max() - self.lng0) // cell_deg) + 1
+        else:
+            self.lat0 = self.lng0 = 0.0
+            self.n_cols = 1
+        cell_ids = self._cell_row(lat) * self.n_cols + self._cell_col(lng)
+        order = np.argsort(cell_ids, kind="stable")
+        self.cell_ids = cell_ids[order]
+        self.labels = labels[order]
+        self.lat = lat[order]
+        self.lng = lng[order]
+        self.rows = rows[order]
+        self.price = price[order]
+        self.demand = demand[order]
+        self._keys = {str(label).strip().lower(): i for i, label in enumerate(self.labels)}
+
+    def _cell_row(self, lat) -> np.ndarray:
+        return np.floor((np.asarray(lat, dtype=float) - self.lat0) / self.cell_deg).astype(np.int64)
+
+    def _cell_col(self, lng) -> np.ndarray:
+        return np.floor((np.asarray(lng, dtype=float) - self.lng0) / self.cell_deg).astype(np.int64)
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, key_col: str, lat_col: str, lng_col: str,
+                   price_col: Optional[str], demand_col: Optional[str]) -> "GeoIndex":
+        keys = df[key_col].astype(str).str.strip()
+        codes, _ = pd.factorize(keys.str.lower())
+        valid = codes >= 0
+        n = int(codes.max()) + 1 if valid.any() else 0
+        first = np.full(n, len(df), dtype=np.int64)
+        np.minimum.at(first, codes[valid], np.flatnonzero(valid))
+        labels = keys.to_numpy(dtype=object)[first] if n else np.empty(0, dtype=object)
+
+        def mean(col: Optional[str]) -> np.ndarray:
+            if col is None or col not in df.columns:
+                return np.full(n, np.nan)
+            values = pd.to_numeric(df[col], errors="coerce").to_numpy(dtype=float, na_value=np.nan)
+            ok = valid & ~np.isnan(values)
+            total = np.bincount(codes[ok], weights=values[ok], minlength=n)
+            count = np.bincount(codes[ok], minlength=n)
+            return np.divide(total, count, out=np.full(n, np.nan), where=count > 0)
+
+        def total(col: Optional[str]) -> np.ndarray:
+            if col is None or col not in df.columns:
+                return np.zeros(n)
+            values = pd.to_numeric(df[col], errors="coerce").to_numpy(dtype=float, na_value=np.nan)
+            ok = valid & ~np.isnan(values)
+            return np.bincount(codes[ok], weights=values[ok], minlength=n)
+
+        lat, lng = mean(lat_col), mean(lng_col)
+        located = ~np.isnan(lat) & ~np.isnan(lng)
+        rows = np.bincount(codes[valid], minlength=n)
+        price, demand = mean(price_col), total(demand_col)
+        return cls(labels[located], lat[located], lng[located], rows[located], price[located], demand[located],
+                   price_col, demand_col)
+
+    def __len__(self) -> int:
+        return len(self.labels)
+
+    def bbox(self, min_lat: float, min_lng: float, max_lat: float, max_lng: float) -> np.ndarray:
+        """
+        Positions of the points inside the bounding box. Corners must be valid coordinates (see check_point).
+        """
+        check_point(min_lat, min_lng)
+        check_point(max_lat, max_lng)
+        if not len(self) or min_lat > max_lat or min_lng > max_lng:
+            return np.empty(0, dtype=np.int64)
+        max_row = int(self.cell_ids[-1] // self.n_cols)
+        r0, r1 = max(int(self._cell_row(min_lat)), 0), min(int(self._cell_row(max_lat)), max_row)
+        c0, c1 = max(int(self._cell_col(min_lng)), 0), min(int(self._cell_col(max_lng)), self.n_cols - 1)
+        if r0 > r1 or c0 > c1:
+            return np.empty(0, dtype=np.int64)
+        rows = np.arange(r0, r1 + 1)
+        starts = np.searchsorted(self.cell_ids, rows * self.n_cols + c0, side="left")
+        ends = np.searchsorted(self.cell_ids, rows * self.n_cols + c1, side="right")
+        candidates = np.concatenate([np.arange(s, e) for s, e in zip(starts, ends) if e > s]) if len(rows) else np.empty(0, dtype=np.int64)
+        if not len(candidates):
+            return np.empty(0, dtype=np.int64)
+        lat, lng = self.lat[candidates], self.lng[candidates]
+        inside = (lat >= min_lat) & (lat <= max_lat) & (lng >= min_lng) & (lng <= max_lng)
+        return candidates[inside]
+
+    def radius(self, lat: float, lng: float, radius_km: float) -> np.ndarray:
+        """
+        Positions of the points within radius_km of (lat, lng), nearest first.
+        """
+        check_point(lat, lng)
+        check_radius(radius_km)
+        radius_km = min(radius_km, MAX_DISTANCE_KM)
+        dlat = radius_km / KM_PER_DEG_LAT
+        # meridians converge towards the poles: size the longitude span at the box edge farthest from the equator
+        widest = min(abs(lat) + dlat, 89.9)
+        dlng = min(radius_km / (KM_PER_DEG_LAT * np.cos(np.radians(widest))), 180.0)
+        candidates = self.bbox(max(lat - dlat, -90.0), max(lng - dlng, -180.0), min(lat + dlat, 90.0), min(lng + dlng, 180.0))
+        distance = haversine_km(lat, lng, self.lat[candidates], self.lng[candidates])
+        keep = distance <= radius_km
+        candidates, distance = candidates[keep], distance[keep]
+        return candidates[np.argsort(distance, kind="stable")]
+
+    def find(self, label: str) -> Optional[int]:
+        """
+        Position of the point of a locality (case-insensitive), or None.
+        """
+        return self._keys.get(str(label).strip().lower())
+
+    def points(self, positions: np.ndarray, origin: Optional[tuple] = None) -> List[Dict[str, Any]]:
+        distance = haversine_km(origin[0], origin[1], self.lat[positions], self.lng[positions]) if origin else None
+        out = []
+        for j, i in enumerate(positions):
+            point = {
+                "label": self.labels[i],
+                "lat": round(float(self.lat[i]), 6),
+                "lng": round(float(self.lng[i]), 6),
+                "rows": int(self.rows[i]),
+                "price": None if np.isnan(self.price[i]) else round(float(self.price[i]), 4),
+                "demand": round(float(self.demand[i]), 4),
+            }
+            if distance is not None:
+                point["distance_km"] = round(float(distance[j]), 3)
+            out.append(point)
+        return out
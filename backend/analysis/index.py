@@ -0,0 +1,333 @@
+# backend/analysis/index.py
+import re
+from bisect import bisect_right
+from collections import deque
+from typing import Optional, Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+
+class AhoCorasick:
+    """
+    Multi-pattern substring matcher. Finds every pattern occurring in a text
+    in O(len(text) + matches), independent of the number of patterns.
+    """
+
+    def __init__(self, patterns: List[str]):
+        self.patterns = patterns
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[List[int]] = [[]]
+        for i, p in enumerate(patterns):
+            node = 0
+            for ch in p:
+                nxt = self._goto[node].get(ch)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto[node][ch] = nxt
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append([])
+                node = nxt
+            self._out[node].append(i)
+
+        # breadth-first pass to wire failure links and merge outputs
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, nxt in self._goto[node].items():
+                queue.append(nxt)
+                f = self._fail[node]
+                while f and ch not in self._goto[f]:
+                    f = self._fail[f]
+                self._fail[nxt] = self._goto[f].get(ch, 0)
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+
+    def iter_matches(self, text: str):
+        """
+        Yield (end_position, pattern_index) for every pattern occurrence in text.
+        """
+        node = 0
+        for pos, ch in enumerate(text):
+            while node and ch not in self._goto[node]:
+                node = self._fail[node]
+            node = self._goto[node].get(ch, 0)
+            for i in self._out[node]:
+                yield pos, i
+
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+# values such as "196616.2021" or "1,250" are never locality names
+_NUMBER_RE = re.compile(r"[-+]?(?:\d[\d,]*)?\.?\d+(?:e[-+]?\d+)?")
+# longest run of query words compared with one location value
+MAX_FUZZY_WINDOW = 4
+
+
+def trigrams(text: str) -> set:
+    """
+    Character trigrams of every word of a lower-cased text, padded as in pg_trgm ("  w", " wa", ..., "d ").
+    """
+    grams = set()
+    for word in _WORD_RE.findall(text):
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+class TrigramIndex:
+    """
+    Inverted index from character trigrams to the distinct values containing them.
+    A lookup only touches the postings of the term's own trigrams, so typo-tolerant
+    matching does not compare the term with every value. Similarity is the Jaccard
+    index of the two trigram sets (shared / union), as in pg_trgm.
+    """
+
+    def __init__(self, values: List[str]):
+        self.values = values
+        grams = [trigrams(v) for v in values]
+        self.sizes = np.array([len(g) for g in grams], dtype=np.int64)
+        postings: Dict[str, List[int]] = {}
+        for vid, value_grams in enumerate(grams):
+            for gram in value_grams:
+                postings.setdefault(gram, []).append(vid)
+        self.postings = {gram: np.array(ids, dtype=np.intp) for gram, ids in postings.items()}
+
+    def scores(self, term: str) -> np.ndarray:
+        """
+        Similarity of `term` (lower-cased) to every value; 0 where no trigram is shared.
+        """
+        grams = trigrams(term)
+        hits = [self.postings[g] for g in grams if g in self.postings]
+        if not hits:
+            return np.zeros(len(self.values))
+        shared = np.bincount(np.concatenate(hits), minlength=len(self.values))
+        return shared / (self.sizes + len(grams) - shared)
+
+
+class SubstringIndex:
+    """
+    Inverted index from every 3-character substring to the values containing it.
+    A value contains a needle of 3+ characters only if it contains all of the needle's
+    substrings, so intersecting their postings (rarest first) leaves a few candidates
+    that are then checked with `in`, instead of scanning every value.
+    """
+
+    GRAM = 3
+    VERIFY_BELOW = 64
+
+    def __init__(self, values: List[str]):
+        self.values = values
+        postings: Dict[str, List[int]] = {}
+        for vid, value in enumerate(values):
+            for gram in {value[i:i + self.GRAM] for i in range(len(value) - self.GRAM + 1)}:
+                postings.setdefault(gram, []).append(vid)
+        self.postings = {gram: np.array(ids, dtype=np.intp) for gram, ids in postings.items()}
+
+    def containing(self, needle: str) -> List[int]:
+        """
+        Ascending ids of the values containing `needle`, which must be at least GRAM characters long.
+        """
+        grams = {needle[i:i + self.GRAM] for i in range(len(needle) - self.GRAM + 1)}
+        if not grams <= self.postings.keys():
+            return []
+        hits = sorted((self.postings[g] for g in grams), key=len)
+        candidates = hits[0]
+        for ids in hits[1:]:
+            # a few candidates are cheaper to check directly than another long posting is to intersect
+            if len(candidates) <= self.VERIFY_BELOW:
+                break
+            candidates = np.intersect1d(candidates, ids, assume_unique=True)
+        return [int(vid) for vid in candidates if needle in self.values[vid]]
+
+
+class LocalityIndexBuilder:
+    """
+    Accumulates a LocalityIndex chunk by chunk, so large files can be indexed while streaming.
+    """
+
+    def __init__(self, columns: List[str]):
+        self.columns = list(columns)
+        self.n_rows = 0
+        self._postings: Dict[str, List[np.ndarray]] = {}
+        self._originals: Dict[str, str] = {}
+
+    def add(self, df: pd.DataFrame) -> "LocalityIndexBuilder":
+        offset = self.n_rows
+        for c in self.columns:
+            if c not in df.columns:
+                continue
+            try:
+                keys = df[c].astype(str).str.lower()
+            except Exception:
+                continue
+            codes, uniques = pd.factorize(keys)
+            valid = codes >= 0
+            positions = np.flatnonzero(valid) + offset
+            order = np.argsort(codes[valid], kind="stable")
+            counts = np.bincount(codes[valid], minlength=len(uniques))
+            for value, rows in zip(uniques, np.split(positions[order], np.cumsum(counts)[:-1])):
+                self._postings.setdefault(value, []).append(rows)
+
+            for v in df[c].dropna().astype(str).unique():
+                stripped = v.strip()
+                if stripped and not _NUMBER_RE.fullmatch(stripped.lower()):
+                    self._originals.setdefault(stripped.lower(), stripped)
+        self.n_rows += len(df)
+        return self
+
+    def build(self) -> "LocalityIndex":
+        postings = [parts[0] if len(parts) == 1 else np.unique(np.concatenate(parts)) for parts in self._postings.values()]
+        return LocalityIndex(self.columns, list(self._postings), postings, self._originals, self.n_rows)
+
+
+class LocalityIndex:
+    """
+    Per-dataset index over the candidate location columns.
+    Holds the distinct lower-cased values of those columns mapped to sorted row positions,
+    plus an Aho-Corasick automaton over the stripped values for detecting a locality
+    inside a free-text query and a trigram index over them for misspelled ones.
+    Build once per DataFrame and reuse it across requests.
+    """
+
+    def __init__(self, columns: List[str], values: List[str], postings: List[np.ndarray], originals: Dict[str, str], n_rows: int):
+        self.columns = list(columns)
+        self.n_rows = n_rows
+        self.values: List[str] = values
+        self.postings: List[np.ndarray] = postings
+
+        # all values joined into one string: needles too short for the substring index run as one C-level scan
+        self._haystack = "\x00".join(self.values)
+        self._starts: List[int] = []
+        offset = 0
+        for v in self.values:
+            self._starts.append(offset)
+            offset += len(v) + 1
+
+        self._originals = originals
+        self._matcher = AhoCorasick(list(originals))
+        self._trigram_index: Optional[TrigramIndex] = None  # see trigram_index()
+        self._substring_index: Optional[SubstringIndex] = None  # see substring_index()
+        self._max_words = max((len(_WORD_RE.findall(k)) for k in originals), default=1)
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, columns: List[str]) -> "LocalityIndex":
+        return LocalityIndexBuilder(columns).add(df).build()
+
+    def to_arrays(self) -> Dict[str, np.ndarray]:
+        """
+        Plain NumPy arrays (no pickled objects) for persisting the index next to a dataset.
+        """
+        lengths = np.array([len(p) for p in self.postings], dtype=np.int64)
+        return {
+            "columns": np.array(self.columns, dtype=str),
+            "values": np.array(self.values, dtype=str),
+            "offsets": np.concatenate([[0], np.cumsum(lengths)]).astype(np.int64),
+            "positions": np.concatenate(self.postings).astype(np.int64) if self.postings else np.empty(0, dtype=np.int64),
+            "original_keys": np.array(list(self._originals), dtype=str),
+            "original_values": np.array(list(self._originals.values()), dtype=str),
+            "n_rows": np.array(self.n_rows, dtype=np.int64),
+        }
+
+    @classmethod
+    def from_arrays(cls, arrays: Dict[str, np.ndarray]) -> "LocalityIndex":
+        offsets = arrays["offsets"]
+        positions = arrays["positions"]
+        postings = [positions[offsets[i]:offsets[i + 1]] for i in range(len(offsets) - 1)]
+        originals = dict(zip(arrays["original_keys"].tolist(), arrays["original_values"].tolist()))
+        return cls(arrays["columns"].tolist(), arrays["values"].tolist(), postings, originals, int(arrays["n_rows"]))
+
+    def values_containing(self, needle: str) -> List[int]:
+        """
+        Return ids of the distinct values that contain `needle` as a substring, ascending.
+        Needles of SubstringIndex.GRAM characters or more are looked up in the substring index.
+        """
+        if not needle or "\x00" in needle:
+            return []
+        if len(needle) >= SubstringIndex.GRAM:
+            return self.substring_index().containing(needle)
+        found: List[int] = []
+        pos = self._haystack.find(needle)
+        while pos != -1:
+            vid = bisect_right(self._starts, pos) - 1
+            found.append(vid)
+            # resume scanning at the start of the next value
+            next_start = self._starts[vid + 1] if vid + 1 < len(self._starts) else len(self._haystack)
+            pos = self._haystack.find(needle, next_start)
+        return found
+
+    def rows_for_values(self, value_ids: List[int]) -> np.ndarray:
+        """
+        Sorted, de-duplicated row positions of the given value ids.
+        """
+        if not value_ids:
+            return np.empty(0, dtype=np.intp)
+        if len(value_ids) == 1:
+            return self.postings[value_ids[0]]
+        return np.unique(np.concatenate([self.postings[i] for i in value_ids]))
+
+    def originals_of(self, value_ids: List[int]) -> List[str]:
+        """
+        The distinct stripped dataset spellings of the given value ids, sorted.
+        """
+        found = {self._originals.get(self.values[i].strip()) for i in value_ids}
+        return sorted(v for v in found if v)
+
+    def rows_containing(self, needle: str) -> np.ndarray:
+        """
+        Row positions where any indexed column contains `needle` (already lower-cased).
+        """
+        return self.rows_for_values(self.values_containing(needle))
+
+    def detect(self, query: str) -> Optional[str]:
+        """
+        Find the longest known location value that appears inside the query.
+        Returns the stripped original value, or None.
+        """
+        if not query:
+            return None
+        best: Optional[Tuple[int, int]] = None  # (length, pattern index)
+        for _, i in self._matcher.iter_matches(query.lower()):
+            length = len(self._matcher.patterns[i])
+            if best is None or length > best[0]:
+                best = (length, i)
+        if best is None:
+            return None
+        return self._originals[self._matcher.patterns[best[1]]]
+
+    def trigram_index(self) -> TrigramIndex:
+        """
+        The TrigramIndex over the stripped values. Dataset loads build it up front
+        (see utils._load_and_index); other indexes build it on the first fuzzy lookup.
+        """
+        if self._trigram_index is None:
+            self._trigram_index = TrigramIndex(list(self._originals))
+        return self._trigram_index
+
+    def substring_index(self) -> SubstringIndex:
+        """
+        The SubstringIndex over the lower-cased values, built like trigram_index().
+        """
+        if self._substring_index is None:
+            self._substring_index = SubstringIndex(self.values)
+        return self._substring_index
+
+    def suggest(self, query: str, limit: int = 5, min_score: float = 0.3) -> List[Tuple[str, float]]:
+        """
+        Known location values resembling the query, for typo-tolerant matching ("wakadd" -> "Wakad").
+        Every run of up to MAX_FUZZY_WINDOW query words is scored against the trigram index and each
+        value keeps its best score. Returns up to `limit` (stripped original value, score) pairs
+        with score >= min_score, best first.
+        """
+        words = _WORD_RE.findall((query or "").lower())
+        if not words or not self._originals:
+            return []
+        index = self.trigram_index()
+        width = min(self._max_words, MAX_FUZZY_WINDOW)
+        best = np.zeros(len(index.values))
+        for size in range(1, width + 1):
+            for start in range(len(words) - size + 1):
+                np.maximum(best, index.scores(" ".join(words[start:start + size])), out=best)
+        candidates = np.flatnonzero(best >= min_score)
+        ranked = candidates[np.argsort(-best[candidates], kind="stable")][:limit]
+        return [(self._originals[index.values[i]], float(best[i])) for i in ranked]
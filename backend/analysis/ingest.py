@@ -0,0 +1,545 @@
+# backend/analysis/ingest.py
+import os
+import re
+import logging
+import tempfile
+from typing import Optional, List, Dict, Iterator, Any, Callable, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .index import LocalityIndex, LocalityIndexBuilder
+from .cube import AggregateCube, CubeBuilder
+from .schema import profile_schema, column_signature, year_values
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.DEBUG)
+
+# pyarrow is optional: without it uploads are simply re-parsed from the raw file
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.feather as feather
+except Exception:
+    pa = None
+    pc = None
+    feather = None
+
+COLUMNAR_SUFFIX = ".feather"
+DERIVED_SUFFIX = ".derived.npz"
+
+INGEST_CHUNK_ROWS = int(os.getenv("INGEST_CHUNK_ROWS", "50000"))
+INGEST_MAX_ROWS = int(os.getenv("INGEST_MAX_ROWS", "0")) or None  # 0 -> no limit
+# rows loaded for analysis; the locality index and cube are pre-built for this window
+ANALYSIS_MAX_ROWS = int(os.getenv("ANALYSIS_MAX_ROWS", "50000"))
+
+LOCATION_KEYWORDS = ("location", "area", "locality", "place", "city")
+
+# uploads are saved here; files registered into datasets must live under it
+UPLOAD_DIR = os.getenv("UPLOAD_DIR") or tempfile.gettempdir()
+
+# "10373-11465", "10,373 - 11,465", "10373 to 11465" or a single number
+_RANGE_SEPARATOR_RE = r"\s*(?:-|–)\s*|\s+to\s+"
+_RANGE_VALUE_RE = r"^\s*(?P<low>\d+(?:\.\d+)?)\s*(?:(?:-|–|\s+to\s+)\s*(?P<high>\d+(?:\.\d+)?))?\s*$"
+_RANGE_SUFFIX_RE = re.compile(r"\s*-?\s*range$", re.IGNORECASE)
+# values sampled, and the share of them that must parse, for a column to be split
+RANGE_SAMPLE_ROWS = 2000
+RANGE_MIN_MATCH = 0.9
+
+
+def resolve_upload_path(path: str) -> str:
+    """
+    The real path of an uploaded file. Raises ValueError if it does not resolve to a file under UPLOAD_DIR.
+    """
+    real = os.path.realpath(str(path))
+    root = os.path.realpath(UPLOAD_DIR)
+    if os.path.commonpath([real, root]) != root:
+        raise ValueError(f"File is not an upload: {path}")
+    if not os.path.isfile(real):
+        raise ValueError(f"File not found: {path}")
+    return real
+
+
+def columnar_path_for(path: str) -> str:
+    """
+    Path of the converted columnar file that sits next to an uploaded file.
+    """
+    return str(path) + COLUMNAR_SUFFIX
+
+
+def derived_path_for(columnar_path: str) -> str:
+    """
+    Path of the pre-built locality index / aggregate cube of a converted file.
+    """
+    return str(columnar_path) + DERIVED_SUFFIX
+
+
+def fresh_columnar_path(path: str) -> Optional[str]:
+    """
+    Return the converted file for `path` if it exists and is not older than the source.
+    """
+    if feather is None:
+        return None
+    converted = columnar_path_for(path)
+    try:
+        if os.stat(converted).st_mtime_ns >= os.stat(path).st_mtime_ns:
+            return converted
+    except OSError:
+        return None
+    return None
+
+
+def _location_columns(columns) -> List[str]:
+    return [c for c in columns if any(k in str(c).lower() for k in LOCATION_KEYWORDS)]
+
+
+def _parse_ranges(s: pd.Series) -> pd.DataFrame:
+    """
+    Vectorized parse of range strings into float columns low / high (NaN where a value does not parse).
+    Runs as one Arrow regex pass when pyarrow is installed, else as pandas string splits.
+    """
+    if pc is not None:
+        text = pc.replace_substring(pa.array(s.astype("string"), type=pa.string()), ",", "")
+        match = pc.extract_regex(text, _RANGE_VALUE_RE)
+
+        def number(field: str) -> np.ndarray:
+            part = pc.struct_field(match, field)
+            part = pc.if_else(pc.equal(part, ""), pa.scalar(None, pa.string()), part)
+            return pc.cast(part, pa.float64()).to_numpy(zero_copy_only=False)
+
+        low, high = number("low"), number("high")
+        return pd.DataFrame({"low": low, "high": np.where(np.isnan(high), low, high)}, index=s.index)
+
+    text = s.astype("string").str.replace(",", "", regex=False).str.replace(_RANGE_SEPARATOR_RE, "|", regex=True).str.strip()
+    parts = text.str.split("|", n=1, expand=True)
+    low = pd.to_numeric(parts[0], errors="coerce").astype("float64")
+    if parts.shape[1] < 2:
+        return pd.DataFrame({"low": low, "high": low}, index=s.index)
+    high = pd.to_numeric(parts[1], errors="coerce").astype("float64")
+    # "a-b-c" or "a-x" is not a range
+    low = low.mask((parts[1].notna() & high.isna()).to_numpy())
+    return pd.DataFrame({"low": low, "high": high.fillna(low)}, index=s.index)
+
+
+def _is_range_column(name: Any, s: pd.Series) -> bool:
+    """
+    Text columns holding numeric ranges: at least RANGE_MIN_MATCH of the sampled values must parse.
+    A column named "... range" may hold only single numbers; any other needs one real "low-high" value.
+    """
+    if pd.api.types.is_numeric_dtype(s) or pd.api.types.is_bool_dtype(s) or pd.api.types.is_datetime64_any_dtype(s):
+        return False
+    values = s.head(RANGE_SAMPLE_ROWS).dropna()
+    if values.empty:
+        return False
+    parts = _parse_ranges(values)
+    if parts["low"].notna().mean() < RANGE_MIN_MATCH:
+        return False
+    return "range" in str(name).lower() or bool((parts["high"] > parts["low"]).any())
+
+
+def range_column_names(name: Any) -> List[str]:
+    """
+    Names of the low / high / mid columns a range column is split into:
+    'flat - most prevailing rate - range' -> 'flat - most prevailing rate - low', ...
+    """
+    base = _RANGE_SUFFIX_RE.sub("", str(name)) or str(name)
+    return [f"{base} - low", f"{base} - high", f"{base} - mid"]
+
+
+def split_range_column(s: pd.Series) -> Dict[str, pd.Series]:
+    """
+    The low / high / mid float columns of one range column, keyed by their names.
+    """
+    parts = _parse_ranges(s)
+    mid = (parts["low"] + parts["high"]) / 2
+    return dict(zip(range_column_names(s.name), (parts["low"], parts["high"], mid)))
+
+
+def split_range_columns(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Replace every range column of a parsed frame by its low / high / mid float columns, in place of the original.
+    """
+    ranges = {c for c in df.columns if _is_range_column(c, df[c])}
+    if not ranges:
+        return df
+    out: Dict[Any, pd.Series] = {}
+    for c in df.columns:
+        if c in ranges:
+            out.update(split_range_column(df[c].rename(c)))
+        else:
+            out[c] = df[c]
+    return pd.DataFrame(out, index=df.index, copy=False)
+
+
+def normalize_year(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    A parsed frame with its "year" column as nullable Int64, the dtype converted files store it as.
+    Other columns are shared, not copied. A year column with fractions is left as it is.
+    """
+    if "year" not in df.columns or df["year"].dtype == "Int64":
+        return df
+    try:
+        year = pd.to_numeric(df["year"], errors="coerce").astype("Int64")
+    except (TypeError, ValueError):
+        return df
+    return df.assign(year=year)
+
+
+class _PlanMismatch(Exception):
+    """
+    A chunk holds values the planned dtype of `column` cannot represent; `target` fits them.
+    """
+
+    def __init__(self, column: Any, target: str):
+        super().__init__(f"column {column!r} does not fit its planned dtype; needs {target}")
+        self.column = column
+        self.target = target
+
+
+def _plan_dtypes(df: pd.DataFrame) -> Dict[str, str]:
+    """
+    Decide the target dtype of every column from the first chunk of an upload:
+      - year -> nullable Int64
+      - range strings such as '10373-11465' -> "range": low / high / mid float64 columns
+      - rate / sold metrics -> float64
+      - locality / city strings -> category
+      - other integers -> Int64, so later chunks with gaps keep the same type
+      - columns without any value yet -> string, so nothing is lost if text shows up later
+    A later chunk that does not fit (a decimal in an Int64 column, text in a numeric or boolean one)
+    raises _PlanMismatch from _apply_plan with the wider dtype to use instead.
+    """
+    locations = set(_location_columns(df.columns))
+    plan: Dict[str, str] = {}
+    for c in df.columns:
+        lc = str(c).lower()
+        s = df[c]
+        if lc == "year":
+            plan[c] = "Int64"
+        elif _is_range_column(c, s):
+            plan[c] = "range"
+        elif "rate" in lc or "sold" in lc:
+            plan[c] = "float64"
+        elif c in locations and not pd.api.types.is_numeric_dtype(s):
+            plan[c] = "category"
+        elif s.isna().all():
+            plan[c] = "string"
+        elif pd.api.types.is_bool_dtype(s):
+            plan[c] = "boolean"
+        elif pd.api.types.is_integer_dtype(s):
+            plan[c] = "Int64"
+        elif pd.api.types.is_numeric_dtype(s):
+            plan[c] = "float64"
+        elif pd.api.types.is_datetime64_any_dtype(s):
+            plan[c] = "datetime64[ns]"
+        else:
+            plan[c] = "string"
+    return plan
+
+
+def _coerce(column: Any, s: pd.Series, convert: Callable) -> pd.Series:
+    """
+    Convert a chunk column with errors="coerce", raising _PlanMismatch (to string) when that
+    would turn values into missing ones. The year column is exempt: loads coerce it anyway.
+    """
+    converted = convert(s, errors="coerce")
+    if str(column).lower() != "year" and (converted.isna() & s.notna()).any():
+        raise _PlanMismatch(column, "string")
+    return converted
+
+
+def _apply_plan(df: pd.DataFrame, plan: Dict[str, str]) -> pd.DataFrame:
+    """
+    Cast a chunk to the planned dtypes. Category columns are kept as strings here:
+    the dictionary differs per chunk, so they are only turned into categoricals on read.
+    Range columns become three float columns.
+    """
+    out = {}
+    for c, target in plan.items():
+        s = df[c] if c in df.columns else pd.Series(pd.NA, index=df.index)
+        if target == "Int64":
+            numeric = _coerce(c, s, pd.to_numeric)
+            if (numeric.notna() & (numeric % 1 != 0)).any():
+                raise _PlanMismatch(c, "float64")
+            out[c] = numeric.astype("Int64")
+        elif target == "float64":
+            out[c] = _coerce(c, s, pd.to_numeric).astype("float64")
+        elif target == "range":
+            out.update(split_range_column(s.rename(c)))
+        elif target == "datetime64[ns]":
+            out[c] = _coerce(c, s, pd.to_datetime)
+        elif target == "boolean":
+            try:
+                out[c] = s.astype("boolean")
+            except (TypeError, ValueError):
+                raise _PlanMismatch(c, "string") from None
+        else:
+            out[c] = s.astype("string")
+    return pd.DataFrame(out, index=df.index)
+
+
+def _as_loaded(chunk: pd.DataFrame, plan: Dict[str, str]) -> pd.DataFrame:
+    """
+    A cast chunk with the dtypes read_columnar will produce (category columns as categoricals).
+    """
+    cats = [c for c, target in plan.items() if target == "category"]
+    return chunk.astype({c: "category" for c in cats}) if cats else chunk
+
+
+def cast_ingest_dtypes(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Cast a whole parsed upload to the dtypes used by converted files (see _plan_dtypes).
+    """
+    plan = _plan_dtypes(df)
+    return _as_loaded(_apply_plan(df, plan), plan)
+
+
+def _excel_header(header) -> List[str]:
+    columns: List[str] = []
+    for i, h in enumerate(header):
+        name = f"Unnamed: {i}" if h is None else str(h)
+        # mirror pandas' de-duplication of repeated headers
+        base, n = name, 1
+        while name in columns:
+            name = f"{base}.{n}"
+            n += 1
+        columns.append(name)
+    return columns
+
+
+ProgressCallback = Callable[[Optional[float]], None]
+
+
+def _iter_xlsx_chunks(path: str, chunk_rows: int, row_limit: Optional[int], on_progress: Optional[ProgressCallback] = None) -> Iterator[pd.DataFrame]:
+    import openpyxl
+
+    wb = openpyxl.load_workbook(path, read_only=True, data_only=True)
+    try:
+        ws = wb.worksheets[0]
+        # the sheet dimension is only a hint in read-only mode; it may be missing
+        expected = (ws.max_row - 1) if ws.max_row else None
+        if expected and row_limit is not None:
+            expected = min(expected, row_limit)
+        rows = ws.iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        columns = _excel_header(header)
+        width = len(columns)
+        batch: List[tuple] = []
+        seen = 0
+        for row in rows:
+            if row_limit is not None and seen >= row_limit:
+                break
+            if all(v is None for v in row):
+                continue
+            row = tuple(row[:width]) + (None,) * (width - len(row))
+            batch.append(row)
+            seen += 1
+            if len(batch) >= chunk_rows:
+                if on_progress:
+                    on_progress(min(1.0, seen / expected) if expected else None)
+                yield pd.DataFrame(batch, columns=columns)
+                batch = []
+        if batch:
+            yield pd.DataFrame(batch, columns=columns)
+    finally:
+        wb.close()
+
+
+def iter_raw_chunks(path: str, chunk_rows: int = INGEST_CHUNK_ROWS, row_limit: Optional[int] = None,
+                    on_progress: Optional[ProgressCallback] = None) -> Iterator[pd.DataFrame]:
+    """
+    Stream an uploaded file as DataFrame chunks, stopping after row_limit rows.
+    CSV is read with pandas' chunked reader and XLSX with openpyxl's read-only mode.
+    on_progress, if given, receives the estimated fraction of the input consumed (or None).
+    """
+    lower = str(path).lower()
+    if lower.endswith(".csv"):
+        size = os.path.getsize(path) or 1
+        with open(path, "rb") as fh, pd.read_csv(fh, chunksize=chunk_rows, nrows=row_limit) as reader:
+            for chunk in reader:
+                if on_progress:
+                    on_progress(min(1.0, fh.tell() / size))
+                yield chunk
+    elif lower.endswith(".xlsx") or lower.endswith(".xlsm"):
+        yield from _iter_xlsx_chunks(path, chunk_rows, row_limit, on_progress)
+    else:
+        # legacy formats (.xls) cannot be streamed; read them in one go
+        df = pd.read_excel(path, nrows=row_limit)
+        for start in range(0, len(df), chunk_rows):
+            yield df.iloc[start:start + chunk_rows]
+
+
+class _DerivedBuilder:
+    """
+    Builds the locality index and aggregate cube over the first `window` rows of a stream.
+    """
+
+    def __init__(self, window: Optional[int]):
+        self.window = window
+        self.n_rows = 0
+        self.signature = None
+        self.index: Optional[LocalityIndexBuilder] = None
+        self.cube: Optional[CubeBuilder] = None
+
+    def add(self, chunk: pd.DataFrame) -> None:
+        if self.window is not None:
+            chunk = chunk.iloc[:max(0, self.window - self.n_rows)]
+        if len(chunk) == 0 and self.signature is not None:
+            return
+        if self.signature is None:
+            profile = profile_schema(chunk)
+            self.signature = column_signature(chunk)
+            self.index = LocalityIndexBuilder(list(profile.location_cols))
+            if profile.location_cols and year_values(chunk, profile) is not None:
+                self.cube = CubeBuilder(profile.location_cols[0], profile.aggregatable_cols)
+        self.index.add(chunk)
+        if self.cube is not None:
+            self.cube.add(chunk, year_values(chunk))
+        self.n_rows += len(chunk)
+
+    def save(self, target: str) -> None:
+        if self.signature is None:
+            return
+        arrays: Dict[str, np.ndarray] = {
+            "n_rows": np.array(self.n_rows, dtype=np.int64),
+            "signature": np.array([f"{name}\x1f{kind}" for name, kind in self.signature], dtype=str),
+        }
+        arrays.update({f"index__{k}": v for k, v in self.index.build().to_arrays().items()})
+        if self.cube is not None:
+            arrays.update({f"cube__{k}": v for k, v in self.cube.build().to_arrays().items()})
+        tmp_target = target + ".tmp.npz"
+        np.savez(tmp_target, **arrays)
+        os.replace(tmp_target, target)
+
+
+def _write_columnar(path: str, tmp_target: str, plan: Dict[str, str], row_limit: Optional[int], chunk_rows: int,
+                    progress: Optional[Callable[[int, Optional[float]], None]]) -> Tuple[int, Optional[_DerivedBuilder]]:
+    """
+    One pass of convert_to_columnar: cast every chunk to `plan` and write it to `tmp_target`.
+    An empty plan is filled in from the first chunk. Returns (rows, derived builder), with no
+    builder when the upload has no rows. Nothing is left at `tmp_target` when the pass fails.
+    """
+    schema = None
+    writer = None
+    derived = _DerivedBuilder(ANALYSIS_MAX_ROWS)
+    total = 0
+    fraction: List[Optional[float]] = [None]
+    try:
+        for raw in iter_raw_chunks(path, chunk_rows=chunk_rows, row_limit=row_limit, on_progress=lambda f: fraction.__setitem__(0, f)):
+            if not plan:
+                plan.update(_plan_dtypes(raw))
+            chunk = _apply_plan(raw, plan)
+            if writer is None:
+                schema = pa.Schema.from_pandas(chunk, preserve_index=False)
+                writer = pa.ipc.new_file(tmp_target, schema)
+            writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+            derived.add(_as_loaded(chunk.reset_index(drop=True), plan))
+            total += len(chunk)
+            if progress:
+                progress(total, fraction[0])
+    except BaseException:
+        # a failed pass leaves nothing behind; the raw upload is still served
+        if writer is not None:
+            writer.close()
+        if os.path.exists(tmp_target):
+            os.remove(tmp_target)
+        raise
+    if writer is None:
+        return 0, None
+    writer.close()
+    return total, derived
+
+
+def convert_to_columnar(path: str, row_limit: Optional[int] = INGEST_MAX_ROWS, chunk_rows: int = INGEST_CHUNK_ROWS,
+                        progress: Optional[Callable[[int, Optional[float]], None]] = None) -> Optional[str]:
+    """
+    Stream an uploaded CSV/XLSX into an uncompressed Feather (Arrow IPC) file next to it,
+    casting each chunk to fixed dtypes, so later loads can memory-map it instead of re-parsing.
+    The locality index and aggregate cube of the analysis window are built from the same
+    chunks and saved alongside. Memory stays bounded by the chunk size. When a later chunk
+    does not fit the dtypes planned from the first, the plan is widened and the file rewritten.
+    `progress(rows_so_far, fraction_or_None)` is called after every chunk.
+    Returns the converted path, or None when pyarrow is not installed.
+    """
+    if feather is None:
+        logger.debug("pyarrow not installed; skipping columnar conversion for %s", path)
+        return None
+
+    target = columnar_path_for(path)
+    tmp_target = target + ".tmp"
+    plan: Dict[str, str] = {}
+    while True:
+        try:
+            total, derived = _write_columnar(path, tmp_target, plan, row_limit, chunk_rows, progress)
+            break
+        except _PlanMismatch as e:
+            # a later chunk does not fit the plan taken from the first one: widen and start over
+            logger.debug("%s: %s; converting again", path, e)
+            plan[e.column] = e.target
+
+    if derived is None:
+        logger.debug("No rows found in %s; nothing converted", path)
+        return None
+    os.replace(tmp_target, target)
+    derived.save(derived_path_for(target))
+    logger.debug("Converted %s to columnar file %s (%d rows)", path, target, total)
+    return target
+
+
+def _columnar_to_pandas(table) -> pd.DataFrame:
+    categories = [c for c in _location_columns(table.column_names) if pa.types.is_string(table.schema.field(c).type) or pa.types.is_large_string(table.schema.field(c).type)]
+    return table.to_pandas(split_blocks=True, categories=categories)
+
+
+def read_columnar(path: str, top: Optional[int], columns: Optional[List[str]] = None) -> pd.DataFrame:
+    """
+    Memory-map a converted Feather file and return at most `top` rows (of `columns` only, if given).
+    Numeric columns without nulls are handed to pandas zero-copy, so their pages
+    live in the OS page cache and are shared by every worker process.
+    """
+    table = feather.read_table(path, columns=columns, memory_map=True)
+    if top is not None and table.num_rows > top:
+        table = table.slice(0, top)
+    return _columnar_to_pandas(table)
+
+
+def iter_columnar_rows(path: str, positions: np.ndarray, chunk_rows: int, like: Optional[pd.DataFrame] = None) -> Iterator[pd.DataFrame]:
+    """
+    The rows of a converted file at `positions`, as frames of at most chunk_rows rows
+    with read_columnar's dtypes. Only one chunk is materialized at a time.
+    Chunks take the categorical dtypes of `like`, so they all share the categories of the whole column.
+    """
+    table = feather.read_table(path, memory_map=True)
+    categories = {c: t for c, t in like.dtypes.items() if isinstance(t, pd.CategoricalDtype)} if like is not None else {}
+    for start in range(0, len(positions), chunk_rows):
+        chunk = _columnar_to_pandas(table.take(pa.array(positions[start:start + chunk_rows], type=pa.int64())))
+        yield chunk.astype(categories) if categories else chunk
+
+
+def load_derived(columnar_path: str, df: pd.DataFrame) -> Dict[str, Any]:
+    """
+    Load the locality index / aggregate cube saved by convert_to_columnar for a loaded frame.
+    Returns an empty dict when they are missing or were built for a different row window or schema.
+    """
+    target = derived_path_for(columnar_path)
+    try:
+        if os.stat(target).st_mtime_ns < os.stat(columnar_path).st_mtime_ns:
+            return {}
+        with np.load(target, allow_pickle=False) as data:
+            arrays = {k: data[k] for k in data.files}
+    except (OSError, ValueError):
+        return {}
+
+    signature = tuple(tuple(item.split("\x1f", 1)) for item in arrays["signature"].tolist())
+    if int(arrays["n_rows"]) != len(df) or signature != column_signature(df):
+        return {}
+    if arrays["index__columns"].tolist() != list(profile_schema(df).location_cols):
+        return {}  # indexed with an older choice of location columns
+    derived: Dict[str, Any] = {
+        "locality_index": LocalityIndex.from_arrays({k[len("index__"):]: v for k, v in arrays.items() if k.startswith("index__")}),
+    }
+    cube_arrays = {k[len("cube__"):]: v for k, v in arrays.items() if k.startswith("cube__")}
+    if cube_arrays:
+        derived["aggregate_cube"] = AggregateCube.from_arrays(cube_arrays)
+    return derived
@@ -0,0 +1,165 @@
+# backend/analysis/jobs.py
+import os
+import re
+import json
+import time
+import uuid
+import tempfile
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Dict, Any
+
+from .ingest import convert_to_columnar, ANALYSIS_MAX_ROWS
+from .federation import append_partition
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.DEBUG)
+
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "2"))
+# job records are small JSON files, so any gunicorn worker can answer a status poll
+JOBS_DIR = os.getenv("INGEST_JOBS_DIR", os.path.join(tempfile.gettempdir(), "analysis_jobs"))
+# progress is written at most this often (seconds); the final state is always written
+PROGRESS_INTERVAL = 0.5
+# records of finished (done / failed) jobs are deleted this many seconds after they finish
+INGEST_JOB_TTL = int(os.getenv("INGEST_JOB_TTL", "3600"))
+FINISHED_STATES = ("done", "failed")
+
+_JOB_ID_RE = re.compile(r"^[0-9a-f]{32}$")
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=max(1, INGEST_WORKERS), thread_name_prefix="ingest")
+        return _executor
+
+
+def _job_file(job_id: str) -> str:
+    return os.path.join(JOBS_DIR, f"{job_id}.json")
+
+
+def _write_job(job: Dict[str, Any]) -> None:
+    os.makedirs(JOBS_DIR, exist_ok=True)
+    target = _job_file(job["job_id"])
+    tmp_target = f"{target}.{threading.get_ident()}.tmp"
+    with open(tmp_target, "w") as fh:
+        json.dump(job, fh)
+    os.replace(tmp_target, target)
+
+
+def _expired(job: Dict[str, Any], now: float) -> bool:
+    return job.get("state") in FINISHED_STATES and now - (job.get("finished_at") or now) > INGEST_JOB_TTL
+
+
+def get_job(job_id: str) -> Optional[Dict[str, Any]]:
+    """
+    Return the current record of an ingestion job, or None for an unknown or expired id.
+    """
+    if not _JOB_ID_RE.match(job_id or ""):
+        return None
+    try:
+        with open(_job_file(job_id)) as fh:
+            job = json.load(fh)
+    except (OSError, ValueError):
+        return None
+    if _expired(job, time.time()):
+        purge_finished_jobs()
+        return None
+    return job
+
+
+def purge_finished_jobs() -> int:
+    """
+    Delete the records of jobs that finished more than INGEST_JOB_TTL seconds ago, and
+    temporary files left by interrupted writes. Returns the number of files removed.
+    """
+    now = time.time()
+    removed = 0
+    try:
+        names = os.listdir(JOBS_DIR)
+    except OSError:
+        return 0
+    for name in names:
+        path = os.path.join(JOBS_DIR, name)
+        try:
+            # a record written within the TTL cannot have finished before it
+            if now - os.stat(path).st_mtime <= INGEST_JOB_TTL:
+                continue
+            if name.endswith(".json"):
+                with open(path) as fh:
+                    if not _expired(json.load(fh), now):
+                        continue
+            elif not name.endswith(".tmp"):
+                continue
+            os.remove(path)
+            removed += 1
+        except (OSError, ValueError):
+            continue
+    if removed:
+        logger.debug("Removed %d finished ingestion job file(s) from %s", removed, JOBS_DIR)
+    return removed
+
+
+def _run_job(job: Dict[str, Any]) -> None:
+    from .utils import load_dataset_from_path
+
+    job.update(state="running", started_at=time.time())
+    _write_job(job)
+    last_write = [0.0]
+
+    def progress(rows: int, fraction: Optional[float]) -> None:
+        job["rows"] = rows
+        job["progress"] = round(fraction, 4) if fraction is not None else None
+        now = time.monotonic()
+        if now - last_write[0] >= PROGRESS_INTERVAL:
+            last_write[0] = now
+            _write_job(job)
+
+    try:
+        columnar_path = convert_to_columnar(job["path"], progress=progress)
+        job["columnar"] = bool(columnar_path)
+        # warm this worker's dataset cache: profile, locality index and cube of the analysis window
+        load_dataset_from_path(job["path"], top=ANALYSIS_MAX_ROWS)
+        if job.get("dataset"):
+            manifest = append_partition(job["dataset"], job["path"])
+            job["dataset_rows"] = manifest["summary"]["rows"]
+        job.update(state="done", progress=1.0)
+    except Exception as e:
+        logger.exception("Ingestion job %s failed for %s: %s", job["job_id"], job["path"], e)
+        job.update(state="failed", error=str(e))
+    job["finished_at"] = time.time()
+    _write_job(job)
+
+
+def submit_ingest(path: str, background: bool = True, dataset: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Start converting and indexing an uploaded file. Returns the job record.
+    With `dataset` the file is then appended to that registered dataset (see federation.append_partition).
+    With background=False the job runs in the calling thread and the returned record is final.
+    Records of jobs finished more than INGEST_JOB_TTL seconds ago are purged first.
+    """
+    purge_finished_jobs()
+    job: Dict[str, Any] = {
+        "job_id": uuid.uuid4().hex,
+        "path": path,
+        "state": "queued",
+        "rows": 0,
+        "progress": 0.0,
+        "columnar": False,
+        "dataset": dataset,
+        "error": None,
+        "created_at": time.time(),
+        "started_at": None,
+        "finished_at": None,
+    }
+    _write_job(job)
+    if background:
+        _get_executor().submit(_run_job, dict(job))
+    else:
+        _run_job(job)
+    return job
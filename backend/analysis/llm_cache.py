@@ -0,0 +1,140 @@
+# backend/analysis/llm_cache.py
+import os
+import time
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from typing import Optional, Callable, Dict, Any, Tuple
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.DEBUG)
+
+LLM_SUMMARY_CACHE_TTL = int(os.getenv("LLM_SUMMARY_CACHE_TTL", "3600"))
+LLM_SUMMARY_CACHE_MAX_ENTRIES = int(os.getenv("LLM_SUMMARY_CACHE_MAX_ENTRIES", "1024"))
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "15"))
+
+
+def prompt_key(prompt: str, model: str, max_tokens: int) -> str:
+    """
+    Cache key of an LLM call: identical aggregates produce identical prompts.
+    """
+    return hashlib.sha256(f"{model}\x00{max_tokens}\x00{prompt}".encode("utf-8")).hexdigest()
+
+
+class SummaryCache:
+    """
+    Thread-safe TTL + LRU cache of LLM summaries with request coalescing:
+    concurrent callers asking for the same key wait for the one upstream call in flight
+    instead of issuing their own. Failed calls (None) are shared with the waiters but not cached.
+    """
+
+    def __init__(self, max_entries: int = LLM_SUMMARY_CACHE_MAX_ENTRIES, ttl: float = LLM_SUMMARY_CACHE_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._inflight: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.failures = 0
+
+    def _lookup(self, key: str) -> Optional[str]:
+        item = self._entries.get(key)
+        if item is None:
+            return None
+        expires, value = item
+        if expires < time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def get_or_compute(self, key: str, compute: Callable[[], Optional[str]], wait_timeout: Optional[float] = None) -> Optional[str]:
+        """
+        Return the cached value for key, or run compute() once for all concurrent callers.
+        Callers that join an in-flight call give up after wait_timeout seconds and get None.
+        """
+        with self._lock:
+            value = self._lookup(key)
+            if value is not None:
+                self.hits += 1
+                return value
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._inflight[key] = future
+                self.misses += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            try:
+                return future.result(timeout=wait_timeout)
+            except FutureTimeout:
+                logger.warning("Timed out waiting for in-flight LLM call %s", key[:12])
+                return None
+
+        value = None
+        try:
+            value = compute()
+        except Exception as e:
+            logger.exception("LLM call failed: %s", e)
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+                self._store(key, value)
+            future.set_result(value)
+        return value
+
+    def _store(self, key: str, value: Optional[str]) -> None:
+        if not value:
+            self.failures += 1
+            return
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        Cached value for key, or None. Used by the async path, which coalesces on its own loop.
+        """
+        with self._lock:
+            value = self._lookup(key)
+            if value is not None:
+                self.hits += 1
+            return value
+
+    def put(self, key: str, value: Optional[str]) -> None:
+        """
+        Record the result of an upstream call made outside get_or_compute.
+        """
+        with self._lock:
+            self.misses += 1
+            self._store(key, value)
+
+    def note_coalesced(self) -> None:
+        with self._lock:
+            self.coalesced += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "inflight": len(self._inflight),
+                "hits": self.hits,
+                "misses": self.misses,
+                "coalesced": self.coalesced,
+                "failures": self.failures,
+            }
+
+
+summary_cache = SummaryCache()
@@ -0,0 +1,140 @@
+# backend/analysis/memory.py
+import os
+import logging
+from typing import Optional, Dict, Any, List
+
+import numpy as np
+import pandas as pd
+
+from .ingest import LOCATION_KEYWORDS
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.DEBUG)
+
+# Memory-optimized mode: loaded datasets are compacted (see compact_frame) before they are cached.
+DATASET_COMPACT = os.getenv("DATASET_COMPACT", "false").lower() in ("1", "true", "yes")
+# other string columns become categoricals when at most this share of their values is distinct
+COMPACT_CATEGORY_MAX_RATIO = float(os.getenv("COMPACT_CATEGORY_MAX_RATIO", "0.5"))
+
+_INT_TYPES = (np.int8, np.int16, np.int32, np.int64)
+
+
+def column_bytes(s: pd.Series) -> int:
+    return int(s.memory_usage(index=False, deep=True))
+
+
+def is_mapped(s: pd.Series) -> bool:
+    """
+    True when the column's values live in an Arrow buffer, i.e. a memory-mapped converted file
+    (see ingest.read_columnar). Those pages are shared by every worker, so they are left as they are.
+    """
+    if not isinstance(s.dtype, np.dtype) or s.dtype.kind not in "biuf":
+        return False
+    base = s.to_numpy(copy=False)
+    while isinstance(base, np.ndarray) and base.base is not None:
+        base = base.base
+    return not isinstance(base, np.ndarray)
+
+
+def _smallest_int(lo: int, hi: int, nullable: bool) -> str:
+    for t in _INT_TYPES:
+        info = np.iinfo(t)
+        if info.min <= lo and hi <= info.max:
+            break
+    name = np.dtype(t).name
+    return name.capitalize() if nullable else name
+
+
+def compact_dtype(name: Any, s: pd.Series) -> Optional[str]:
+    """
+    The dtype column `s` can be stored as without losing information, or None to keep it:
+      - locality / city strings, and other strings with few distinct values -> category
+      - year -> int16 (Int16 when some years are missing)
+      - other integers -> the smallest integer type holding their range
+    Floats stay float64: float32 aggregates would change the rounded chart values.
+    """
+    if len(s) == 0 or isinstance(s.dtype, pd.CategoricalDtype) or is_mapped(s):
+        return None
+    lname = str(name).lower()
+    if s.dtype == object or pd.api.types.is_string_dtype(s.dtype):
+        if any(k in lname for k in LOCATION_KEYWORDS):
+            return "category"
+        return "category" if s.nunique(dropna=True) <= len(s) * COMPACT_CATEGORY_MAX_RATIO else None
+    if pd.api.types.is_bool_dtype(s.dtype) or not pd.api.types.is_numeric_dtype(s.dtype):
+        return None
+
+    is_year = lname == "year"
+    if not (is_year or pd.api.types.is_integer_dtype(s.dtype)):
+        return None
+    values = s.dropna()
+    if values.empty:
+        return None
+    if not pd.api.types.is_integer_dtype(values.dtype) and not np.all(np.mod(values.to_numpy(dtype=np.float64), 1) == 0):
+        return None  # a float year column with fractions
+    nullable = len(values) < len(s) or not isinstance(s.dtype, np.dtype)
+    target = _smallest_int(int(values.min()), int(values.max()), nullable)
+    return target if target != str(s.dtype) else None
+
+
+def compact_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    A copy of df with every column stored as its compact_dtype. Unchanged columns are
+    shared with df rather than copied; df itself is returned when nothing can be compacted.
+    """
+    targets = {c: compact_dtype(c, df[c]) for c in df.columns}
+    if not any(targets.values()):
+        return df
+    columns = {c: df[c].astype(t) if t else df[c] for c, t in targets.items()}
+    return pd.DataFrame(columns, index=df.index, copy=False)
+
+
+def column_usage(df: pd.DataFrame) -> Dict[str, Dict[str, Any]]:
+    """
+    {column: {dtype, bytes, mapped}} of a frame; bytes count string payloads too.
+    """
+    return {str(c): {"dtype": str(df[c].dtype), "bytes": column_bytes(df[c]), "mapped": is_mapped(df[c])} for c in df.columns}
+
+
+def memory_report(df: pd.DataFrame, loaded: Optional[Dict[str, Dict[str, Any]]] = None) -> Dict[str, Any]:
+    """
+    Per-column memory use of a loaded frame and what the memory-optimized mode saves.
+    `loaded` is the column_usage recorded before the frame was compacted; without it each
+    column is compacted here, one at a time, to measure what the mode would save.
+    Memory-mapped columns are reported apart: their pages are shared between worker processes.
+    """
+    current = column_usage(df)
+    columns: List[Dict[str, Any]] = []
+    for c in df.columns:
+        now = current[str(c)]
+        if loaded is not None:
+            before = loaded.get(str(c), now)
+            original_dtype, original_bytes = before["dtype"], before["bytes"]
+            compact_dtype_name, compact_bytes = now["dtype"], now["bytes"]
+        else:
+            original_dtype, original_bytes = now["dtype"], now["bytes"]
+            target = compact_dtype(c, df[c])
+            compact_dtype_name = target or now["dtype"]
+            compact_bytes = column_bytes(df[c].astype(target)) if target else now["bytes"]
+        columns.append({
+            "column": str(c),
+            "dtype": original_dtype,
+            "bytes": original_bytes,
+            "compact_dtype": compact_dtype_name,
+            "compact_bytes": compact_bytes,
+            "mapped": now["mapped"],
+        })
+
+    original = sum(col["bytes"] for col in columns)
+    compact = sum(col["compact_bytes"] for col in columns)
+    mapped = sum(col["compact_bytes"] for col in columns if col["mapped"])
+    return {
+        "rows": len(df),
+        "compact": loaded is not None,
+        "bytes": original,
+        "compact_bytes": compact,
+        "saved_bytes": original - compact,
+        "saved_ratio": round(1 - compact / original, 4) if original else 0.0,
+        "mapped_bytes": mapped,
+        "private_bytes": compact - mapped,
+        "columns": columns,
+    }
@@ -0,0 +1,138 @@
+# backend/analysis/renderers.py
+import json
+import logging
+from typing import Any, Dict, List
+
+import numpy as np
+import pandas as pd
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.DEBUG)
+
+# optional fast/binary encoders: without them responses fall back to DRF's JSONRenderer
+try:
+    import orjson
+except Exception:
+    orjson = None
+
+try:
+    import msgpack
+except Exception:
+    msgpack = None
+
+try:
+    import pyarrow as pa
+except Exception:
+    pa = None
+
+
+def _default(obj: Any) -> Any:
+    """
+    Fallback for values the encoders do not handle natively (pandas scalars, object arrays).
+    """
+    if obj is pd.NA or obj is pd.NaT:
+        return None
+    if hasattr(obj, "tolist"):
+        return obj.tolist()
+    if hasattr(obj, "isoformat"):
+        return obj.isoformat()
+    raise TypeError(f"Type is not serializable: {type(obj).__name__}")
+
+
+def dumps(data: Any, sort_keys: bool = False) -> bytes:
+    """
+    Serialize to compact UTF-8 JSON. NumPy arrays and scalars are written straight from their
+    buffers by orjson; NaN becomes null. Without orjson the stdlib encoder is used.
+    """
+    if orjson is not None:
+        option = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+        if sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        return orjson.dumps(data, default=_default, option=option)
+    return json.dumps(data, default=_default, sort_keys=sort_keys, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+class ORJSONRenderer(JSONRenderer):
+    """
+    application/json through orjson with NumPy support (columnar table values stay arrays).
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        if orjson is None:
+            return super().render(data, accepted_media_type, renderer_context)
+        return dumps(data)
+
+
+class MessagePackRenderer(BaseRenderer):
+    """
+    application/msgpack: the same document as the JSON response in MessagePack.
+    """
+
+    media_type = "application/msgpack"
+    format = "msgpack"
+    charset = None
+    render_style = "binary"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        return msgpack.packb(data, default=_default, use_bin_type=True)
+
+
+def _arrow_column(values: Any) -> "pa.Array":
+    if isinstance(values, np.ndarray) and values.dtype != object:
+        return pa.array(values)
+    values = list(values)
+    try:
+        return pa.array(values)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        # the JSON table writes missing values as ""; give them back as nulls
+        try:
+            return pa.array([None if v == "" else v for v in values])
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            return pa.array([None if v == "" else str(v) for v in values], type=pa.string())
+
+
+def _table_columns(table: Any) -> Dict[str, Any]:
+    if isinstance(table, dict) and "columns" in table:
+        return dict(zip(table["columns"], table["values"]))
+    records: List[Dict[str, Any]] = table or []
+    columns = list(records[0]) if records else []
+    return {c: [r.get(c) for r in records] for c in columns}
+
+
+class ArrowIPCRenderer(BaseRenderer):
+    """
+    application/vnd.apache.arrow.stream: the table as one Arrow record batch; every other
+    field (mode, summary, chart, table_page, ...) is JSON in the schema metadata under "analysis".
+    """
+
+    media_type = "application/vnd.apache.arrow.stream"
+    format = "arrow"
+    charset = None
+    render_style = "binary"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        rest = {k: v for k, v in data.items() if k != "table"} if isinstance(data, dict) else {"data": data}
+        columns = _table_columns(data.get("table")) if isinstance(data, dict) else {}
+        arrays = [_arrow_column(v) for v in columns.values()]
+        schema = pa.schema([pa.field(str(name), arr.type) for name, arr in zip(columns, arrays)],
+                           metadata={"analysis": dumps(rest)})
+        batch = pa.record_batch(arrays, schema=schema)
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, schema) as writer:
+            writer.write_batch(batch)
+        return sink.getvalue().to_pybytes()
+
+
+# renderers offered by the analysis endpoints, chosen with the Accept header (JSON first = default)
+ANALYSIS_RENDERERS = [ORJSONRenderer]
+if msgpack is not None:
+    ANALYSIS_RENDERERS.append(MessagePackRenderer)
+if pa is not None:
+    ANALYSIS_RENDERERS.append(ArrowIPCRenderer)
@@ -0,0 +1,163 @@
+# backend/analysis/response_cache.py
+import os
+import re
+import time
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Optional, Dict, Any, Tuple
+
+from .renderers import dumps
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.DEBUG)
+
+# "local" (per-process LRU), "django" (settings.CACHES, shared between workers) or "off"
+ANALYZE_CACHE_BACKEND = os.getenv("ANALYZE_CACHE_BACKEND", "local").lower()
+ANALYZE_CACHE_ALIAS = os.getenv("ANALYZE_CACHE_ALIAS", "default")
+ANALYZE_CACHE_TTL = int(os.getenv("ANALYZE_CACHE_TTL", "600"))
+ANALYZE_CACHE_MAX_ENTRIES = int(os.getenv("ANALYZE_CACHE_MAX_ENTRIES", "512"))
+
+HASH_BLOCK_BYTES = 1 << 20
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+# path -> (mtime_ns, size, digest)
+_versions: Dict[str, Tuple[int, int, str]] = {}
+_versions_lock = threading.Lock()
+
+# (etag, payload)
+Entry = Tuple[str, Dict[str, Any]]
+
+
+def normalize_query(query: str) -> str:
+    """
+    Collapse runs of whitespace and trim. Case is kept: the payload echoes the query and the summary quotes it.
+    """
+    return _WHITESPACE_RE.sub(" ", query or "").strip()
+
+
+def dataset_version(path: str) -> str:
+    """
+    Content hash of a dataset file. Computed once per (mtime, size), so re-uploading
+    the same bytes under another name shares cache entries and an edited file does not.
+    """
+    st = os.stat(path)
+    with _versions_lock:
+        known = _versions.get(path)
+    if known and known[0] == st.st_mtime_ns and known[1] == st.st_size:
+        return known[2]
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as fh:
+        for block in iter(lambda: fh.read(HASH_BLOCK_BYTES), b""):
+            digest.update(block)
+    version = digest.hexdigest()
+    with _versions_lock:
+        _versions[path] = (st.st_mtime_ns, st.st_size, version)
+    return version
+
+
+def response_cache_key(query: str, top: int, use_llm: bool, version: str, variant: str = "") -> str:
+    """
+    `variant` distinguishes other response options of the same query (e.g. the table page).
+    """
+    q = hashlib.sha1(f"{normalize_query(query)}\x00{variant}".encode("utf-8")).hexdigest()
+    return f"analyze:{version}:{top}:{int(use_llm)}:{q}"
+
+
+def make_etag(payload: Dict[str, Any]) -> str:
+    return '"' + hashlib.blake2b(dumps(payload, sort_keys=True), digest_size=16).hexdigest() + '"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    True when an If-None-Match header names `etag` (weak comparison, "*" matches anything).
+    """
+    if not if_none_match:
+        return False
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag == "*" or tag.removeprefix("W/") == etag:
+            return True
+    return False
+
+
+class LocalResponseCache:
+    """
+    Per-process LRU of analyze responses with a TTL.
+    """
+
+    def __init__(self, max_entries: int = ANALYZE_CACHE_MAX_ENTRIES, ttl: int = ANALYZE_CACHE_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, Tuple[float, Entry]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Entry]:
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None:
+                return None
+            expires, entry = item
+            if expires < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key: str, entry: Entry) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, entry)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+class DjangoResponseCache:
+    """
+    Analyze responses stored through Django's cache framework (e.g. Redis or Memcached),
+    so every worker process shares them.
+    """
+
+    def __init__(self, alias: str = ANALYZE_CACHE_ALIAS, ttl: int = ANALYZE_CACHE_TTL):
+        self.alias = alias
+        self.ttl = ttl
+
+    @property
+    def _cache(self):
+        from django.core.cache import caches
+
+        return caches[self.alias]
+
+    def get(self, key: str) -> Optional[Entry]:
+        try:
+            value = self._cache.get(key)
+        except Exception as e:
+            logger.warning("Response cache read failed: %s", e)
+            return None
+        return tuple(value) if value else None
+
+    def set(self, key: str, entry: Entry) -> None:
+        try:
+            self._cache.set(key, entry, timeout=self.ttl)
+        except Exception as e:
+            logger.warning("Response cache write failed: %s", e)
+
+    def clear(self) -> None:
+        self._cache.clear()
+
+
+def _make_backend():
+    if ANALYZE_CACHE_BACKEND in ("off", "none", "0", "false"):
+        return None
+    if ANALYZE_CACHE_BACKEND == "django":
+        return DjangoResponseCache()
+    return LocalResponseCache()
+
+
+response_cache = _make_backend()
@@ -0,0 +1,154 @@
+# backend/analysis/schema.py
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Optional, Tuple, List, Dict, Any
+
+import pandas as pd
+
+Signature = Tuple[Tuple[str, str], ...]
+
+
+def _is_location_name(lc: str) -> bool:
+    return "location" in lc or "area" in lc or "locality" in lc or "final location" in lc or "place" in lc
+
+
+def _is_price_name(lc: str) -> bool:
+    return "price" in lc or "rate" in lc or "weighted average" in lc
+
+
+def _is_demand_name(lc: str) -> bool:
+    return "demand" in lc or "sold" in lc or "units" in lc or "total sold" in lc
+
+
+def _is_lat_name(lc: str) -> bool:
+    return lc in ("lat", "latitude") or lc.endswith("_lat") or lc.endswith(" lat")
+
+
+def _is_lng_name(lc: str) -> bool:
+    return lc in ("lng", "lon", "longitude") or lc.endswith("_lng") or lc.endswith("_lon") or lc.endswith(" lng")
+
+
+@dataclass(frozen=True)
+class SchemaProfile:
+    """
+    Column roles detected from a dataset's column names and dtypes.
+    Profiles are memoized by column signature, so every frame with the same
+    columns (including filtered slices) shares one instance.
+    """
+
+    columns: Tuple[str, ...]
+    location_cols: Tuple[str, ...]
+    label_col: Optional[str]  # column shown as the locality in summaries
+    year_col: Optional[str]
+    city_col: Optional[str]
+    datetime_col: Optional[str]
+    price_candidates: Tuple[str, ...]
+    demand_candidates: Tuple[str, ...]
+    lat_col: Optional[str]
+    lng_col: Optional[str]
+    numeric_cols: Tuple[str, ...]
+    kinds: Dict[str, str] = field(compare=False)
+
+    @property
+    def price_col(self) -> Optional[str]:
+        return self.price_candidates[0] if self.price_candidates else None
+
+    @property
+    def demand_col(self) -> Optional[str]:
+        return self.demand_candidates[0] if self.demand_candidates else None
+
+    @property
+    def metric_cols(self) -> List[str]:
+        """
+        Numeric columns that make sense to plot (year and coordinates excluded).
+        """
+        skip = {self.year_col, self.lat_col, self.lng_col}
+        return [c for c in self.numeric_cols if c not in skip]
+
+    @property
+    def aggregatable_cols(self) -> List[str]:
+        """
+        Columns pre-aggregated into the AggregateCube: numeric columns plus any price/demand candidates.
+        """
+        skip = {"year", self.year_col}
+        cols = dict.fromkeys(self.numeric_cols + self.price_candidates + self.demand_candidates)
+        return [c for c in cols if c not in skip]
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "location_cols": list(self.location_cols),
+            "year_col": self.year_col,
+            "city_col": self.city_col,
+            "price_col": self.price_col,
+            "demand_col": self.demand_col,
+            "lat_col": self.lat_col,
+            "lng_col": self.lng_col,
+            "numeric_columns": [{"key": c, "label": c} for c in self.metric_cols],
+        }
+
+
+def _dtype_kind(dtype) -> str:
+    if isinstance(dtype, pd.CategoricalDtype):
+        return "category"
+    if pd.api.types.is_bool_dtype(dtype):
+        return "bool"
+    if pd.api.types.is_numeric_dtype(dtype):
+        return "numeric"
+    if pd.api.types.is_datetime64_any_dtype(dtype):
+        return "datetime"
+    if dtype == object or pd.api.types.is_string_dtype(dtype):
+        return "string"
+    return "other"
+
+
+def column_signature(df: pd.DataFrame) -> Signature:
+    """
+    (column name, dtype kind) pairs; frames with equal signatures share a profile.
+    """
+    return tuple((str(c), _dtype_kind(dtype)) for c, dtype in df.dtypes.items())
+
+
+@lru_cache(maxsize=256)
+def _profile_for_signature(signature: Signature) -> SchemaProfile:
+    columns = tuple(name for name, _ in signature)
+    kinds = dict(signature)
+
+    # only text columns hold locality names ("total carpet area (sqft)" is a number)
+    location_cols = [c for c in columns if _is_location_name(c.lower()) and kinds[c] in ("string", "category")]
+    if not location_cols:
+        # fallback: any object/string columns
+        location_cols = [c for c in columns if kinds[c] in ("string", "category")]
+
+    return SchemaProfile(
+        columns=columns,
+        location_cols=tuple(location_cols),
+        label_col=next((c for c in columns if "location" in c.lower() or "area" in c.lower()), None),
+        year_col=next((c for c in columns if c.lower() == "year"), None),
+        city_col=next((c for c in columns if c.lower() == "city"), None),
+        datetime_col=next((c for c in columns if kinds[c] == "datetime"), None),
+        price_candidates=tuple(c for c in columns if _is_price_name(c.lower())),
+        demand_candidates=tuple(c for c in columns if _is_demand_name(c.lower())),
+        lat_col=next((c for c in columns if _is_lat_name(c.lower())), None),
+        lng_col=next((c for c in columns if _is_lng_name(c.lower())), None),
+        numeric_cols=tuple(c for c in columns if kinds[c] == "numeric"),
+        kinds=kinds,
+    )
+
+
+def profile_schema(df: pd.DataFrame) -> SchemaProfile:
+    """
+    Return the SchemaProfile for a DataFrame.
+    """
+    return _profile_for_signature(column_signature(df))
+
+
+def year_values(df: pd.DataFrame, profile: Optional[SchemaProfile] = None) -> Optional[pd.Series]:
+    """
+    The values charts are grouped by: the year column, or the year of the first datetime column.
+    """
+    profile = profile or profile_schema(df)
+    if "year" in df.columns or profile.year_col:
+        return df["year" if "year" in df.columns else profile.year_col]
+    if profile.datetime_col:
+        return pd.to_datetime(df[profile.datetime_col], errors="coerce").dt.year
+    return None
@@ -1,3 +1,1362 @@
-from django.test import TestCase
+import os
+import asyncio
+import json
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+import pandas as pd
+from django.test import AsyncClient, Client, SimpleTestCase
+
+from .federation import federated_frame, register_dataset, append_partition
+from benchmarks import pipeline
+from benchmarks.async_vs_wsgi import _asgi_get
+from benchmarks.stub_llm import StubLLMHandler, start_stub_llm
+
+from . import export, federation, ingest, jobs, timing, utils, views
+from .aggregate import aggregate_metrics, parse_agg
+from .export import stream_export
+from .ingest import ANALYSIS_MAX_ROWS, columnar_path_for, convert_to_columnar, fresh_columnar_path, iter_columnar_rows, read_columnar, load_derived, split_range_columns
+from .index import LocalityIndex
+from .llm_cache import summary_cache
+from .response_cache import dataset_version, response_cache, response_cache_key
+from .schema import profile_schema, year_values
+from .utils import (
+    locality_index, did_you_mean, select_query, select_query_on_disk, extract_area_from_query_using_values, filter_by_area,
+    DatasetCache, load_dataset_from_path, dataset_cache, aggregate_cube, aggregate_for_chart, aggregate_selection,
+    generate_llm_summary, generate_llm_summary_async, resolve_localities, aggregate_comparison, table_records, table_page,
+)
+
+
+def _igr_frame() -> pd.DataFrame:
+    """
+    A small IGR-shaped frame: six localities over four years, plus numeric columns whose names
+    contain location keywords ("area") and whose values look like years.
+    """
+    localities = ["Wakad", "Hinjewadi", "Akurdi", "Ambegaon Budruk", "Aundh", "Baner"]
+    rows = []
+    for i, year in enumerate((2020, 2021, 2022, 2023)):
+        for j, loc in enumerate(localities):
+            rows.append({
+                "final location": loc,
+                "year": year,
+                "city": "Pune",
+                "total carpet area supplied (sqft)": 196616.2021 + 1000 * i + j,
+                "flat - weighted average rate": 9000.0 + 100 * j + 10 * i,
+                "total sold - igr": 50.0 + j + i,
+            })
+    return pd.DataFrame(rows)
+
+
+class DatasetCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+        self.path = os.path.join(self.dir.name, "upload.csv")
+        _igr_frame().to_csv(self.path, index=False)
+        self.loads = 0
+
+    def _loader(self, path: str):
+        def load():
+            self.loads += 1
+            return pd.read_csv(path)
+        return load
+
+    def test_hits_return_the_same_frame(self):
+        cache = DatasetCache()
+        first = cache.get_or_load(self.path, 100, self._loader(self.path))
+        self.assertIs(cache.get_or_load(self.path, 100, self._loader(self.path)), first)
+        cache.get_or_load(self.path, None, self._loader(self.path))
+        self.assertEqual(self.loads, 2)
+        stats = cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"], stats["entries"]), (1, 2, 2))
+        self.assertEqual(stats["hit_ratio"], round(1 / 3, 4))
+
+    def test_changed_mtime_or_size_invalidates(self):
+        cache = DatasetCache()
+        first = cache.get_or_load(self.path, 100, self._loader(self.path))
+        st = os.stat(self.path)
+        os.utime(self.path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000))
+        second = cache.get_or_load(self.path, 100, self._loader(self.path))
+        self.assertIsNot(second, first)
+
+        _igr_frame().head(6).to_csv(self.path, index=False)
+        os.utime(self.path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000))  # same mtime, new size
+        third = cache.get_or_load(self.path, 100, self._loader(self.path))
+        self.assertEqual(len(third), 6)
+        stats = cache.stats()
+        self.assertEqual((stats["invalidations"], stats["misses"], stats["entries"]), (2, 3, 1))
+
+    def test_least_recently_used_entries_are_evicted(self):
+        cache = DatasetCache(max_entries=2)
+        for top in (1, 2):
+            cache.get_or_load(self.path, top, self._loader(self.path))
+        cache.get_or_load(self.path, 1, self._loader(self.path))
+        cache.get_or_load(self.path, 3, self._loader(self.path))
+        self.assertEqual([e["top"] for e in cache.entries()], [1, 3])
+        self.assertEqual(cache.stats()["evictions"], 1)
+
+    def test_byte_budget(self):
+        nbytes = int(pd.read_csv(self.path).memory_usage(index=True, deep=True).sum())
+        cache = DatasetCache(max_bytes=nbytes * 3 // 2)
+        cache.get_or_load(self.path, 1, self._loader(self.path))
+        cache.get_or_load(self.path, 2, self._loader(self.path))
+        self.assertEqual([e["top"] for e in cache.entries()], [2])
+        self.assertEqual(cache.stats()["bytes"], nbytes)
+
+        small = DatasetCache(max_bytes=nbytes - 1)
+        small.get_or_load(self.path, 1, self._loader(self.path))
+        self.assertEqual(small.entries(), [])
+
+    def test_loads_share_the_process_cache(self):
+        dataset_cache.clear()
+        self.addCleanup(dataset_cache.clear)
+        before = dataset_cache.stats()
+        df = load_dataset_from_path(self.path, top=10)
+        self.assertIs(load_dataset_from_path(self.path, top=10), df)
+        self.assertIsNot(load_dataset_from_path(self.path, top=10, use_cache=False), df)
+        after = Client().get("/api/cache/stats/").json()
+        self.assertEqual((after["hits"] - before["hits"], after["misses"] - before["misses"]), (1, 1))
+        self.assertEqual(after["entries"], 1)
+
+
+class SchemaProfileTests(SimpleTestCase):
+    def test_column_roles(self):
+        df = _igr_frame().assign(loc_lat=18.5, loc_lng=73.8)
+        profile = profile_schema(df)
+        self.assertEqual(profile.location_cols, ("final location",))
+        self.assertEqual((profile.label_col, profile.year_col, profile.city_col), ("final location", "year", "city"))
+        self.assertEqual((profile.price_col, profile.demand_col), ("flat - weighted average rate", "total sold - igr"))
+        self.assertEqual((profile.lat_col, profile.lng_col), ("loc_lat", "loc_lng"))
+        self.assertEqual(profile.metric_cols, ["total carpet area supplied (sqft)", "flat - weighted average rate", "total sold - igr"])
+
+    def test_profiles_are_shared_by_signature(self):
+        df = _igr_frame()
+        profile = profile_schema(df)
+        self.assertIs(profile_schema(df[df["final location"] == "Wakad"]), profile)
+        self.assertEqual(profile_schema(df.astype({"final location": "category"})).location_cols, profile.location_cols)
+        self.assertIsNot(profile_schema(df.assign(year=df["year"].astype(str))), profile)
+
+    def test_string_columns_are_the_location_fallback(self):
+        df = pd.DataFrame({"name": ["Wakad", "Aundh"], "units": [1, 2]})
+        self.assertEqual(profile_schema(df).location_cols, ("name",))
+        self.assertIsNone(profile_schema(df).label_col)
+
+    def test_year_values_come_from_a_datetime_column(self):
+        df = pd.DataFrame({"registered on": pd.to_datetime(["2021-03-01", "2023-07-15"]), "area": ["Wakad", "Aundh"]})
+        self.assertEqual(year_values(df).tolist(), [2021, 2023])
+        self.assertIsNone(year_values(df[["area"]]))
+
+    def test_schema_view_returns_the_profile(self):
+        d = tempfile.TemporaryDirectory()
+        self.addCleanup(d.cleanup)
+        path = os.path.join(d.name, "upload.csv")
+        _igr_frame().to_csv(path, index=False)
+        dataset = Client().get("/api/schema/", {"file": path}).json()["dataset"]
+        self.assertEqual(dataset["location_cols"], ["final location"])
+        self.assertEqual([c["key"] for c in dataset["numeric_columns"]], profile_schema(_igr_frame()).metric_cols)
+
+
+class FuzzyLocalityTests(SimpleTestCase):
+    def setUp(self):
+        self.df = _igr_frame()
+
+    def test_numeric_columns_are_not_location_columns(self):
+        self.assertEqual(profile_schema(self.df).location_cols, ("final location",))
+        index = locality_index(self.df)
+        self.assertEqual(index.columns, ["final location"])
+        self.assertNotIn("196616.2021", index.values)
+
+    def test_number_tokens_are_not_localities(self):
+        df = self.df.copy()
+        df.loc[0, "final location"] = "2021"
+        index = locality_index(df)
+        self.assertIsNone(index.detect("show me 2021 data"))
+        self.assertEqual(did_you_mean(df, "show me 2023 data"), [])
+
+    def test_typo_is_matched_to_the_closest_locality(self):
+        _, _, positions = select_query(self.df, "hinjawadi", top=None)
+        self.assertEqual(set(self.df.iloc[positions]["final location"]), {"Hinjewadi"})
+        hints = did_you_mean(self.df, "hinjawadi")
+        self.assertEqual(hints[0]["matched"], "Hinjewadi")
+
+    def test_suggestions_rank_localities_above_numbers(self):
+        hints = did_you_mean(self.df, "wakda 2021")
+        self.assertEqual(hints[0]["candidates"][0]["locality"], "Wakad")
+        self.assertTrue(all(not c["locality"].replace(".", "").isdigit() for h in hints for c in h["candidates"]))
+
+    def test_exact_match_has_no_suggestions(self):
+        self.assertEqual(did_you_mean(self.df, "Give me analysis of Wakad"), [])
+
+
+class SubstringIndexTests(SimpleTestCase):
+    def test_matches_a_linear_scan(self):
+        values = ["wakad", "hinjewadi phase 1", "akurdi", "ambegaon budruk", "aundh", "baner", "pimple saudagar", "wakad road", "2021", "a"]
+        index = LocalityIndex(["final location"], values, [np.array([i]) for i in range(len(values))], {}, len(values))
+        for needle in ["wakad", "ad", "a", "d", "kad r", "phase 1", "budruk", "aundhh", "xyz", "ner", "20", "021", "wakad road!"]:
+            self.assertEqual(index.values_containing(needle), [i for i, v in enumerate(values) if needle in v], needle)
+        self.assertEqual(index.values_containing(""), [])
+
+    def test_lookup_among_many_values(self):
+        values = [f"locality {i:05d}" for i in range(2000)] + ["wakad"]
+        index = LocalityIndex(["final location"], values, [np.array([i]) for i in range(len(values))], {}, len(values))
+        self.assertEqual(index.values_containing("00042"), [42])
+        self.assertEqual(index.values_containing("wak"), [2000])
+        self.assertEqual(index.values_containing("ty 00123"), [123])
+
+
+def _reference_extract_area(df: pd.DataFrame, query: str):
+    """
+    The original scan: the longest location value contained in the query.
+    """
+    if not query:
+        return None
+    q = query.lower()
+    values = set()
+    for c in profile_schema(df).location_cols:
+        for v in df[c].dropna().astype(str).unique():
+            if v.strip():
+                values.add(v.strip())
+    for val in sorted(values, key=lambda s: -len(s)):
+        if val.lower() in q:
+            return val
+    return None
+
+
+def _reference_filter_by_area(df: pd.DataFrame, query: str, top: int = 200) -> pd.DataFrame:
+    """
+    The original row scan: substring match of the whole query, else of the detected value.
+    """
+    q = (query or "").strip().lower()
+    if not q:
+        return df.head(top)
+    cols = profile_schema(df).location_cols
+
+    def containing(needle):
+        mask = np.zeros(len(df), dtype=bool)
+        for c in cols:
+            mask |= df[c].astype(str).str.lower().str.contains(needle, na=False, regex=False).to_numpy()
+        return df[mask].head(top)
+
+    filtered = containing(q)
+    if filtered.empty:
+        detected = _reference_extract_area(df, query)
+        if detected:
+            filtered = containing(detected.strip().lower())
+    return filtered
+
+
+class AreaMatchingTests(SimpleTestCase):
+    """
+    The indexed matching must select exactly what the original row scans selected.
+    """
+
+    QUERIES = [
+        "Wakad",                                    # exact value
+        "ambegaon",                                 # substring of two values
+        "Compare price trends of Ambegaon Budruk",  # multi-word query, value detected inside it
+        "Show price growth for Akurdi over the last 3 years",
+        "WAKAD", "aMbEgAoN bUdRuK",                 # case differences
+        "xyz",                                      # no match
+        "",                                         # empty query: first rows
+    ]
+
+    def setUp(self):
+        df = _igr_frame()
+        extra = df[df["final location"] == "Ambegaon Budruk"].assign(**{"final location": "Ambegaon Khurd"})
+        self.df = pd.concat([df, extra], ignore_index=True)
+
+    def test_extract_area_matches_reference(self):
+        for query in self.QUERIES:
+            with self.subTest(query=query):
+                self.assertEqual(extract_area_from_query_using_values(self.df, query), _reference_extract_area(self.df, query))
+
+    def test_filter_by_area_matches_reference(self):
+        for query in self.QUERIES:
+            for top in (200, 3):
+                with self.subTest(query=query, top=top):
+                    expected = _reference_filter_by_area(self.df, query, top=top)
+                    got = filter_by_area(self.df, query, top=top)
+                    self.assertEqual(list(got.index), list(expected.index))
+                    self.assertEqual(list(got.columns), list(self.df.columns))
+
+    def test_no_match_is_empty(self):
+        self.assertTrue(filter_by_area(self.df, "xyz").empty)
+
+    def test_comparison_labels_are_dataset_values(self):
+        for query, labels in (("compare wakad and AUNDH", ["Wakad", "Aundh"]),
+                              ("compare  ambegaon budruk ,  akurdi ", ["Ambegaon Budruk", "Akurdi"]),
+                              ("compare ambegaon and baner", ["Ambegaon Budruk / Ambegaon Khurd", "Baner"]),
+                              ("compare hinjawadi vs wakad", ["Hinjewadi", "Wakad"])):
+            with self.subTest(query=query):
+                localities = resolve_localities(self.df, query)
+                self.assertEqual([label for label, _ in localities], labels)
+                comparison = aggregate_comparison(self.df, localities, price_col="flat - weighted average rate", demand_col="total sold - igr")
+                self.assertEqual([series["label"] for series in comparison["price"]], labels)
+
+    def test_label_of_a_query_in_many_values(self):
+        df = self.df.copy()
+        df["final location"] = df["final location"].where(df["final location"] != "Baner", "Ambegaon " + df["year"].astype(str))
+        label, _ = resolve_localities(df, "compare ambegaon and wakad")[0]
+        self.assertEqual(label, "Ambegaon 2020 / Ambegaon 2021 / Ambegaon 2022 (+3 more)")
+
+
+class TableRecordsTests(SimpleTestCase):
+    def test_records_match_object_conversion(self):
+        df = _igr_frame()
+        df["final location"] = df["final location"].astype("category")
+        df.loc[[1, 5], "final location"] = np.nan
+        df.loc[[2, 3], "flat - weighted average rate"] = np.nan
+        df["year"] = df["year"].astype("Int64")
+        df.loc[4, "year"] = pd.NA
+        df["city"] = df["city"].astype("str")
+        df.loc[6, "city"] = np.nan
+        df["resale"] = df.index % 2 == 0
+        df["registered"] = pd.to_datetime("2023-01-01") + pd.to_timedelta(df.index, unit="D")
+        df.loc[7, "registered"] = pd.NaT
+
+        for limit in (0, 5, 500):
+            with self.subTest(limit=limit):
+                head = df.head(limit).astype(object)
+                expected = head.where(head.notna(), "").to_dict(orient="records")
+                got = table_records(df, limit=limit)
+                self.assertEqual(got, expected)
+                self.assertEqual([[type(v) for v in row.values()] for row in got], [[type(v) for v in row.values()] for row in expected])
+
+        columnar, _ = table_page(df, limit=10, fmt="columnar")
+        records, _ = table_page(df, limit=10)
+        self.assertEqual([dict(zip(columnar["columns"], row)) for row in zip(*(list(v) for v in columnar["values"]))], records)
+
+
+class TablePageTests(SimpleTestCase):
+    def test_pages_cover_every_row_once(self):
+        df = _igr_frame()
+        rows, offset = [], 0
+        while offset is not None:
+            table, info = table_page(df, offset=offset, limit=10)
+            self.assertEqual((info["total"], info["limit"], len(table)), (24, 10, min(10, 24 - offset)))
+            rows.extend(table)
+            offset = info["next_offset"]
+        self.assertEqual(rows, table_records(df, limit=24))
+        self.assertEqual(table_page(df, offset=30, limit=10)[0], [])
+
+    def test_projection_and_formats(self):
+        df = _igr_frame()
+        cols = ["year", "final location"]
+        records, info = table_page(df, offset=2, limit=3, columns=cols)
+        self.assertEqual(records, [{"year": 2020, "final location": loc} for loc in ("Akurdi", "Ambegaon Budruk", "Aundh")])
+        self.assertEqual(info["columns"], cols)
+        columnar, info = table_page(df, offset=2, limit=3, columns=cols, fmt="columnar")
+        self.assertEqual(columnar["columns"], cols)
+        self.assertEqual([list(v) for v in columnar["values"]], [[2020] * 3, ["Akurdi", "Ambegaon Budruk", "Aundh"]])
+        self.assertEqual(info["format"], "columnar")
+
+    def test_invalid_options(self):
+        df = _igr_frame()
+        for kwargs in ({"columns": ["nope"]}, {"fmt": "xml"}, {"offset": -1}, {"limit": -5}):
+            with self.subTest(**kwargs), self.assertRaises(ValueError):
+                table_page(df, **kwargs)
+        with mock.patch.object(utils, "TABLE_MAX_PAGE_ROWS", 4):
+            self.assertEqual(table_page(df, limit=500)[1]["limit"], 4)
+
+    def test_analyze_pages(self):
+        d = tempfile.TemporaryDirectory()
+        self.addCleanup(d.cleanup)
+        path = os.path.join(d.name, "upload.csv")
+        _igr_frame().to_csv(path, index=False)
+        client = Client()
+        params = {"file": path, "query": "", "top": 24, "offset": 20, "limit": 10, "columns": "final location,year"}
+        body = client.get("/api/analyze/", {**params, "table_format": "columnar"}).json()
+        self.assertEqual(body["table"]["columns"], ["final location", "year"])
+        self.assertEqual(body["table"]["values"][1], [2023] * 4)
+        self.assertEqual((body["table_page"]["total"], body["table_page"]["next_offset"]), (24, None))
+        for bad in ({"columns": "nope"}, {"table_format": "xml"}, {"offset": "x"}):
+            with self.subTest(**bad):
+                self.assertEqual(client.get("/api/analyze/", {**params, **bad}).status_code, 400)
+
+
+class ColumnarConversionTests(SimpleTestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+        self.path = os.path.join(self.dir.name, "upload.csv")
+        _igr_frame().to_csv(self.path, index=False)
+
+    def test_loads_read_the_converted_file(self):
+        dataset_cache.clear()
+        self.addCleanup(dataset_cache.clear)
+        raw = load_dataset_from_path(self.path, top=None, use_cache=False)
+        target = convert_to_columnar(self.path)
+        self.assertEqual(fresh_columnar_path(self.path), target)
+
+        df = load_dataset_from_path(self.path, top=10)
+        self.assertEqual([e["path"] for e in dataset_cache.entries()], [target])
+        self.assertEqual(len(df), 10)
+        self.assertEqual(df["final location"].dtype, "category")
+        self.assertEqual(df["flat - weighted average rate"].dtype, np.float64)
+        pd.testing.assert_frame_equal(df, raw.head(10), check_dtype=False, check_categorical=False)
+
+    def test_stale_converted_file_is_ignored(self):
+        target = convert_to_columnar(self.path)
+        _igr_frame().head(6).to_csv(self.path, index=False)
+        st = os.stat(target)
+        os.utime(self.path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000))
+        self.assertIsNone(fresh_columnar_path(self.path))
+        self.assertEqual(len(load_dataset_from_path(self.path, top=None, use_cache=False)), 6)
+
+    def test_failed_conversion_leaves_no_files(self):
+        def fail(rows, fraction):
+            raise RuntimeError("interrupted")
+
+        with self.assertRaises(RuntimeError):
+            convert_to_columnar(self.path, chunk_rows=5, progress=fail)
+        self.assertEqual(os.listdir(self.dir.name), ["upload.csv"])
+        self.assertFalse(os.path.exists(columnar_path_for(self.path) + ".tmp"))
+
+    def test_year_is_loaded_as_int64_from_raw_and_converted_files(self):
+        raw = load_dataset_from_path(self.path, top=None, use_cache=False)
+        converted = read_columnar(convert_to_columnar(self.path), None)
+        self.assertEqual(raw["year"].dtype, "Int64")
+        pd.testing.assert_series_equal(raw["year"], converted["year"])
+
+    def test_decimal_in_a_late_chunk_widens_the_plan(self):
+        df = _igr_frame().assign(units=[str(i) for i in range(24)])
+        df.loc[22, "units"] = "100.5"
+        df.to_csv(self.path, index=False)
+        self.assertEqual(pd.read_csv(self.path, nrows=5)["units"].dtype, np.int64)
+
+        target = convert_to_columnar(self.path, chunk_rows=5)
+        converted = read_columnar(target, None)
+        self.assertEqual(converted["units"].dtype, np.float64)
+        self.assertEqual(converted["units"].tolist(), df["units"].astype(float).tolist())
+        self.assertEqual(converted["year"].tolist(), df["year"].tolist())
+        self.assertFalse(os.path.exists(target + ".tmp"))
+
+    def test_text_in_a_late_chunk_of_a_boolean_column(self):
+        df = _igr_frame().assign(resale=[True, False] * 12)
+        df["resale"] = df["resale"].astype(object)
+        df.loc[20, "resale"] = "unknown"
+        df.to_csv(self.path, index=False)
+
+        converted = read_columnar(convert_to_columnar(self.path, chunk_rows=5), None)
+        self.assertEqual(converted["resale"].tolist(), df["resale"].astype(str).tolist())
+
+
+    def test_text_in_a_late_chunk_of_a_numeric_column(self):
+        df = _igr_frame().assign(units=[str(i) for i in range(24)])
+        df.loc[23, "units"] = "unknown"
+        df["flat - weighted average rate"] = df["flat - weighted average rate"].astype(object)
+        df.loc[21, "flat - weighted average rate"] = "on request"
+        df.to_csv(self.path, index=False)
+
+        converted = read_columnar(convert_to_columnar(self.path, chunk_rows=5), None)
+        raw = load_dataset_from_path(self.path, top=None, use_cache=False)
+        for c in ("units", "flat - weighted average rate"):
+            with self.subTest(column=c):
+                self.assertEqual(converted[c].astype(str).tolist(), raw[c].astype(str).tolist())
+        self.assertEqual(converted.loc[23, "units"], "unknown")
+
+
+class IngestJobTests(SimpleTestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+        self.path = os.path.join(self.dir.name, "upload.csv")
+        _igr_frame().to_csv(self.path, index=False)
+        jobs_dir = mock.patch.object(jobs, "JOBS_DIR", os.path.join(self.dir.name, "jobs"))
+        jobs_dir.start()
+        self.addCleanup(jobs_dir.stop)
+        dataset_cache.clear()
+        self.addCleanup(dataset_cache.clear)
+
+    def _states(self):
+        """
+        Patch job writes to record the state of every record written.
+        """
+        written = []
+        write = jobs._write_job
+
+        def record(job):
+            written.append(job["state"])
+            write(job)
+
+        patcher = mock.patch.object(jobs, "_write_job", record)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        return written
+
+    def test_foreground_job_runs_to_done(self):
+        states = self._states()
+        job = jobs.submit_ingest(self.path, background=False)
+        # progress is written while running
+        self.assertEqual(list(dict.fromkeys(states)), ["queued", "running", "done"])
+        self.assertEqual(states[-1], "done")
+        self.assertEqual((job["state"], job["rows"], job["progress"], job["columnar"]), ("done", 24, 1.0, True))
+        self.assertIsNone(job["error"])
+        self.assertLessEqual(job["created_at"], job["started_at"])
+        self.assertLessEqual(job["started_at"], job["finished_at"])
+        self.assertEqual(jobs.get_job(job["job_id"]), job)
+        self.assertEqual([e["path"] for e in dataset_cache.entries()], [columnar_path_for(self.path)])
+
+    def test_failing_job_records_the_error(self):
+        states = self._states()
+        job = jobs.submit_ingest(os.path.join(self.dir.name, "missing.csv"), background=False)
+        self.assertEqual(list(dict.fromkeys(states)), ["queued", "running", "failed"])
+        self.assertEqual(job["state"], "failed")
+        self.assertIn("missing.csv", job["error"])
+        self.assertIsNotNone(job["finished_at"])
+
+    def test_background_job_is_polled_through_the_status_view(self):
+        client = Client()
+        job = jobs.submit_ingest(self.path)
+        self.assertIn(job["state"], ("queued", "running", "done"))
+        deadline = time.monotonic() + 10
+        while True:
+            body = client.get("/api/upload/status/", {"job": job["job_id"]}).json()
+            if body["state"] in ("done", "failed") or time.monotonic() > deadline:
+                break
+            time.sleep(0.02)
+        self.assertEqual((body["state"], body["rows"]), ("done", 24))
+        for job_id in ("0" * 32, "../../etc/passwd"):
+            with self.subTest(job=job_id):
+                self.assertEqual(client.get("/api/upload/status/", {"job": job_id}).status_code, 404)
+
+    def _age(self, job_id: str, seconds: float) -> None:
+        """
+        Make a job record look written, and finished if it has, `seconds` ago.
+        """
+        job = jobs.get_job(job_id)
+        if job["finished_at"]:
+            job["finished_at"] -= seconds
+        jobs._write_job(job)
+        then = time.time() - seconds
+        os.utime(jobs._job_file(job_id), (then, then))
+
+    def test_finished_jobs_expire(self):
+        done = jobs.submit_ingest(self.path, background=False)
+        failed = jobs.submit_ingest(os.path.join(self.dir.name, "missing.csv"), background=False)
+        leftover = jobs._job_file(done["job_id"]) + ".1.tmp"
+        open(leftover, "w").close()
+        with mock.patch.object(jobs, "INGEST_JOB_TTL", 60):
+            self._age(done["job_id"], 30)
+            self.assertEqual(jobs.purge_finished_jobs(), 0)
+            self.assertIsNotNone(jobs.get_job(done["job_id"]))
+
+            self._age(done["job_id"], 90)
+            self._age(failed["job_id"], 90)
+            os.utime(leftover, (time.time() - 90,) * 2)
+            self.assertIsNone(jobs.get_job(done["job_id"]))
+            self.assertEqual(Client().get("/api/upload/status/", {"job": failed["job_id"]}).status_code, 404)
+            self.assertEqual(os.listdir(jobs.JOBS_DIR), [])
+
+    def test_unfinished_jobs_are_kept(self):
+        with mock.patch.object(jobs, "_get_executor"):
+            queued = jobs.submit_ingest(self.path)
+        with mock.patch.object(jobs, "INGEST_JOB_TTL", 60):
+            self._age(queued["job_id"], 90)
+            jobs.submit_ingest(self.path, background=False)
+            self.assertEqual(jobs.get_job(queued["job_id"])["state"], "queued")
+
+
+class RangeParsingTests(SimpleTestCase):
+    RATE = "flat - most prevailing rate - range"
+
+    def _frame(self) -> pd.DataFrame:
+        return pd.DataFrame({
+            "final location": ["Wakad", "Aundh", "Baner", "Akurdi"],
+            self.RATE: ["10373-11465", "10,373 - 11,465", "9000 to 9500", "8800"],
+            "price range category": ["budget", "premium", "budget", "luxury"],
+            "unit sizes": ["1-2", "2-3", "1-1", "3"],
+        })
+
+    def test_range_values_are_split_into_low_high_mid(self):
+        for parser in ("arrow", "pandas"):
+            with self.subTest(parser=parser), mock.patch.object(ingest, "pc", ingest.pc if parser == "arrow" else None):
+                out = split_range_columns(self._frame())
+                self.assertEqual(out["flat - most prevailing rate - low"].tolist(), [10373.0, 10373.0, 9000.0, 8800.0])
+                self.assertEqual(out["flat - most prevailing rate - high"].tolist(), [11465.0, 11465.0, 9500.0, 8800.0])
+                self.assertEqual(out["flat - most prevailing rate - mid"].tolist(), [10919.0, 10919.0, 9250.0, 8800.0])
+                self.assertEqual(out["unit sizes - high"].tolist(), [2.0, 3.0, 1.0, 3.0])
+                self.assertNotIn(self.RATE, out.columns)
+
+    def test_text_column_with_a_range_like_name_is_left_alone(self):
+        df = self._frame()
+        out = split_range_columns(df)
+        pd.testing.assert_series_equal(out["price range category"], df["price range category"])
+        self.assertNotIn("price range category - low", out.columns)
+
+    def test_values_that_mostly_do_not_parse_are_left_alone(self):
+        df = pd.DataFrame({"floor range": ["1-4", "ground", "upper", "5-9", "basement"], "note": ["1-2", "a-b", "x", "y", "z"]})
+        pd.testing.assert_frame_equal(split_range_columns(df), df)
+
+    def test_converted_file_matches_the_raw_load(self):
+        d = tempfile.TemporaryDirectory()
+        self.addCleanup(d.cleanup)
+        path = os.path.join(d.name, "ranges.csv")
+        self._frame().to_csv(path, index=False)
+        raw = load_dataset_from_path(path, top=None, use_cache=False)
+        converted = read_columnar(convert_to_columnar(path), None)
+        self.assertEqual(list(converted.columns), list(raw.columns))
+        self.assertEqual(converted["price range category"].tolist(), ["budget", "premium", "budget", "luxury"])
+
+
+class FederatedScanTests(SimpleTestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+
+    def _partition(self, name: str, frame: pd.DataFrame) -> dict:
+        path = os.path.join(self.dir.name, name)
+        frame.to_csv(path, index=False)
+        return {"path": path, "columns": list(frame.columns)}
+
+    def test_partitions_larger_than_the_analysis_window_are_scanned_whole(self):
+        df = _igr_frame()
+        big = pd.concat([df] * (ANALYSIS_MAX_ROWS // len(df) + 1), ignore_index=True)
+        big.loc[len(big) - 1, "final location"] = "Tathawade"
+        manifest = {"partitions": [self._partition("pune.csv", big), self._partition("pune_update.csv", df)]}
+
+        rows, info = federated_frame(manifest, "Tathawade")
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(len(info["scanned"]), 2)
+
+        rows, _ = federated_frame(manifest, "Wakad")
+        self.assertEqual(len(rows), int((big["final location"] == "Wakad").sum()) + 4)
+
+
+class DatasetSummaryTests(SimpleTestCase):
+    """
+    Locality pruning and summary answers of a registered dataset, against scanning every partition.
+    """
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+        registry = mock.patch.object(federation, "DATASETS_DIR", os.path.join(self.dir.name, "datasets"))
+        registry.start()
+        self.addCleanup(registry.stop)
+
+        df = _igr_frame()
+        df.loc[df.index[::5], "flat - weighted average rate"] = np.nan
+        later = df[df["year"] >= 2022].copy()
+        later["final location"] = later["final location"].replace({"Wakad": "Tathawade"})
+        self.frames = {
+            "pune_2020.csv": df[df["year"] <= 2021],
+            "pune_2022.csv": later,
+            "pune_typos.csv": df[df["final location"] == "Wakad"].assign(**{"final location": "Waked", "year": 2024}),
+        }
+        for name, frame in self.frames.items():
+            self.frames[name] = frame.assign(units=np.arange(len(frame)) * 7 + 3)
+        paths = []
+        for name, frame in self.frames.items():
+            paths.append(os.path.join(self.dir.name, name))
+            frame.to_csv(paths[-1], index=False)
+        register_dataset("pune", paths[:1])
+        for path in paths[1:]:
+            self.manifest = append_partition("pune", path)
+        self.paths = paths
+        self.whole = pd.concat(self.frames.values(), ignore_index=True)
+
+    def test_partitions_without_the_locality_are_not_opened(self):
+        for query, scanned in (("Wakad", [0]), ("Tathawade", [1]), ("compare Wakad and Tathawade", [0, 1]),
+                               ("Baner", [0, 1]), ("waked", [2]), ("wakda", [0, 1, 2]), ("", [0, 1, 2])):
+            with self.subTest(query=query):
+                rows, info = federated_frame(self.manifest, query)
+                self.assertEqual(info["scanned"], [self.paths[i] for i in scanned])
+                self.assertEqual(len(info["scanned"]) + len(info["pruned"]), 3)
+                if query != "wakda":
+                    expected = self.whole.iloc[select_query(self.whole, query, top=None)[2]]
+                    self.assertEqual(rows["final location"].tolist(), expected["final location"].tolist())
+
+    def test_pure_aggregates_come_from_the_summary(self):
+        client = Client()
+        for params in ({}, {"agg": "mean,sum,count"}, {"year_from": 2021, "year_to": 2022},
+                       {"metrics": "total sold - igr,total carpet area supplied (sqft)", "agg": "sum,mean"},
+                       {"metrics": "units", "agg": "sum,count,mean"},
+                       {"table_format": "columnar"}):
+            with self.subTest(**params):
+                summary = client.get("/api/datasets/pune/", {**params, "limit": 0}).json()
+                scanned = client.get("/api/datasets/pune/", {**params, "limit": 1}).json()
+                self.assertTrue(summary["partitions"]["summary"])
+                self.assertEqual(summary["partitions"]["scanned"], [])
+                self.assertNotEqual(scanned["partitions"]["scanned"], [])
+                self.assertEqual(summary["aggregate"], scanned["aggregate"])
+                self.assertEqual(repr(summary["aggregate"]), repr(scanned["aggregate"]))
+                self.assertEqual(summary["rows"], scanned["rows"])
+                self.assertEqual(summary["table_page"]["total"], scanned["table_page"]["total"])
+                self.assertEqual(summary["table_page"]["columns"], scanned["table_page"]["columns"])
+
+    def test_integer_sums_stay_integers(self):
+        sums = self.manifest["summary"]["years"]["2022"]["sums"]
+        self.assertIsInstance(sums["units"], int)
+        self.assertIsInstance(sums["total sold - igr"], float)
+
+    def test_files_outside_the_upload_directory_are_rejected(self):
+        outside = tempfile.TemporaryDirectory()
+        self.addCleanup(outside.cleanup)
+        with mock.patch.object(ingest, "UPLOAD_DIR", self.dir.name):
+            # a sibling temp directory and a path that escapes through ".."
+            path = os.path.join(outside.name, "pune_2020.csv")
+            self.frames["pune_2020.csv"].to_csv(path, index=False)
+            escaping = os.path.join(self.dir.name, "..", os.path.basename(outside.name), "pune_2020.csv")
+            client = Client()
+            for p in (path, escaping, "/etc/passwd"):
+                with self.subTest(path=p):
+                    resp = client.post("/api/datasets/", {"name": "other", "paths": [p]}, content_type="application/json")
+                    self.assertEqual(resp.status_code, 400)
+                    with self.assertRaises(ValueError):
+                        append_partition("pune", p)
+            self.assertEqual(os.listdir(outside.name), ["pune_2020.csv"])
+            resp = client.post("/api/datasets/", {"name": "other", "paths": [self.paths[0]]}, content_type="application/json")
+            self.assertEqual(resp.status_code, 201)
+
+    def test_other_aggregates_scan_the_partitions(self):
+        client = Client()
+        for params in ({"agg": "median"}, {"group_by": "locality"}, {"query": "Wakad"}):
+            with self.subTest(**params):
+                body = client.get("/api/datasets/pune/", {**params, "limit": 0}).json()
+                self.assertNotIn("summary", body["partitions"])
+        resp = client.get("/api/datasets/pune/", {"metrics": "nope", "limit": 0})
+        self.assertEqual(resp.status_code, 400)
+
+
+class LargeExportTests(SimpleTestCase):
+    QUERIES = ["", "Wakad", "compare Wakad and Aundh", "hinjawadi", "xyz"]
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+        self.path = os.path.join(self.dir.name, "upload.csv")
+        _igr_frame().to_csv(self.path, index=False)
+        self.columnar = convert_to_columnar(self.path)
+        self.full = read_columnar(self.columnar, None)
+
+    def test_selection_on_location_columns_matches_the_whole_frame(self):
+        for query in self.QUERIES:
+            with self.subTest(query=query):
+                empty, positions = select_query_on_disk(self.columnar, query)
+                self.assertEqual(positions.tolist(), select_query(self.full, query, top=None)[2].tolist())
+                self.assertEqual(dict(empty.dtypes), dict(self.full.dtypes))
+
+    def test_chunks_match_the_whole_frame(self):
+        empty, positions = select_query_on_disk(self.columnar, "compare Wakad and Aundh")
+        chunks = list(iter_columnar_rows(self.columnar, positions, 3, like=empty))
+        self.assertEqual(len(chunks), 3)
+        pd.testing.assert_frame_equal(pd.concat(chunks, ignore_index=True), self.full.iloc[positions].reset_index(drop=True))
+
+    def test_export_of_every_row_is_not_cached(self):
+        dataset_cache.clear()
+        client = Client()
+        for query in self.QUERIES:
+            for fmt in ("csv", "ndjson"):
+                with self.subTest(query=query, output=fmt):
+                    resp = client.get("/api/download/", {"file": self.path, "query": query, "limit": "all", "output": fmt})
+                    self.assertEqual(resp.status_code, 200)
+                    expected = b"".join(stream_export(self.full, select_query(self.full, query, top=None)[2], fmt))
+                    self.assertEqual(b"".join(resp.streaming_content), expected)
+        self.assertEqual(dataset_cache.entries(), [])
+
+    def test_export_of_an_unconverted_upload_is_not_cached(self):
+        dataset_cache.clear()
+        os.remove(self.columnar)
+        resp = Client().get("/api/download/", {"file": self.path, "query": "Wakad", "limit": "all"})
+        full = load_dataset_from_path(self.path, top=None, use_cache=False)
+        self.assertEqual(b"".join(resp.streaming_content), b"".join(stream_export(full, select_query(full, "Wakad", top=None)[2], "csv")))
+        self.assertEqual(dataset_cache.entries(), [])
+
+    def test_limit_below_one_is_rejected(self):
+        client = Client()
+        for limit in ("-20", "-1"):
+            with self.subTest(limit=limit):
+                self.assertEqual(client.get("/api/download/", {"file": self.path, "limit": limit}).status_code, 400)
+        resp = client.get("/api/download/", {"file": self.path, "query": "Wakad", "limit": "0"})
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(len(b"".join(resp.streaming_content).splitlines()), 5)
+
+    def test_parquet_without_pyarrow_is_rejected(self):
+        with mock.patch.object(export, "pq", None):
+            resp = Client().get("/api/download/", {"file": self.path, "output": "parquet"})
+        self.assertEqual(resp.status_code, 400)
+        self.assertIn("pyarrow", resp.json()["error"])
+
+
+class AnalyzeResponseCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+        self.path = os.path.join(self.dir.name, "upload.csv")
+        _igr_frame().to_csv(self.path, index=False)
+        response_cache.clear()
+        self.addCleanup(response_cache.clear)
+
+    def _get(self, query: str, **headers):
+        return Client().get("/api/analyze/", {"file": self.path, "query": query, "use_llm": "false"}, headers=headers)
+
+    def test_if_none_match_returns_304(self):
+        first = self._get("Wakad")
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(first["X-Cache"], "MISS")
+        again = self._get("Wakad", if_none_match=first["ETag"])
+        self.assertEqual(again.status_code, 304)
+        self.assertEqual(again["X-Cache"], "HIT")
+        self.assertEqual(again["ETag"], first["ETag"])
+        self.assertEqual(self._get("Wakad", if_none_match='"stale"').status_code, 200)
+
+    def test_key_changes_with_the_dataset(self):
+        before = response_cache_key("Wakad", 500, False, dataset_version(self.path))
+        self.assertEqual(self._get("Wakad")["X-Cache"], "MISS")
+        self.assertEqual(self._get("Wakad")["X-Cache"], "HIT")
+
+        _igr_frame().head(12).to_csv(self.path, index=False)
+        self.assertNotEqual(response_cache_key("Wakad", 500, False, dataset_version(self.path)), before)
+        self.assertEqual(self._get("Wakad")["X-Cache"], "MISS")
+
+    def test_query_case_is_not_shared(self):
+        self.assertEqual(self._get("WAKAD")["X-Cache"], "MISS")
+        resp = self._get("wakad")
+        self.assertEqual(resp["X-Cache"], "MISS")
+        self.assertEqual(resp.json()["query"], "wakad")
+        self.assertEqual(self._get("  wakad ")["X-Cache"], "HIT")
+
+
+class AnalyzeBatchTests(SimpleTestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+        self.path = os.path.join(self.dir.name, "upload.csv")
+        _igr_frame().to_csv(self.path, index=False)
+        response_cache.clear()
+        self.addCleanup(response_cache.clear)
+
+    def _post(self, queries, **options):
+        body = {"queries": queries, "file": self.path, "use_llm": False, **options}
+        return Client().post("/api/analyze/batch/", body, content_type="application/json")
+
+    def test_results_match_single_analyze(self):
+        queries = ["Wakad", "compare Aundh and Baner", "hinjawadi"]
+        resp = self._post(queries)
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.json()["cached"], 0)
+        response_cache.clear()
+        for query, result in zip(queries, resp.json()["results"]):
+            single = Client().get("/api/analyze/", {"file": self.path, "query": query, "use_llm": "false"})
+            self.assertEqual(result, single.json())
+
+    def test_repeated_queries_are_computed_once(self):
+        with mock.patch.object(views, "select_query", wraps=views.select_query) as select:
+            body = self._post(["Wakad", "Aundh", " Wakad ", "Wakad"]).json()
+        self.assertEqual(select.call_count, 2)
+        self.assertEqual(body["cached"], 0)
+        self.assertEqual([r["query"] for r in body["results"]], ["Wakad", "Aundh", "Wakad", "Wakad"])
+        self.assertEqual(body["results"][0], body["results"][3])
+
+    def test_cached_counts_distinct_hits(self):
+        Client().get("/api/analyze/", {"file": self.path, "query": "Wakad", "use_llm": "false"})
+        with mock.patch.object(views, "load_dataset_from_path", wraps=views.load_dataset_from_path) as load:
+            body = self._post(["Wakad", "Wakad", "Baner"]).json()
+        self.assertEqual(body["cached"], 1)
+        self.assertEqual(load.call_count, 1)
+
+        with mock.patch.object(views, "load_dataset_from_path") as load:
+            body = self._post(["Baner", "Wakad"]).json()
+        self.assertEqual(body["cached"], 2)
+        load.assert_not_called()
+
+    def test_invalid_bodies(self):
+        self.assertEqual(self._post([]).status_code, 400)
+        self.assertEqual(self._post(["Wakad"], limit="ten").status_code, 400)
+        self.assertEqual(self._post(["Wakad"], columns=["no such column"]).status_code, 400)
+        with mock.patch.object(views, "ANALYZE_BATCH_MAX_QUERIES", 2):
+            resp = self._post(["Wakad", "Aundh", "Baner"])
+        self.assertEqual(resp.status_code, 400)
+        self.assertIn("At most 2", resp.json()["error"])
+
+
+class GeoViewTests(SimpleTestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+        self.path = os.path.join(self.dir.name, "geo.csv")
+        df = _igr_frame()
+        codes = df["final location"].astype("category").cat.codes
+        df.assign(latitude=18.5 + 0.01 * codes, longitude=73.8 + 0.01 * codes).to_csv(self.path, index=False)
+
+    def test_limit_below_one_is_rejected(self):
+        client = Client()
+        for limit in ("0", "-3"):
+            with self.subTest(limit=limit):
+                resp = client.get("/api/geo/", {"file": self.path, "limit": limit})
+                self.assertEqual(resp.status_code, 400)
+
+    def test_limit_caps_the_points(self):
+        client = Client()
+        self.assertEqual(len(client.get("/api/geo/", {"file": self.path}).json()["points"]), 6)
+        self.assertEqual(len(client.get("/api/geo/", {"file": self.path, "limit": "2"}).json()["points"]), 2)
+
+    def test_non_finite_or_out_of_range_coordinates_are_rejected(self):
+        client = Client()
+        for params in ({"bbox": "-inf,-inf,inf,inf"}, {"bbox": "18,73,1e300,74"}, {"bbox": "nan,73,19,74"},
+                       {"lat": "inf", "lng": "73.8"}, {"lat": "18.5", "lng": "1e300"}, {"lat": "91", "lng": "73.8"},
+                       {"lat": "18.5", "lng": "73.8", "radius_km": "inf"}, {"lat": "18.5", "lng": "73.8", "radius_km": "-1"},
+                       {"near": "Wakad", "radius_km": "nan"}):
+            with self.subTest(**params):
+                resp = client.get("/api/geo/", {"file": self.path, **params})
+                self.assertEqual(resp.status_code, 400)
+
+    def test_world_sized_queries_return_every_point(self):
+        client = Client()
+        for params in ({"bbox": "-90,-180,90,180"}, {"lat": "18.5", "lng": "73.8", "radius_km": "1e300"}):
+            with self.subTest(**params):
+                self.assertEqual(client.get("/api/geo/", {"file": self.path, **params}).json()["count"], 6)
+
+
+def _cube_frame() -> pd.DataFrame:
+    """
+    _igr_frame with gaps: Akurdi has no 2022 rows, Aundh has no prices at all and Baner none in 2021,
+    and one Wakad row has no year.
+    """
+    df = _igr_frame()
+    df = df[~((df["final location"] == "Akurdi") & (df["year"] == 2022))]
+    extra = df[df["final location"].isin(["Wakad", "Baner"])].assign(**{"flat - weighted average rate": lambda d: d["flat - weighted average rate"] * 1.37})
+    df = pd.concat([df, extra], ignore_index=True)
+    df.loc[df["final location"] == "Aundh", "flat - weighted average rate"] = np.nan
+    df.loc[(df["final location"] == "Baner") & (df["year"] == 2021), "flat - weighted average rate"] = np.nan
+    df["year"] = df["year"].astype("Int64")
+    df.loc[df.index[df["final location"] == "Wakad"][0], "year"] = pd.NA
+    return df
+
+
+class AggregateCubeTests(SimpleTestCase):
+    GROUPS = [["Wakad"], ["Akurdi"], ["Aundh"], ["Baner"], ["Akurdi", "Aundh"], ["Wakad", "Baner", "Hinjewadi"],
+              ["Wakad", "Hinjewadi", "Akurdi", "Ambegaon Budruk", "Aundh", "Baner"]]
+
+    def assert_cube_matches_groupby(self, df: pd.DataFrame, saved=None):
+        cube = saved or aggregate_cube(df)
+        self.assertIsNotNone(cube)
+        profile = profile_schema(df)
+        for group in self.GROUPS:
+            with self.subTest(localities=group):
+                positions = np.flatnonzero(df["final location"].isin(group).to_numpy())
+                codes = cube.codes_covering(positions)
+                self.assertIsNotNone(codes)
+                chart = cube.combine(codes, profile.price_col, profile.demand_col)
+                expected = aggregate_for_chart(df.iloc[positions])
+                self.assertEqual(chart, {k: expected[k] for k in ("labels", "price", "demand")})
+                if saved is None:
+                    self.assertEqual(aggregate_selection(df, positions), expected)
+
+    def test_cube_matches_groupby(self):
+        df = _cube_frame()
+        self.assertEqual(profile_schema(df).price_col, "flat - weighted average rate")
+        self.assertEqual(profile_schema(df).demand_col, "total sold - igr")
+        self.assertEqual(aggregate_for_chart(df[df["final location"] == "Akurdi"])["labels"], ["2020", "2021", "2023"])
+        self.assertEqual(set(aggregate_for_chart(df[df["final location"] == "Aundh"])["price"]), {0.0})
+        self.assert_cube_matches_groupby(df)
+
+    def test_cube_saved_at_ingest_matches_groupby(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "upload.csv")
+            _cube_frame().to_csv(path, index=False)
+            columnar = convert_to_columnar(path, chunk_rows=7)
+            df = read_columnar(columnar, None)
+            derived = load_derived(columnar, df)
+            self.assertIn("aggregate_cube", derived)
+            self.assert_cube_matches_groupby(df, derived["aggregate_cube"])
+
+    def test_partial_selection_is_not_served_from_the_cube(self):
+        df = _cube_frame()
+        positions = np.flatnonzero((df["final location"] == "Wakad").to_numpy())[:3]
+        self.assertIsNone(aggregate_cube(df).codes_covering(positions))
+        self.assertEqual(aggregate_selection(df, positions), aggregate_for_chart(df.iloc[positions]))
+
+
+class AggregateMetricsTests(SimpleTestCase):
+    AGGS = ["mean", "sum", "count", "min", "max", "median", "p0", "p25", "p90", "p99.5", "p100"]
+
+    def _frame(self) -> pd.DataFrame:
+        rng = np.random.default_rng(7)
+        df = pd.DataFrame({
+            "group": rng.choice(["a", "b", "c", "d"], 200),
+            "price": rng.normal(9000, 800, 200).round(2),
+            "units": rng.integers(0, 50, 200),
+        })
+        df.loc[df.index[::7], "price"] = np.nan
+        df.loc[df["group"] == "d", "price"] = np.nan  # a group without values
+        df.loc[df.index[::11], "group"] = None  # rows without a key are skipped
+        return df
+
+    def _expected(self, values: pd.Series, agg: str):
+        name, q = parse_agg(agg)
+        if q is not None:
+            out = values.quantile(q)
+        elif name == "count":
+            out = values.count()
+        else:
+            out = getattr(values, name)()
+        return None if pd.isna(out) else round(float(out), 4)
+
+    def test_matches_pandas_groupby(self):
+        df = self._frame()
+        result = aggregate_metrics(df["group"], df, ["price", "units"], self.AGGS)
+        groups = sorted(df["group"].dropna().unique())
+        self.assertEqual(result["labels"], groups)
+        self.assertEqual(result["rows"], [int((df["group"] == g).sum()) for g in groups])
+        self.assertEqual(len(result["series"]), 2 * len(self.AGGS))
+        for series in result["series"]:
+            with self.subTest(label=series["label"]):
+                expected = [self._expected(df.loc[df["group"] == g, series["metric"]], series["agg"]) for g in groups]
+                if series["agg"] in ("sum", "count"):
+                    expected = [0.0 if v is None else v for v in expected]
+                self.assertEqual(series["data"], expected)
+
+    def test_parse_agg(self):
+        self.assertEqual(parse_agg(" P90 "), ("p90", 0.9))
+        self.assertEqual(parse_agg("median"), ("median", 0.5))
+        self.assertEqual(parse_agg("sum"), ("sum", None))
+        for bad in ("p101", "avg", "p", "p-5"):
+            with self.subTest(agg=bad), self.assertRaises(ValueError):
+                parse_agg(bad)
+
+    def test_aggregate_view(self):
+        d = tempfile.TemporaryDirectory()
+        self.addCleanup(d.cleanup)
+        path = os.path.join(d.name, "upload.csv")
+        df = _igr_frame()
+        df.to_csv(path, index=False)
+        client = Client()
+        body = client.get("/api/aggregate/", {"file": path, "metrics": "total sold - igr", "agg": "sum,p90",
+                                               "group_by": "locality", "query": "compare Wakad and Aundh"}).json()
+        self.assertEqual((body["group_by"], body["group_col"], body["labels"]), ("locality", "final location", ["Aundh", "Wakad"]))
+        wakad = df.loc[df["final location"] == "Wakad", "total sold - igr"]
+        self.assertEqual(body["series"][0]["data"][1], float(wakad.sum()))
+        self.assertEqual(body["series"][1]["data"][1], round(float(wakad.quantile(0.9)), 4))
+
+        body = client.get("/api/aggregate/", {"file": path}).json()
+        self.assertEqual(body["labels"], ["2020", "2021", "2022", "2023"])
+        self.assertEqual([s["label"] for s in body["series"]], ["flat - weighted average rate (mean)", "total sold - igr (mean)"])
+        for bad in ({"agg": "avg"}, {"metrics": "nope"}, {"group_by": "planet"}):
+            with self.subTest(**bad):
+                self.assertEqual(client.get("/api/aggregate/", {"file": path, **bad}).status_code, 400)
+
+
+class PipelineBenchmarkTests(SimpleTestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+
+    def test_parse_size(self):
+        self.assertEqual([pipeline.parse_size(s) for s in ("10k", "1.5M", " 5m ", "250")], [10_000, 1_500_000, 5_000_000, 250])
+
+    def test_generated_dataset(self):
+        with mock.patch.object(pipeline, "GENERATE_CHUNK_ROWS", 400):
+            path = pipeline.generate_dataset(1000, self.dir.name, n_localities=50)
+        df = pd.read_csv(path)
+        self.assertEqual(list(df.columns), pipeline.COLUMNS)
+        self.assertEqual(len(df.columns), 28)
+        self.assertEqual(len(df), 1000)
+        self.assertEqual(df["final location"].nunique(), 50)
+        self.assertEqual(pipeline.generate_dataset(1000, self.dir.name, n_localities=50), path)
+        self.assertEqual(os.listdir(self.dir.name), [os.path.basename(path)])
+
+        # the same seed gives the same rows, so runs on different machines time the same data
+        with mock.patch.object(pipeline, "GENERATE_CHUNK_ROWS", 400):
+            again = pipeline.generate_dataset(1000, os.path.join(self.dir.name, "again"), n_localities=50)
+        pd.testing.assert_frame_equal(pd.read_csv(again), df)
+
+        profile = profile_schema(load_dataset_from_path(path, top=None, use_cache=False))
+        self.assertEqual((profile.location_cols[0], profile.lat_col, profile.lng_col), ("final location", "loc_lat", "loc_lng"))
+        self.assertIn("flat - most prevailing rate - mid", profile.numeric_cols)
+
+    def test_bench_size_times_every_stage(self):
+        path = pipeline.generate_dataset(300, self.dir.name, n_localities=20)
+        stages = pipeline.bench_size(path, repeat=2, top=50)
+        self.assertEqual(list(stages)[:4], ["load_raw", "convert_columnar", "load_columnar", "load_cached"])
+        self.assertIn("analyze_request_2", stages)
+        for name, timing in stages.items():
+            with self.subTest(stage=name):
+                self.assertLessEqual(timing["min"], timing["median"])
+                self.assertLessEqual(timing["median"], timing["max"])
+                self.assertEqual(timing["runs"], 1 if name == "convert_columnar" else 2)
+
+    def test_compare_flags_slowdowns(self):
+        def report(**medians):
+            return {"results": {"1000": {stage: {"median": m} for stage, m in medians.items()}}}
+
+        baseline = report(load=0.100, filter=0.001, aggregate=0.050)
+        current = report(load=0.125, filter=0.0019, aggregate=0.052, extra=0.5)
+        regressions = pipeline.compare(current, baseline, threshold=0.10, min_seconds=0.002)
+        self.assertEqual([(r["stage"], r["ratio"]) for r in regressions], [("load", 1.25)])
+        self.assertEqual(pipeline.compare(current, baseline, threshold=0.30, min_seconds=0.002), [])
+
+
+class StageTimingTests(SimpleTestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+        self.path = os.path.join(self.dir.name, "upload.csv")
+        _igr_frame().to_csv(self.path, index=False)
+        response_cache.clear()
+        self.addCleanup(response_cache.clear)
+        timing.stage_histograms.clear()
+        self.addCleanup(timing.stage_histograms.clear)
+
+    def _analyze(self, query: str = "Wakad"):
+        return Client().get("/api/analyze/", {"file": self.path, "query": query, "use_llm": "false"})
+
+    def test_server_timing_header(self):
+        header = self._analyze()["Server-Timing"]
+        stages = dict(part.split(";dur=") for part in header.split(", "))
+        for name in ("cache", "load", "select", "aggregate", "table", "summary", "render", "total"):
+            self.assertIn(name, stages)
+        self.assertEqual(list(stages)[-1], "total")
+        self.assertGreaterEqual(float(stages["total"]), max(float(v) for v in stages.values()))
+        with mock.patch.object(timing, "SERVER_TIMING", False):
+            self.assertNotIn("Server-Timing", self._analyze("Aundh"))
+
+    def test_metrics_output(self):
+        self._analyze("Wakad")
+        self._analyze("Aundh")
+        resp = Client().get("/api/download/", {"file": self.path, "query": "Wakad"})
+        b"".join(resp.streaming_content)  # the "stream" stage is observed once the body is consumed
+
+        text = Client().get("/api/metrics/").content.decode("utf-8")
+        self.assertIn("# TYPE analysis_stage_duration_seconds histogram", text)
+        samples = {}
+        for line in text.splitlines():
+            if not line.startswith("#"):
+                name, value = line.rsplit(" ", 1)
+                samples[name] = float(value)
+        labels = 'view="analyze",stage="total"'
+        self.assertEqual(samples[f"analysis_stage_duration_seconds_count{{{labels}}}"], 2)
+        buckets = [v for k, v in samples.items() if k.startswith(f"analysis_stage_duration_seconds_bucket{{{labels},")]
+        self.assertEqual(len(buckets), len(timing.STAGE_BUCKETS) + 1)
+        self.assertEqual(buckets, sorted(buckets))
+        self.assertEqual(buckets[-1], 2)
+        self.assertGreater(samples[f"analysis_stage_duration_seconds_sum{{{labels}}}"], 0)
+        self.assertEqual(samples['analysis_stage_duration_seconds_count{view="download",stage="stream"}'], 1)
+
+    def test_histogram_buckets_are_cumulative_upper_bounds(self):
+        histograms = timing.StageHistograms(buckets=(0.01, 0.1))
+        histograms.observe("v", [("s", 0.01), ("s", 0.05), ("s", 3.0)])
+        self.assertEqual(histograms.snapshot()[("v", "s")], ([1, 1, 1], 3.06, 3))
+
+    def test_slow_requests_are_profiled(self):
+        profiles = os.path.join(self.dir.name, "profiles")
+        with mock.patch.multiple(timing, PROFILE_SLOW_MS=0.001, PROFILE_SAMPLE_RATE=1.0, PROFILE_DIR=profiles):
+            self._analyze()
+        written = os.listdir(profiles)
+        self.assertEqual(len(written), 1)
+        self.assertTrue(written[0].startswith("analyze-") and written[0].endswith(".prof"))
+
+
+class StubLLMTestCase(SimpleTestCase):
+    """
+    Points the OpenAI clients at the stub server of the benchmarks, with empty summary cache and counters.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = start_stub_llm(delay=0.2)
+        cls.addClassCleanup(cls.server.shutdown)
+
+    def setUp(self):
+        base_url = f"http://127.0.0.1:{self.server.server_port}/v1"
+        env = mock.patch.dict(os.environ, {"OPENAI_API_KEY": "test", "OPENAI_BASE_URL": base_url})
+        env.start()
+        self.addCleanup(env.stop)
+        # the client is built once per process, with the base URL of that moment
+        client = mock.patch.object(utils, "_llm_client", None)
+        client.start()
+        self.addCleanup(client.stop)
+        summary_cache.clear()
+        self.addCleanup(summary_cache.clear)
+        StubLLMHandler.calls = 0
+        StubLLMHandler.failures = 0
+
+
+class LLMSummaryCacheTests(StubLLMTestCase):
+    """
+    Summary caching and coalescing against the stub OpenAI server.
+    """
+
+    def test_identical_concurrent_requests_share_one_call(self):
+        before = summary_cache.stats()
+        start = threading.Barrier(6)
+
+        def summarize():
+            start.wait()
+            return generate_llm_summary("Wakad prices rose 4% in 2023.")
+
+        with ThreadPoolExecutor(max_workers=6) as pool:
+            results = list(pool.map(lambda _: summarize(), range(6)))
+        self.assertEqual(StubLLMHandler.calls, 1)
+        self.assertEqual(len(set(results)), 1)
+        self.assertTrue(results[0].startswith("Stub summary"))
+        self.assertEqual(summary_cache.stats()["coalesced"] - before["coalesced"], 5)
+
+    def test_async_requests_share_one_call(self):
+        async def summarize():
+            return await asyncio.gather(*(generate_llm_summary_async("Aundh demand fell in 2022.") for _ in range(5)))
+
+        results = asyncio.run(summarize())
+        self.assertEqual(StubLLMHandler.calls, 1)
+        self.assertEqual(len(set(results)), 1)
+        self.assertIsNotNone(results[0])
+
+    def test_repeated_request_is_a_cache_hit(self):
+        first = generate_llm_summary("Baner prices were flat.")
+        hits = summary_cache.stats()["hits"]
+        self.assertEqual(generate_llm_summary("Baner prices were flat."), first)
+        self.assertEqual(StubLLMHandler.calls, 1)
+        self.assertEqual(summary_cache.stats()["hits"], hits + 1)
+        # a different prompt is a different entry
+        generate_llm_summary("Baner prices were flat in 2023.")
+        self.assertEqual(StubLLMHandler.calls, 2)
+
+    def test_failure_reaches_every_waiter_and_is_not_cached(self):
+        StubLLMHandler.failures = 1
+        start = threading.Barrier(4)
+
+        def summarize():
+            start.wait()
+            return generate_llm_summary("Akurdi sales doubled.")
+
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            results = list(pool.map(lambda _: summarize(), range(4)))
+        self.assertEqual(results, [None] * 4)
+        self.assertEqual(StubLLMHandler.calls, 1)
+        self.assertEqual(summary_cache.stats()["entries"], 0)
+
+        # the next request calls upstream again and caches the answer
+        text = generate_llm_summary("Akurdi sales doubled.")
+        self.assertIsNotNone(text)
+        self.assertEqual(StubLLMHandler.calls, 2)
+        self.assertEqual(generate_llm_summary("Akurdi sales doubled."), text)
+        self.assertEqual(StubLLMHandler.calls, 2)
+
+
+class AsyncAnalyzeTests(StubLLMTestCase):
+    QUERIES = ["Wakad", "compare Wakad and Aundh", "baner", "xyz"]
+
+    def setUp(self):
+        super().setUp()
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+        self.path = os.path.join(self.dir.name, "upload.csv")
+        _igr_frame().to_csv(self.path, index=False)
+        response_cache.clear()
+        self.addCleanup(response_cache.clear)
+
+    def _params(self, query: str, use_llm: bool):
+        return {"file": self.path, "query": query, "use_llm": str(use_llm).lower()}
+
+    def test_same_response_as_the_sync_view(self):
+        client = AsyncClient()
+        for use_llm in (False, True):
+            for query in self.QUERIES:
+                with self.subTest(query=query, use_llm=use_llm):
+                    response_cache.clear()
+                    resp = asyncio.run(client.get("/api/analyze/async/", self._params(query, use_llm)))
+                    self.assertEqual(resp.status_code, 200)
+                    response_cache.clear()
+                    expected = Client().get("/api/analyze/", self._params(query, use_llm))
+                    self.assertEqual(resp.json(), expected.json())
+                    self.assertEqual(resp["ETag"], expected["ETag"])
+                    if use_llm and query != "xyz":
+                        self.assertTrue(resp.json()["summary"].startswith("Stub summary"))
+
+    def test_shares_the_response_cache(self):
+        first = Client().get("/api/analyze/", self._params("Wakad", False))
+        resp = asyncio.run(AsyncClient().get("/api/analyze/async/", self._params("Wakad", False),
+                                             headers={"If-None-Match": first["ETag"]}))
+        self.assertEqual((resp.status_code, resp["X-Cache"]), (304, "HIT"))
+
+    def test_llm_calls_overlap_on_one_event_loop(self):
+        # requests made through the test AsyncClient do not overlap; send them to the ASGI application as the benchmark does
+        from backend_project.asgi import application
+
+        async def analyze_all():
+            return await asyncio.gather(*(_asgi_get(application, "/api/analyze/async/", self._params(q, True)) for q in self.QUERIES))
+
+        started = time.perf_counter()
+        statuses = asyncio.run(analyze_all())
+        elapsed = time.perf_counter() - started
+        self.assertEqual(statuses, [200] * len(self.QUERIES))
+        calls = StubLLMHandler.calls
+        self.assertGreaterEqual(calls, 3)
+        # each stub call takes 0.2 s; run one after another they would take calls * 0.2 s
+        self.assertLess(elapsed, calls * 0.2 * 0.75)
+
+    def test_bad_parameters_are_rejected(self):
+        resp = asyncio.run(AsyncClient().get("/api/analyze/async/", {**self._params("Wakad", False), "table_format": "xml"}))
+        self.assertEqual(resp.status_code, 400)
+
+
+def _sse_events(resp):
+    """
+    (event, data) pairs of a Server-Sent Events response.
+    """
+    events = []
+    for block in b"".join(resp.streaming_content).decode("utf-8").split("\n\n"):
+        if block:
+            lines = dict(line.split(": ", 1) for line in block.split("\n"))
+            events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+
+class AnalyzeStreamTests(StubLLMTestCase):
+    def setUp(self):
+        super().setUp()
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+        self.path = os.path.join(self.dir.name, "upload.csv")
+        _igr_frame().to_csv(self.path, index=False)
+        response_cache.clear()
+        self.addCleanup(response_cache.clear)
+
+    def _stream(self, query: str, use_llm: bool = True):
+        resp = Client().get("/api/analyze/stream/", {"file": self.path, "query": query, "use_llm": str(use_llm).lower()})
+        self.assertEqual(resp["Content-Type"], "text/event-stream")
+        return _sse_events(resp)
+
+    def test_result_comes_first_then_summary_tokens(self):
+        events = self._stream("Wakad")
+        names = [name for name, _ in events]
+        self.assertEqual(names[0], "result")
+        self.assertEqual(names[-2:], ["summary", "done"])
+        tokens = [data["text"] for name, data in events if name == "token"]
+        self.assertGreater(len(tokens), 1)
+        summary = events[-2][1]["summary"]
+        self.assertEqual("".join(tokens).strip(), summary)
+        self.assertTrue(summary.startswith("Stub summary"))
+        self.assertEqual(StubLLMHandler.calls, 1)
+
+        # the finished stream is cached: /api/analyze/ answers from it with the same body
+        analyzed = Client().get("/api/analyze/", {"file": self.path, "query": "Wakad", "use_llm": "true"})
+        self.assertEqual(analyzed["X-Cache"], "HIT")
+        self.assertEqual(analyzed.json(), {**events[0][1], "summary": summary})
+        self.assertEqual(self._stream("Wakad"), [events[0], events[-2], events[-1]])
+        self.assertEqual(StubLLMHandler.calls, 1)
+
+    def test_without_the_llm(self):
+        events = self._stream("compare Wakad and Aundh", use_llm=False)
+        self.assertEqual([name for name, _ in events], ["result", "summary", "done"])
+        analyzed = Client().get("/api/analyze/", {"file": self.path, "query": "compare Wakad and Aundh", "use_llm": "false"}).json()
+        self.assertEqual({**events[0][1], "summary": events[1][1]["summary"]}, analyzed)
+        self.assertEqual(StubLLMHandler.calls, 0)
+
+    def test_llm_failure_falls_back_and_is_not_cached(self):
+        StubLLMHandler.failures = 1
+        events = self._stream("Baner")
+        self.assertEqual([name for name, _ in events], ["result", "error", "summary", "done"])
+        self.assertFalse(events[2][1]["summary"].startswith("Stub summary"))
+        self.assertTrue(self._stream("Baner")[-2][1]["summary"].startswith("Stub summary"))
+        self.assertEqual(StubLLMHandler.calls, 2)
+
+    def test_bad_parameters_are_rejected(self):
+        resp = Client().get("/api/analyze/stream/", {"file": self.path, "table_format": "xml"})
+        self.assertEqual(resp.status_code, 400)
@@ -0,0 +1,222 @@
+# backend/analysis/timing.py
+import os
+import time
+import random
+import bisect
+import inspect
+import logging
+import tempfile
+import threading
+import functools
+import contextvars
+from contextlib import contextmanager
+from typing import Optional, Dict, Any, List, Tuple, Iterator
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.DEBUG)
+
+# optional: without cProfile (e.g. some embedded interpreters) the profiler hook stays off
+try:
+    import cProfile
+except Exception:
+    cProfile = None
+
+SERVER_TIMING = os.getenv("SERVER_TIMING", "true").lower() not in ("0", "false", "no")
+# seconds; Prometheus-style cumulative buckets of the stage histograms
+STAGE_BUCKETS: Tuple[float, ...] = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# opt-in profiler: a sampled request slower than PROFILE_SLOW_MS has its cProfile stats dumped to PROFILE_DIR
+PROFILE_SLOW_MS = float(os.getenv("PROFILE_SLOW_MS", "0"))  # 0 -> off
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0.1"))
+PROFILE_DIR = os.getenv("PROFILE_DIR", os.path.join(tempfile.gettempdir(), "analysis_profiles"))
+
+
+class RequestTimings:
+    """
+    Stage durations of one request, in the order the stages finished.
+    """
+
+    def __init__(self, view: str):
+        self.view = view
+        self.started = time.perf_counter()
+        self.stages: List[Tuple[str, float]] = []
+
+    def add(self, name: str, seconds: float) -> None:
+        self.stages.append((name, seconds))
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+    def server_timing(self) -> str:
+        """
+        Server-Timing header value, e.g. 'load;dur=12.4, select;dur=0.8, total;dur=15.1' (milliseconds).
+        """
+        return ", ".join(f"{name};dur={seconds * 1000:.1f}" for name, seconds in self.stages)
+
+
+_current: contextvars.ContextVar[Optional[RequestTimings]] = contextvars.ContextVar("analysis_request_timings", default=None)
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """
+    Time a block as stage `name` of the current instrumented request; a no-op outside one.
+    """
+    timings = _current.get()
+    if timings is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.add(name, time.perf_counter() - start)
+
+
+class StageHistograms:
+    """
+    Per-process latency histograms keyed by (view, stage), with cumulative bucket counts as in Prometheus.
+    """
+
+    def __init__(self, buckets: Tuple[float, ...] = STAGE_BUCKETS):
+        self.buckets = buckets
+        self._series: Dict[Tuple[str, str], List[Any]] = {}  # -> [bucket counts, sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, view: str, stages: List[Tuple[str, float]]) -> None:
+        with self._lock:
+            for name, seconds in stages:
+                series = self._series.get((view, name))
+                if series is None:
+                    series = self._series[(view, name)] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+                series[0][bisect.bisect_left(self.buckets, seconds)] += 1
+                series[1] += seconds
+                series[2] += 1
+
+    def snapshot(self) -> Dict[Tuple[str, str], Tuple[List[int], float, int]]:
+        with self._lock:
+            return {key: (list(counts), total, n) for key, (counts, total, n) in self._series.items()}
+
+    def clear(self) -> None:
+        with self._lock:
+            self._series.clear()
+
+
+stage_histograms = StageHistograms()
+
+
+def render_prometheus() -> str:
+    """
+    The stage histograms in the Prometheus text exposition format (version 0.0.4).
+    """
+    lines = [
+        "# HELP analysis_stage_duration_seconds Duration of each stage of the analysis endpoints.",
+        "# TYPE analysis_stage_duration_seconds histogram",
+    ]
+    buckets = stage_histograms.buckets
+    for (view, name), (counts, total, n) in sorted(stage_histograms.snapshot().items()):
+        labels = f'view="{view}",stage="{name}"'
+        cumulative = 0
+        for bound, count in zip(buckets, counts):
+            cumulative += count
+            lines.append(f'analysis_stage_duration_seconds_bucket{{{labels},le="{bound:g}"}} {cumulative}')
+        lines.append(f'analysis_stage_duration_seconds_bucket{{{labels},le="+Inf"}} {n}')
+        lines.append(f"analysis_stage_duration_seconds_sum{{{labels}}} {total:.6f}")
+        lines.append(f"analysis_stage_duration_seconds_count{{{labels}}} {n}")
+    return "\n".join(lines) + "\n"
+
+
+# cProfile can only run one profiler at a time, so at most one request is profiled at once
+_profile_lock = threading.Lock()
+
+
+def _start_profiler():
+    if cProfile is None or PROFILE_SLOW_MS <= 0 or random.random() >= PROFILE_SAMPLE_RATE:
+        return None
+    if not _profile_lock.acquire(blocking=False):
+        return None
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError:
+        # another profiling tool is active in this process
+        _profile_lock.release()
+        return None
+    return profiler
+
+
+def _stop_profiler(profiler, view: str, seconds: float) -> None:
+    try:
+        profiler.disable()
+        if seconds * 1000 >= PROFILE_SLOW_MS:
+            os.makedirs(PROFILE_DIR, exist_ok=True)
+            target = os.path.join(PROFILE_DIR, f"{view}-{time.strftime('%Y%m%d-%H%M%S')}-{int(seconds * 1000)}ms-{os.getpid()}.prof")
+            profiler.dump_stats(target)
+            logger.warning("Slow %s request (%.0f ms); profile written to %s", view, seconds * 1000, target)
+    finally:
+        _profile_lock.release()
+
+
+def _timed_stream(content, timings: RequestTimings) -> Iterator[bytes]:
+    start = time.perf_counter()
+    try:
+        yield from content
+    finally:
+        stage_histograms.observe(timings.view, [("stream", time.perf_counter() - start)])
+
+
+def _finish(response, timings: RequestTimings) -> None:
+    if SERVER_TIMING and response is not None:
+        response["Server-Timing"] = timings.server_timing()
+    if getattr(response, "streaming", False):
+        # the body is produced after the headers are sent: its time only goes to the histograms
+        response.streaming_content = _timed_stream(response.streaming_content, timings)
+
+
+def instrumented(view_name: str):
+    """
+    Time a view: stages recorded with stage() inside it, DRF rendering ("render") and the
+    whole request ("total") go to the Server-Timing header and the stage histograms.
+    Place it above @api_view so the returned Response can be rendered here.
+    Sync views are also sampled by the opt-in slow-request profiler.
+    """
+
+    def decorator(view):
+        if inspect.iscoroutinefunction(view):
+            @functools.wraps(view)
+            async def async_wrapper(request, *args, **kwargs):
+                timings = RequestTimings(view_name)
+                token = _current.set(timings)
+                try:
+                    response = await view(request, *args, **kwargs)
+                finally:
+                    _current.reset(token)
+                timings.add("total", timings.elapsed())
+                stage_histograms.observe(view_name, timings.stages)
+                _finish(response, timings)
+                return response
+
+            return async_wrapper
+
+        @functools.wraps(view)
+        def wrapper(request, *args, **kwargs):
+            timings = RequestTimings(view_name)
+            token = _current.set(timings)
+            profiler = _start_profiler()
+            try:
+                response = view(request, *args, **kwargs)
+                if hasattr(response, "render") and not getattr(response, "is_rendered", True):
+                    with stage("render"):
+                        response.render()
+            finally:
+                _current.reset(token)
+                if profiler is not None:
+                    _stop_profiler(profiler, view_name, timings.elapsed())
+            timings.add("total", timings.elapsed())
+            stage_histograms.observe(view_name, timings.stages)
+            _finish(response, timings)
+            return response
+
+        return wrapper
+
+    return decorator
+
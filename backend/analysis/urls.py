@@ -4,7 +4,18 @@ from . import views
 
 urlpatterns = [
     path("analyze/", views.analyze_view, name="analyze"),
+    path("analyze/async/", views.analyze_async_view, name="analyze-async"),
+    path("analyze/stream/", views.analyze_stream_view, name="analyze-stream"),
+    path("analyze/batch/", views.analyze_batch_view, name="analyze-batch"),
     path("upload/", views.upload_view, name="upload"),
+    path("upload/status/", views.upload_status_view, name="upload-status"),
     path("schema/", views.schema_view, name="schema"),
     path("download/", views.download_view, name="download"),
+    path("geo/", views.geo_view, name="geo"),
+    path("aggregate/", views.aggregate_view, name="aggregate"),
+    path("datasets/", views.datasets_view, name="datasets"),
+    path("datasets/<str:name>/", views.dataset_query_view, name="dataset-query"),
+    path("cache/stats/", views.cache_stats_view, name="cache-stats"),
+    path("memory/", views.memory_view, name="memory"),
+    path("metrics/", views.metrics_view, name="metrics"),
 ]
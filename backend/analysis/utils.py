@@ -1,13 +1,27 @@
 # backend/analysis/utils.py
 import os
 import io
+import asyncio
+import re
 import csv
 import json
 import pandas as pd
 import numpy as np
 from pathlib import Path
 import logging
-from typing import Optional, Dict, Any, List
+import threading
+import weakref
+from collections import OrderedDict
+from typing import Optional, Dict, Any, List, Tuple, Iterator
+
+from .ingest import COLUMNAR_SUFFIX, fresh_columnar_path, read_columnar, load_derived, split_range_columns, normalize_year
+from .index import LocalityIndex
+from .cube import AggregateCube
+from .geo import GeoIndex
+from .aggregate import aggregate_metrics
+from .memory import DATASET_COMPACT, compact_frame, column_usage
+from .schema import profile_schema, year_values
+from .llm_cache import summary_cache, prompt_key, LLM_TIMEOUT
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.DEBUG)
@@ -21,71 +35,337 @@ except Exception:
 SAMPLE_DIR = Path(__file__).resolve().parent.parent / "sample_data"
 SAMPLE_FILE = SAMPLE_DIR / "dataset.csv"  # fallback csv name
 
-def load_dataset_from_path(path: Optional[str] = None, top: int = 20000) -> pd.DataFrame:
+# Typo-tolerant locality matching, by trigram similarity (0..1): the best value is used to filter
+# from LOCALITY_FUZZY_MIN_SCORE on, weaker ones down to LOCALITY_SUGGEST_MIN_SCORE are only suggested.
+LOCALITY_FUZZY_MIN_SCORE = float(os.getenv("LOCALITY_FUZZY_MIN_SCORE", "0.45"))
+LOCALITY_SUGGEST_MIN_SCORE = float(os.getenv("LOCALITY_SUGGEST_MIN_SCORE", "0.3"))
+LOCALITY_AMBIGUITY_MARGIN = float(os.getenv("LOCALITY_AMBIGUITY_MARGIN", "0.1"))
+# a query contained in several locality values is labelled with at most this many of them
+LABEL_MAX_VALUES = 3
+
+# Parsed-dataset cache: bounded per-process LRU, also limited by total frame bytes.
+DATASET_CACHE_MAX_ENTRIES = int(os.getenv("DATASET_CACHE_MAX_ENTRIES", "8"))
+DATASET_CACHE_MAX_BYTES = int(os.getenv("DATASET_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+
+
+class DatasetCache:
     """
-    Load a dataset from a given path (uploaded) or from SAMPLE_FILE.
-    Returns a pandas DataFrame limited to `top` rows.
+    In-memory LRU cache of parsed DataFrames.
+    Entries are keyed by (path, top) and validated against the file's (mtime, size),
+    so a changed file is re-parsed on the next request. Eviction happens when either
+    the entry count or the total byte budget is exceeded.
+    Cached frames are shared between requests and must be treated as read-only.
+    """
+
+    def __init__(self, max_entries: int = DATASET_CACHE_MAX_ENTRIES, max_bytes: int = DATASET_CACHE_MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[Tuple[str, Optional[int]], Tuple[Tuple[int, int], pd.DataFrame, int]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get_or_load(self, path: str, top: Optional[int], loader) -> pd.DataFrame:
+        st = os.stat(path)
+        signature = (st.st_mtime_ns, st.st_size)
+        key = (path, top)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] == signature:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[1]
+                # file changed on disk since it was cached
+                self._drop(key)
+                self.invalidations += 1
+            self.misses += 1
+
+        df = loader()
+        nbytes = int(df.memory_usage(index=True, deep=True).sum())
+        if nbytes > self.max_bytes:
+            logger.debug("Dataset %s (%d bytes) exceeds cache budget; not cached", path, nbytes)
+            return df
+
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (signature, df, nbytes)
+            self._bytes += nbytes
+            while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+                oldest = next(iter(self._entries))
+                self._drop(oldest)
+                self.evictions += 1
+        return df
+
+    def _drop(self, key: Tuple[str, Optional[int]]) -> None:
+        _, _, nbytes = self._entries.pop(key)
+        self._bytes -= nbytes
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def entries(self) -> List[Dict[str, Any]]:
+        """
+        The cached frames, least recently used first: path, row limit, rows and bytes.
+        """
+        with self._lock:
+            return [{"path": path, "top": top, "rows": len(df), "bytes": nbytes} for (path, top), (_, df, nbytes) in self._entries.items()]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "pid": os.getpid(),
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+
+dataset_cache = DatasetCache()
+
+
+# Structures derived from a DataFrame (locality index, ...), keyed by frame identity.
+# Entries are dropped when the frame is garbage collected.
+_DERIVED: Dict[int, Dict[str, Any]] = {}
+_DERIVED_LOCK = threading.Lock()
+
+
+def _derived(df: pd.DataFrame, name: str, builder):
+    """
+    Return the structure `name` built for this exact DataFrame object, building it on first use.
+    """
+    key = id(df)
+    with _DERIVED_LOCK:
+        entry = _DERIVED.get(key)
+        if entry is not None and name in entry:
+            return entry[name]
+    value = builder()
+    with _DERIVED_LOCK:
+        entry = _DERIVED.get(key)
+        if entry is None:
+            entry = _DERIVED[key] = {}
+            weakref.finalize(df, _DERIVED.pop, key, None)
+        return entry.setdefault(name, value)
+
+
+def locality_index(df: pd.DataFrame) -> LocalityIndex:
+    """
+    The LocalityIndex of a DataFrame, built once per frame.
+    """
+    return _derived(df, "locality_index", lambda: LocalityIndex.from_frame(df, _candidate_location_columns(df)))
+
+
+def loaded_usage(df: pd.DataFrame) -> Optional[Dict[str, Dict[str, Any]]]:
+    """
+    Per-column usage (see memory.column_usage) recorded before a cached frame was compacted; None for other frames.
+    """
+    return _derived(df, "loaded_usage", lambda: None)
+
+
+def _build_cube(df: pd.DataFrame) -> Optional[AggregateCube]:
+    profile = profile_schema(df)
+    years = year_values(df, profile)
+    if not profile.location_cols or years is None:
+        return None
+    return AggregateCube.from_frame(df, profile.location_cols[0], years, profile.aggregatable_cols)
+
+
+def aggregate_cube(df: pd.DataFrame) -> Optional[AggregateCube]:
+    """
+    The (locality, year) AggregateCube of a DataFrame, built once per frame.
+    None when the frame has no location or year information.
+    """
+    return _derived(df, "aggregate_cube", lambda: _build_cube(df))
+
+
+def _build_geo_index(df: pd.DataFrame) -> Optional[GeoIndex]:
+    profile = profile_schema(df)
+    if not profile.location_cols or not profile.lat_col or not profile.lng_col:
+        return None
+    return GeoIndex.from_frame(df, profile.location_cols[0], profile.lat_col, profile.lng_col, profile.price_col, profile.demand_col)
+
+
+def geo_index(df: pd.DataFrame) -> Optional[GeoIndex]:
+    """
+    The per-locality GeoIndex of a DataFrame, built once per frame.
+    None when the frame has no location or latitude/longitude columns.
+    """
+    return _derived(df, "geo_index", lambda: _build_geo_index(df))
+
+
+def _read_dataset_file(path: str, top: Optional[int]) -> pd.DataFrame:
+    if path.endswith(COLUMNAR_SUFFIX):
+        return read_columnar(path, top)
+    # stop parsing at `top` rows instead of reading the whole file and truncating
+    if str(path).lower().endswith(".csv"):
+        df = pd.read_csv(path, nrows=top)
+    else:
+        df = pd.read_excel(path, nrows=top)
+    # range strings become low / high / mid floats and year a nullable integer, as in converted files
+    return normalize_year(split_range_columns(df))
+
+
+def _load_and_index(path: str, top: Optional[int]) -> pd.DataFrame:
+    df = _read_dataset_file(path, top)
+    # reuse the index / cube built while the upload was ingested
+    derived = load_derived(path, df) if path.endswith(COLUMNAR_SUFFIX) else {}
+    if DATASET_COMPACT:
+        # the index and cube only hold row positions and sums, so they stay valid for the compact frame
+        derived["loaded_usage"] = column_usage(df)
+        df = compact_frame(df)
+    for name, value in derived.items():
+        _derived(df, name, lambda value=value: value)
+    # built with the frame, so no request pays for them (substring and typo matching)
+    locality_index(df).substring_index()
+    locality_index(df).trigram_index()
+    aggregate_cube(df)
+    return df
+
+
+def resolve_dataset_path(path: Optional[str] = None) -> str:
+    """
+    The source file a request refers to: the uploaded path, or SAMPLE_FILE when none is given.
     """
     if path:
         logger.debug("Loading dataset from provided path: %s", path)
-        if str(path).lower().endswith(".csv"):
-            df = pd.read_csv(path)
-        else:
-            df = pd.read_excel(path)
-    else:
-        sample = SAMPLE_FILE
-        if not sample.exists():
-            raise FileNotFoundError(f"Sample data not found at {sample}")
-        logger.debug("Loading dataset from sample file: %s", sample)
-        if str(sample).lower().endswith(".csv"):
-            df = pd.read_csv(sample)
-        else:
-            df = pd.read_excel(sample)
-    df = df.copy()
-    return df.head(top)
+        return str(path)
+    if not SAMPLE_FILE.exists():
+        raise FileNotFoundError(f"Sample data not found at {SAMPLE_FILE}")
+    logger.debug("Loading dataset from sample file: %s", SAMPLE_FILE)
+    return str(SAMPLE_FILE)
+
+
+def load_dataset_from_path(path: Optional[str] = None, top: Optional[int] = 20000, use_cache: bool = True) -> pd.DataFrame:
+    """
+    Load a dataset from a given path (uploaded) or from SAMPLE_FILE.
+    Returns a pandas DataFrame limited to `top` rows (all rows when top is None).
+    When the upload has been converted to a columnar file (see ingest.convert_to_columnar)
+    that file is memory-mapped instead of re-parsing the raw CSV/XLSX.
+    Parsed frames are served from `dataset_cache` unless use_cache is False;
+    cached frames are shared, so callers must not modify them in place.
+    """
+    path = resolve_dataset_path(path)
+    path = fresh_columnar_path(path) or path
+
+    if not use_cache:
+        return _read_dataset_file(path, top)
+    return dataset_cache.get_or_load(path, top, lambda: _load_and_index(path, top))
 
 
 def _candidate_location_columns(df: pd.DataFrame) -> List[str]:
     """
     Return candidate columns likely to contain locality names.
     """
-    cols = []
-    for c in df.columns:
-        lc = c.lower()
-        if "location" in lc or "area" in lc or "locality" in lc or "final location" in lc or "place" in lc:
-            cols.append(c)
-    # fallback: any object/string columns
-    if not cols:
-        cols = [c for c in df.columns if df[c].dtype == "object"]
-    return cols
+    return list(profile_schema(df).location_cols)
 
 
 def extract_area_from_query_using_values(df: pd.DataFrame, query: str) -> Optional[str]:
     """
     Given dataframe and a full natural-language query, try to find a location
     value present in the dataframe which appears (as substring) inside the query.
+    Longer values win (e.g., "ambegaon budruk" before "ambegaon").
     Returns the matched location string or None.
     """
     if not query:
         return None
-    q = query.lower()
-    # gather candidate location values from dataset (unique)
-    candidate_cols = _candidate_location_columns(df)
-    values = set()
-    for c in candidate_cols:
-        try:
-            for v in df[c].dropna().astype(str).unique():
-                if v and len(v.strip()) > 0:
-                    values.add(v.strip())
-        except Exception:
-            continue
+    return locality_index(df).detect(query)
+
+
+def select_area(df: pd.DataFrame, query: str, top: Optional[int] = 200) -> np.ndarray:
+    """
+    Row positions selected by an area query (see filter_by_area), at most `top` of them
+    (no limit when top is None). An empty query selects the first `top` rows.
+    """
+    q = (query or "").strip().lower()
+    if not q:
+        return np.arange(len(df) if top is None else min(top, len(df)))
 
-    # sort by length descending so longer names match first (e.g., "ambegaon budruk" before "ambegaon")
-    sorted_values = sorted(values, key=lambda s: -len(s))
-    for val in sorted_values:
-        if val.lower() in q:
-            return val
-    return None
+    _, positions = _match_area(locality_index(df), query)
+    return positions[:top]
+
+
+def _match_label(names: List[str], query: str) -> str:
+    """
+    Label of the rows matched by a query: the dataset value it names (in the dataset's spelling),
+    or the matched values joined, at most LABEL_MAX_VALUES of them, when it is part of several.
+    """
+    q = query.strip()
+    exact = [n for n in names if n.lower() == q.lower()]
+    if exact:
+        return exact[0]
+    if not names:
+        return q
+    label = " / ".join(names[:LABEL_MAX_VALUES])
+    return label if len(names) <= LABEL_MAX_VALUES else f"{label} (+{len(names) - LABEL_MAX_VALUES} more)"
+
+
+def _match_area(index: LocalityIndex, query: str) -> Tuple[Optional[str], np.ndarray]:
+    """
+    Apply the area matching rules to one query; returns (matched label, row positions).
+    """
+    q = (query or "").strip().lower()
+
+    # Primary: tries to match the query directly against candidate columns
+    value_ids = index.values_containing(q)
+    positions = index.rows_for_values(value_ids)
+    if len(positions):
+        return _match_label(index.originals_of(value_ids), query), positions
+
+    # If empty, tries to extract a location value from query by comparing known values
+    detected = index.detect(query)
+    if detected:
+        # rows where any candidate column contains the detected value
+        return detected, index.rows_containing(detected.strip().lower())
+
+    # Last, tolerates typos ("wakadd", "hinjawadi"): the most similar known value, if close enough
+    candidates = index.suggest(query, limit=1, min_score=LOCALITY_FUZZY_MIN_SCORE)
+    if candidates:
+        return candidates[0][0], index.rows_containing(candidates[0][0].lower())
+    return None, positions
+
+
+def did_you_mean(df: pd.DataFrame, query: str) -> List[Dict[str, Any]]:
+    """
+    "Did you mean" hints for the locality terms of a query that no known value contains.
+    Each entry is {term, matched, candidates: [{locality, score}]}: matched is the value the rows
+    were filtered by (None when nothing was similar enough) and candidates are the values within
+    LOCALITY_AMBIGUITY_MARGIN of it, or every weaker suggestion when nothing matched.
+    Exactly matched terms get no entry.
+    """
+    q = (query or "").strip()
+    if not q:
+        return []
+    index = locality_index(df)
+    hints = []
+    for term in (parse_comparison_query(q) if is_comparison_query(q) else [q]):
+        if len(index.rows_containing(term.lower())) or index.detect(term):
+            continue
+        candidates = index.suggest(term, min_score=LOCALITY_SUGGEST_MIN_SCORE)
+        if not candidates:
+            continue
+        best_name, best_score = candidates[0]
+        matched = best_name if best_score >= LOCALITY_FUZZY_MIN_SCORE else None
+        if matched:
+            candidates = [(name, score) for name, score in candidates if score >= best_score - LOCALITY_AMBIGUITY_MARGIN]
+        hints.append({
+            "term": term,
+            "matched": matched,
+            "candidates": [{"locality": name, "score": round(score, 3)} for name, score in candidates],
+        })
+    return hints
 
 
 def filter_by_area(df: pd.DataFrame, query: str, top: int = 200) -> pd.DataFrame:
@@ -94,45 +374,25 @@ def filter_by_area(df: pd.DataFrame, query: str, top: int = 200) -> pd.DataFrame
     - First, attempt case-insensitive substring match of the entire query against candidate columns.
     - If that yields no rows, attempt to detect a known location value inside the query (extract_area_from_query_using_values)
       and filter for that specific location value.
+    - Failing both, filter for the most similar known value (trigram similarity >= LOCALITY_FUZZY_MIN_SCORE).
+    Both steps are answered from the frame's LocalityIndex instead of scanning every row.
     Returns df.head(top) of filtered results.
     """
-    q = (query or "").strip().lower()
-    if not q:
+    if not (query or "").strip():
         return df.head(top)
+    return rows_at(df, select_area(df, query, top=top))
 
-    df_filtered = pd.DataFrame()
-    candidate_cols = _candidate_location_columns(df)
-
-    # Primary: tries to match the query directly against candidate columns
-    mask = None
-    for c in candidate_cols:
-        try:
-            this_mask = df[c].astype(str).str.lower().str.contains(q, na=False)
-            mask = this_mask if mask is None else (mask | this_mask)
-        except Exception:
-            continue
-    if mask is not None:
-        df_filtered = df[mask].head(top)
 
-    # If empty, tries to extract a location value from query by comparing known values
-    if df_filtered.empty:
-        detected = extract_area_from_query_using_values(df, query)
-        if detected:
-            # filter rows where any candidate column equals (or contains) the detected value
-            mask2 = None
-            for c in candidate_cols:
-                try:
-                    this_mask = df[c].astype(str).str.lower().str.contains(detected.strip().lower(), na=False)
-                    mask2 = this_mask if mask2 is None else (mask2 | this_mask)
-                except Exception:
-                    continue
-            if mask2 is not None:
-                df_filtered = df[mask2].head(top)
-
-    # Final fallback: returns empty (no match) or at least top rows if query empty
-    if df_filtered is None or df_filtered.empty:
+def rows_at(df: pd.DataFrame, positions: np.ndarray) -> pd.DataFrame:
+    """
+    Rows of df at the given positions; an empty selection gives an empty frame with the same columns.
+    """
+    if len(positions) == 0:
         return pd.DataFrame(columns=df.columns)  # empty df with same columns
-    return df_filtered.head(top)
+    if positions[-1] - positions[0] + 1 == len(positions) and np.all(np.diff(positions) == 1):
+        # a run of rows (e.g. an empty query): a slice shares the cached frame's memory instead of copying it
+        return df.iloc[positions[0]:positions[-1] + 1]
+    return df.iloc[positions]
 
 
 def aggregate_for_chart(df: pd.DataFrame, year_col: str = "year", price_col: str = "price", demand_col: str = "demand") -> Dict[str, Any]:
@@ -141,52 +401,42 @@ def aggregate_for_chart(df: pd.DataFrame, year_col: str = "year", price_col: str
       { labels: [years], price: [avg_price], demand: [sum_demand], price_col: actual column name, demand_col: actual column name }
     Attempts to auto-detect columns when standard names not present.
     """
-    df = df.copy()
+    profile = profile_schema(df)
+    # only the three charted columns are gathered, instead of copying the whole frame
+    years = None
     # Detects year column if not found
     if year_col not in df.columns:
-        possible_years = [c for c in df.columns if c.lower() == "year"]
-        if possible_years:
-            year_col = possible_years[0]
-        else:
-            for c in df.columns:
-                if np.issubdtype(df[c].dtype, np.datetime64):
-                    df["year"] = pd.to_datetime(df[c], errors="coerce").dt.year
-                    year_col = "year"
-                    break
+        if profile.year_col:
+            year_col = profile.year_col
+        elif profile.datetime_col:
+            years = pd.to_datetime(df[profile.datetime_col], errors="coerce").dt.year
+            year_col = "year"
+    if years is None:
+        years = df[year_col] if year_col in df.columns else pd.Series(pd.NA, index=df.index)
+        year_col = year_col if year_col in df.columns else "year"
 
     # Detects price/demand candidates
     if price_col not in df.columns:
-        price_candidates = [c for c in df.columns if "price" in c.lower() or "rate" in c.lower() or "weighted average" in c.lower()]
-        price_col = price_candidates[0] if price_candidates else None
+        price_col = profile.price_col
     if demand_col not in df.columns:
-        demand_candidates = [c for c in df.columns if "demand" in c.lower() or "sold" in c.lower() or "units" in c.lower() or "total sold" in c.lower()]
-        demand_col = demand_candidates[0] if demand_candidates else None
-
-    if year_col not in df.columns:
-        df["year"] = pd.NA
-        year_col = "year"
+        demand_col = profile.demand_col
 
     try:
-        df[year_col] = pd.to_numeric(df[year_col], errors="coerce").astype("Int64")
+        years = pd.to_numeric(years, errors="coerce").astype("Int64")
     except Exception:
         pass
 
     price_exists = (price_col in df.columns) if price_col else False
     demand_exists = (demand_col in df.columns) if demand_col else False
-
-    agg_map = {}
-    if price_exists:
-        agg_map["avg_price"] = (price_col, lambda s: pd.to_numeric(s, errors="coerce").mean())
-    else:
-        agg_map["avg_price"] = (price_col or "price", lambda s: np.nan)
-
-    if demand_exists:
-        agg_map["total_demand"] = (demand_col, lambda s: pd.to_numeric(s, errors="coerce").sum())
-    else:
-        agg_map["total_demand"] = (demand_col or "demand", lambda s: np.nan)
+    nan = np.full(len(df), np.nan)
+    data = pd.DataFrame({
+        year_col: years.array,
+        "price": pd.to_numeric(df[price_col], errors="coerce").array if price_exists else nan,
+        "demand": pd.to_numeric(df[demand_col], errors="coerce").array if demand_exists else nan,
+    })
 
     try:
-        grouped = df.groupby(year_col).agg(**agg_map).reset_index().dropna(subset=[year_col], how="any")
+        grouped = data.groupby(year_col).agg(avg_price=("price", "mean"), total_demand=("demand", "sum")).reset_index().dropna(subset=[year_col], how="any")
     except Exception:
         grouped = pd.DataFrame(columns=[year_col, "avg_price", "total_demand"])
 
@@ -204,6 +454,312 @@ def aggregate_for_chart(df: pd.DataFrame, year_col: str = "year", price_col: str
     }
 
 
+def table_records(df: pd.DataFrame, limit: int = 500) -> List[Dict[str, Any]]:
+    """
+    Serialize up to `limit` rows for the JSON table, with missing values as "".
+    Rows are assembled from one list per column (see _cell_values) instead of
+    converting the whole page to objects.
+    """
+    head = df.head(limit)
+    columns = [_cell_values(head.iloc[:, i]) for i in range(head.shape[1])]
+    names = list(head.columns)
+    return [dict(zip(names, row)) for row in zip(*columns)]
+
+
+TABLE_FORMATS = ("records", "columnar")
+TABLE_MAX_PAGE_ROWS = int(os.getenv("TABLE_MAX_PAGE_ROWS", "5000"))
+
+
+def table_page(df: pd.DataFrame, offset: int = 0, limit: int = 500, columns: Optional[List[str]] = None,
+               fmt: str = "records") -> Tuple[Any, Dict[str, Any]]:
+    """
+    One page of the filtered rows for the JSON table, with missing values as "".
+    `columns` projects the page before serialization; fmt="columnar" returns
+    {"columns": [...], "values": [[...] per column]} so column names are sent once.
+    Returns (table, page info with total rows and the offset of the next page or None).
+    """
+    if fmt not in TABLE_FORMATS:
+        raise ValueError(f"Unsupported table format '{fmt}'. Use one of: {', '.join(TABLE_FORMATS)}")
+    if offset < 0 or limit < 0:
+        raise ValueError("offset and limit must not be negative.")
+    limit = min(limit, TABLE_MAX_PAGE_ROWS)
+    if columns:
+        unknown = [c for c in columns if c not in df.columns]
+        if unknown:
+            raise ValueError(f"Unknown column(s): {', '.join(unknown)}")
+    cols = list(columns) if columns else [str(c) for c in df.columns]
+
+    page = df.iloc[offset:offset + limit]
+    if columns:
+        page = page[cols]
+    total = len(df)
+    info = {
+        "offset": offset,
+        "limit": limit,
+        "total": total,
+        "next_offset": offset + limit if offset + limit < total else None,
+        "columns": cols,
+        "format": fmt,
+    }
+    if fmt == "records":
+        return table_records(page, limit=limit), info
+    return {"columns": cols, "values": [_column_values(page.iloc[:, i]) for i in range(page.shape[1])]}, info
+
+
+def _cell_values(s: pd.Series) -> List[Any]:
+    """
+    Values of one table column as Python objects, with missing values as "".
+    Plain NumPy columns are converted in one pass, float NaN replaced by mask; categorical,
+    nullable and string columns go through objects, where fillna("") would raise.
+    """
+    if isinstance(s.dtype, np.dtype) and s.dtype.kind in "biuf":
+        values = s.to_numpy()
+        missing = np.isnan(values) if values.dtype.kind == "f" else None
+        if missing is None or not missing.any():
+            return values.tolist()
+        cells = values.astype(object)
+        cells[missing] = ""
+        return cells.tolist()
+    values = s.astype(object)
+    return values.where(values.notna(), "").tolist()
+
+
+def _column_values(s: pd.Series) -> Any:
+    """
+    Values of one columnar table column. Plain NumPy numeric/bool columns without missing
+    values are returned as arrays, which the orjson renderer writes without per-cell objects;
+    anything else becomes a list with missing values as "".
+    """
+    if isinstance(s.dtype, np.dtype) and s.dtype.kind in "biuf" and not s.hasnans:
+        return s.to_numpy()
+    return _cell_values(s)
+
+
+def aggregate_selection(df: pd.DataFrame, positions: np.ndarray, df_filtered: Optional[pd.DataFrame] = None, price_col: str = "price", demand_col: str = "demand") -> Dict[str, Any]:
+    """
+    Chart data for the rows of `df` at `positions`, same shape and values as aggregate_for_chart.
+    When the selection is made of whole localities it is served from the dataset's
+    AggregateCube; otherwise the selected rows are grouped as usual.
+    """
+    cube = aggregate_cube(df) if len(positions) else None
+    if cube is not None:
+        profile = profile_schema(df)
+        price_col = price_col if price_col in df.columns else profile.price_col
+        demand_col = demand_col if demand_col in df.columns else profile.demand_col
+        servable = all(c is None or c in cube.sums for c in (price_col, demand_col))
+        codes = cube.codes_covering(positions) if servable else None
+        if codes is not None:
+            chart = cube.combine(codes, price_col, demand_col)
+            chart["price_col"] = price_col or ""
+            chart["demand_col"] = demand_col or ""
+            return chart
+    if df_filtered is None:
+        df_filtered = df.iloc[positions]
+    return aggregate_for_chart(df_filtered, year_col="year", price_col=price_col, demand_col=demand_col)
+
+
+_COMPARE_PREFIX_RE = re.compile(r"^\s*compare\s+", re.IGNORECASE)
+_COMPARE_SPLIT_RE = re.compile(r"\s+vs\.?\s+|\s+versus\s+|\s+and\s+|\s+with\s+|\s*&\s*|,", re.IGNORECASE)
+
+
+def is_comparison_query(query: str) -> bool:
+    """
+    True for queries such as "Wakad vs Aundh", "compare A and B" or "A, B".
+    """
+    q = (query or "").lower()
+    return " vs " in q or "compare " in q or ("," in q and len([x for x in q.split(",") if x.strip()]) > 1)
+
+
+def parse_comparison_query(query: str) -> List[str]:
+    """
+    Split a comparison query into its locality parts: "Compare Wakad, Aundh and Baner" -> ["Wakad", "Aundh", "Baner"].
+    """
+    body = _COMPARE_PREFIX_RE.sub("", query or "")
+    return [p.strip() for p in _COMPARE_SPLIT_RE.split(body) if p and p.strip()]
+
+
+def resolve_localities(df: pd.DataFrame, query: str) -> List[Tuple[str, np.ndarray]]:
+    """
+    Resolve every part of a comparison query against the locality index.
+    Returns (label, row positions) per distinct locality found, in query order.
+    """
+    index = locality_index(df)
+    resolved: List[Tuple[str, np.ndarray]] = []
+    seen = set()
+    for part in parse_comparison_query(query):
+        label, positions = _match_area(index, part)
+        if label is None or label.lower() in seen:
+            continue
+        seen.add(label.lower())
+        resolved.append((label, positions))
+    return resolved
+
+
+def select_query(df: pd.DataFrame, query: str, top: Optional[int] = 200) -> Tuple[str, List[Tuple[str, np.ndarray]], np.ndarray]:
+    """
+    Resolve a query into (mode, localities, row positions).
+    Comparison queries select the union of their localities' rows; other queries use select_area.
+    """
+    mode = "comparison" if is_comparison_query(query) else "single"
+    localities = resolve_localities(df, query) if mode == "comparison" else []
+    if localities:
+        positions = np.unique(np.concatenate([rows for _, rows in localities]))[:top]
+    else:
+        positions = select_area(df, query, top=top)
+    return mode, localities, positions
+
+
+def select_query_on_disk(columnar_path: str, query: str, top: Optional[int] = None) -> Tuple[pd.DataFrame, np.ndarray]:
+    """
+    select_query over every row of a converted file without loading or caching the whole frame:
+    only its location columns are read (memory-mapped). Returns (zero-row frame with the dtypes of
+    the whole file, row positions); ingest.iter_columnar_rows then reads the rows themselves.
+    """
+    empty = read_columnar(columnar_path, 0)
+    # categorical (city / locality) columns are read too, for the categories of the whole column
+    wanted = set(profile_schema(empty).location_cols) | {c for c, t in empty.dtypes.items() if isinstance(t, pd.CategoricalDtype)}
+    located = read_columnar(columnar_path, None, columns=[c for c in empty.columns if c in wanted])
+    _, _, positions = select_query(located, query, top=top)
+    return empty.astype({c: located[c].dtype for c in located.columns}), positions
+
+
+def _grouped_comparison(df: pd.DataFrame, localities: List[Tuple[str, np.ndarray]], price_col: Optional[str], demand_col: Optional[str]) -> List[Dict[str, List]]:
+    """
+    Per-locality year-wise charts from one take and one groupby over (locality code, year).
+    Rows shared by several localities are repeated once per locality.
+    """
+    positions = np.concatenate([rows for _, rows in localities])
+    codes = np.repeat(np.arange(len(localities)), [len(rows) for _, rows in localities])
+    frame = df.iloc[positions]
+    years = year_values(frame)
+    nan = np.full(len(frame), np.nan)
+    data = pd.DataFrame({
+        "loc": codes,
+        "year": pd.to_numeric(years, errors="coerce").astype("Int64").array if years is not None else pd.array(nan, dtype="Int64"),
+        "price": pd.to_numeric(frame[price_col], errors="coerce").to_numpy() if price_col in frame.columns else nan,
+        "demand": pd.to_numeric(frame[demand_col], errors="coerce").to_numpy() if demand_col in frame.columns else nan,
+    })
+    grouped = data.groupby(["loc", "year"], sort=True).agg(price=("price", "mean"), demand=("demand", "sum"))
+
+    charts = []
+    for i in range(len(localities)):
+        part = grouped.xs(i, level="loc") if i in grouped.index.get_level_values("loc") else grouped.iloc[0:0]
+        charts.append({
+            "labels": [str(y) for y in part.index],
+            "price": part["price"].fillna(0).round(4).tolist(),
+            "demand": part["demand"].fillna(0).round(4).tolist(),
+        })
+    return charts
+
+
+def aggregate_comparison(df: pd.DataFrame, localities: List[Tuple[str, np.ndarray]], price_col: str = "price", demand_col: str = "demand") -> Dict[str, Any]:
+    """
+    Build one price and one demand series per locality, aligned on the union of years:
+      { labels: [years], price: [{label, data}], demand: [{label, data}] }
+    Years missing for a locality are None. Served from the AggregateCube when every
+    locality is a union of whole cube localities, otherwise from a single grouped pass.
+    """
+    profile = profile_schema(df)
+    price_col = price_col if price_col in df.columns else profile.price_col
+    demand_col = demand_col if demand_col in df.columns else profile.demand_col
+
+    charts: List[Dict[str, List]] = []
+    cube = aggregate_cube(df)
+    if cube is not None and all(c is None or c in cube.sums for c in (price_col, demand_col)):
+        covering = [cube.codes_covering(rows) for _, rows in localities]
+        if all(codes is not None for codes in covering):
+            charts = [cube.combine(codes, price_col, demand_col) for codes in covering]
+    if not charts and localities:
+        charts = _grouped_comparison(df, localities, price_col, demand_col)
+    return align_comparison(localities, charts)
+
+
+def align_comparison(localities: List[Tuple[str, np.ndarray]], charts: List[Dict[str, List]]) -> Dict[str, Any]:
+    """
+    Merge per-locality year-wise charts into the comparison shape of aggregate_comparison.
+    """
+    labels = sorted({y for chart in charts for y in chart["labels"]}, key=int)
+    price_series, demand_series = [], []
+    for (name, _), chart in zip(localities, charts):
+        by_year = dict(zip(chart["labels"], zip(chart["price"], chart["demand"])))
+        price_series.append({"label": name, "data": [by_year[y][0] if y in by_year else None for y in labels]})
+        demand_series.append({"label": name, "data": [by_year[y][1] if y in by_year else None for y in labels]})
+    return {"labels": labels, "price": price_series, "demand": demand_series}
+
+
+def aggregate_selections(df: pd.DataFrame, selections: List[np.ndarray], price_col: str = "price", demand_col: str = "demand") -> List[Dict[str, Any]]:
+    """
+    Chart data for several row selections at once, one aggregate_selection-shaped dict each.
+    Selections made of whole localities are served from the AggregateCube; all the others
+    share a single grouped pass over (selection, year) instead of one groupby per selection.
+    """
+    profile = profile_schema(df)
+    price_col = price_col if price_col in df.columns else profile.price_col
+    demand_col = demand_col if demand_col in df.columns else profile.demand_col
+
+    charts: List[Optional[Dict[str, Any]]] = [None] * len(selections)
+    cube = aggregate_cube(df)
+    if cube is not None and all(c is None or c in cube.sums for c in (price_col, demand_col)):
+        for i, positions in enumerate(selections):
+            codes = cube.codes_covering(positions) if len(positions) else None
+            if codes is not None:
+                charts[i] = cube.combine(codes, price_col, demand_col)
+    rest = [i for i, chart in enumerate(charts) if chart is None]
+    if rest:
+        grouped = _grouped_comparison(df, [(i, selections[i]) for i in rest], price_col, demand_col)
+        for i, chart in zip(rest, grouped):
+            charts[i] = chart
+    for chart in charts:
+        chart["price_col"] = price_col or ""
+        chart["demand_col"] = demand_col or ""
+    return charts
+
+
+GROUP_BY_CHOICES = ("year", "locality", "city")
+
+
+def _group_keys(df: pd.DataFrame, group_by: str) -> Tuple[str, pd.Series]:
+    """
+    (column name, key per row) for a group_by choice; "total" is the per-locality grouping
+    of the MetricSelector and any other column name groups by that column.
+    """
+    profile = profile_schema(df)
+    if group_by == "year":
+        years = year_values(df, profile)
+        if years is not None:
+            return years.name or "year", pd.to_numeric(years, errors="coerce").astype("Int64")
+    elif group_by in ("locality", "total"):
+        if profile.location_cols:
+            return profile.location_cols[0], df[profile.location_cols[0]]
+    elif group_by == "city":
+        if profile.city_col:
+            return profile.city_col, df[profile.city_col]
+    elif group_by in df.columns:
+        return group_by, df[group_by]
+    raise ValueError(f"Dataset has no column to group by '{group_by}'.")
+
+
+def aggregate_by(df: pd.DataFrame, metrics: List[str], aggs: List[str], group_by: str = "year",
+                 positions: Optional[np.ndarray] = None) -> Dict[str, Any]:
+    """
+    Aggregate any numeric columns with several functions (mean/sum/median/min/max/count/pNN)
+    per year, locality or city, for the rows at `positions` (every row when None).
+    Returns aligned series for multi-line and multi-bar charts:
+      { group_by, group_col, labels, rows, series: [{label, metric, agg, data}] }
+    Raises ValueError for unknown metrics, functions or group keys.
+    """
+    profile = profile_schema(df)
+    metrics = metrics or [c for c in (profile.price_col, profile.demand_col) if c]
+    aggs = aggs or ["mean"]
+    missing = [m for m in metrics if m not in df.columns]
+    if missing:
+        raise ValueError(f"Unknown metric column(s): {', '.join(missing)}")
+    frame = df.iloc[positions] if positions is not None else df
+    group_col, keys = _group_keys(frame, group_by)
+    result = aggregate_metrics(keys, frame, metrics, aggs)
+    return {"group_by": group_by, "group_col": group_col, **result}
+
+
 def make_summary(df_filtered: pd.DataFrame, chart: Dict[str, Any], query: str) -> str:
     """
     Create a simple fallback summary (2-3 sentences).
@@ -233,16 +789,23 @@ def make_summary(df_filtered: pd.DataFrame, chart: Dict[str, Any], query: str) -
         else:
             demand_line = "Demand data not available."
 
+        label_col = profile_schema(df_filtered).label_col
         sample_rows = []
         for _, row in df_filtered.head(3).iterrows():
             y = row.get("year", "")
-            loc = ""
-            for c in df_filtered.columns:
-                if "location" in c.lower() or "area" in c.lower() or "final location" in c.lower():
-                    loc = row.get(c, "")
-                    break
+            loc = row.get(label_col, "") if label_col else ""
             sample_rows.append(f"- {loc} | {y} | {chart.get('price_col','price')}: {row.get(chart.get('price_col', ''), '')}")
 
+        comparison = chart.get("comparison")
+        if comparison and comparison.get("price"):
+            parts = []
+            for series in comparison["price"]:
+                points = [p for p in series["data"] if p is not None]
+                if points:
+                    parts.append(f"{series['label']} {round(points[0],2)} -> {round(points[-1],2)}")
+            if parts:
+                price_line += f" By locality: {'; '.join(parts)}."
+
         sample_text = "\n".join(sample_rows)
         return f"Found {n} records matching '{query}'.\n{price_line} {demand_line}\nTop {min(3,n)} sample rows:\n{sample_text}"
     except Exception as e:
@@ -250,10 +813,125 @@ def make_summary(df_filtered: pd.DataFrame, chart: Dict[str, Any], query: str) -
         return f"Found {len(df_filtered)} records matching '{query}'."
 
 
+LLM_SYSTEM_PROMPT = "You are a concise assistant that summarizes real-estate aggregated statistics into 2-3 sentences."
+
+_llm_client = None
+_llm_client_lock = threading.Lock()
+
+
+def _get_llm_client(api_key: str):
+    """
+    One OpenAI client per process (it holds the HTTP connection pool).
+    OPENAI_BASE_URL points it at any compatible server, e.g. a local stub in tests.
+    """
+    global _llm_client
+    with _llm_client_lock:
+        if _llm_client is None:
+            _llm_client = openai.OpenAI(
+                api_key=api_key,
+                base_url=os.getenv("OPENAI_BASE_URL") or None,
+                timeout=LLM_TIMEOUT,
+                max_retries=0,
+            )
+        return _llm_client
+
+
+# event loop -> AsyncOpenAI client / in-flight calls; async HTTP clients cannot be shared between loops
+_async_llm_clients: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+_async_llm_inflight: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+
+
+def _get_async_llm_client(api_key: str):
+    loop = asyncio.get_running_loop()
+    client = _async_llm_clients.get(loop)
+    if client is None:
+        client = openai.AsyncOpenAI(
+            api_key=api_key,
+            base_url=os.getenv("OPENAI_BASE_URL") or None,
+            timeout=LLM_TIMEOUT,
+            max_retries=0,
+        )
+        _async_llm_clients[loop] = client
+    return client
+
+
+def _request_llm_summary(prompt: str, model: str, max_tokens: int, api_key: str) -> Optional[str]:
+    messages = [
+        {"role": "system", "content": LLM_SYSTEM_PROMPT},
+        {"role": "user", "content": prompt},
+    ]
+    logger.debug("Calling OpenAI chat completion for prompt length %d", len(prompt))
+    if hasattr(openai, "OpenAI"):
+        response = _get_llm_client(api_key).chat.completions.create(
+            model=model, messages=messages, max_tokens=max_tokens, temperature=0.2
+        )
+        text = response.choices[0].message.content if response.choices else None
+    else:
+        # legacy (<1.0) openai package
+        openai.api_key = api_key
+        if os.getenv("OPENAI_BASE_URL"):
+            openai.api_base = os.getenv("OPENAI_BASE_URL")
+        response = openai.ChatCompletion.create(
+            model=model, messages=messages, max_tokens=max_tokens, temperature=0.2, request_timeout=LLM_TIMEOUT
+        )
+        text = None
+        if response and "choices" in response and len(response.choices) > 0:
+            choice = response.choices[0]
+            if getattr(choice, "message", None):
+                text = choice.message.get("content")
+            else:
+                text = choice.get("text")
+    return text.strip() if text else None
+
+
+def stream_llm_summary(prompt: str, model: str = "gpt-4o-mini", max_tokens: int = 200) -> Iterator[str]:
+    """
+    Yield the LLM summary for `prompt` piece by piece as the model produces it.
+    A summary already in the cache is yielded whole; a completed stream is added to the cache.
+    Yields nothing when the LLM is not configured; upstream errors propagate to the caller.
+    """
+    api_key = os.getenv("OPENAI_API_KEY")
+    if not api_key or openai is None or not hasattr(openai, "OpenAI"):
+        logger.debug("Streaming LLM client unavailable — skipping LLM call.")
+        return
+
+    model = os.getenv("OPENAI_MODEL", model)
+    key = prompt_key(prompt, model, max_tokens)
+    cached = summary_cache.get(key)
+    if cached is not None:
+        yield cached
+        return
+
+    pieces: List[str] = []
+    completed = False
+    try:
+        stream = _get_llm_client(api_key).chat.completions.create(
+            model=model,
+            messages=[
+                {"role": "system", "content": LLM_SYSTEM_PROMPT},
+                {"role": "user", "content": prompt},
+            ],
+            max_tokens=max_tokens,
+            temperature=0.2,
+            stream=True,
+        )
+        for event in stream:
+            delta = event.choices[0].delta.content if event.choices else None
+            if delta:
+                pieces.append(delta)
+                yield delta
+        completed = True
+    finally:
+        # an abandoned stream (client disconnected, upstream error) is counted as a failure, not cached
+        summary_cache.put(key, "".join(pieces).strip() if completed else None)
+
+
 def generate_llm_summary(prompt: str, model: str = "gpt-4o-mini", max_tokens: int = 200) -> Optional[str]:
     """
     Generate summary using OpenAI. Requires OPENAI_API_KEY to be set.
-    Returns string summary or None if something fails.
+    Returns string summary or None if something fails (callers fall back to make_summary).
+    Summaries are cached by prompt hash (TTL + LRU, see llm_cache) and concurrent
+    requests for the same prompt share one upstream call, bounded by LLM_TIMEOUT.
     """
     api_key = os.getenv("OPENAI_API_KEY")
     if not api_key:
@@ -263,29 +941,56 @@ def generate_llm_summary(prompt: str, model: str = "gpt-4o-mini", max_tokens: in
         logger.debug("openai package not installed; can't call LLM.")
         return None
 
+    model = os.getenv("OPENAI_MODEL", model)
+    return summary_cache.get_or_compute(
+        prompt_key(prompt, model, max_tokens),
+        lambda: _request_llm_summary(prompt, model, max_tokens, api_key),
+        wait_timeout=LLM_TIMEOUT,
+    )
+
+
+async def generate_llm_summary_async(prompt: str, model: str = "gpt-4o-mini", max_tokens: int = 200) -> Optional[str]:
+    """
+    Async variant of generate_llm_summary for the ASGI analyze view. Shares the summary cache;
+    concurrent requests on the same event loop await one upstream call.
+    Returns None when the LLM is not configured, fails or times out.
+    """
+    api_key = os.getenv("OPENAI_API_KEY")
+    if not api_key or openai is None or not hasattr(openai, "AsyncOpenAI"):
+        logger.debug("Async LLM client unavailable — skipping LLM call.")
+        return None
+
+    model = os.getenv("OPENAI_MODEL", model)
+    key = prompt_key(prompt, model, max_tokens)
+    cached = summary_cache.get(key)
+    if cached is not None:
+        return cached
+
+    loop = asyncio.get_running_loop()
+    inflight = _async_llm_inflight.setdefault(loop, {})
+    if key in inflight:
+        summary_cache.note_coalesced()
+        return await asyncio.shield(inflight[key])
+
+    future = loop.create_future()
+    inflight[key] = future
+    text = None
     try:
-        openai.api_key = api_key
-        logger.debug("Calling OpenAI ChatCompletion for prompt length %d", len(prompt))
-        response = openai.ChatCompletion.create(
-            model=os.getenv("OPENAI_MODEL", model),
+        response = await _get_async_llm_client(api_key).chat.completions.create(
+            model=model,
             messages=[
-                {"role": "system", "content": "You are a concise assistant that summarizes real-estate aggregated statistics into 2-3 sentences."},
+                {"role": "system", "content": LLM_SYSTEM_PROMPT},
                 {"role": "user", "content": prompt},
             ],
             max_tokens=max_tokens,
             temperature=0.2,
         )
-        text = None
-        if response and "choices" in response and len(response.choices) > 0:
-            choice = response.choices[0]
-            # new API shapes may return message
-            if getattr(choice, "message", None):
-                text = choice.message.get("content")
-            else:
-                text = choice.get("text")
-        if text:
-            return text.strip()
+        content = response.choices[0].message.content if response.choices else None
+        text = content.strip() if content else None
     except Exception as e:
         logger.exception("LLM call failed: %s", e)
-        return None
-    return None
+    finally:
+        inflight.pop(key, None)
+        summary_cache.put(key, text)
+        future.set_result(text)
+    return text
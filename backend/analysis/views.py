@@ -1,27 +1,76 @@
 # backend/analysis/views.py
 import os
-import tempfile
+import asyncio
+import uuid
+import functools
+import contextvars
 import logging
-from typing import Any, Dict, Optional
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 
+import numpy as np
 import pandas as pd
-from django.http import JsonResponse, HttpResponse
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.views.decorators.http import require_GET
 from rest_framework import status
-from rest_framework.decorators import api_view, parser_classes
+from rest_framework.decorators import api_view, parser_classes, renderer_classes
 from rest_framework.parsers import MultiPartParser, FormParser
 from rest_framework.response import Response
 
 from .utils import (
     load_dataset_from_path,
-    filter_by_area,
-    aggregate_for_chart,
+    resolve_dataset_path,
+    select_query,
+    select_query_on_disk,
+    rows_at,
+    aggregate_selection,
+    aggregate_selections,
+    aggregate_comparison,
+    align_comparison,
     make_summary,
     generate_llm_summary,
+    generate_llm_summary_async,
+    stream_llm_summary,
+    table_page,
+    geo_index,
+    locality_index,
+    aggregate_by,
+    did_you_mean,
+    dataset_cache,
+    loaded_usage,
+)
+from .geo import check_point, check_radius
+from .ingest import ANALYSIS_MAX_ROWS, UPLOAD_DIR, fresh_columnar_path, iter_columnar_rows
+from .jobs import submit_ingest, get_job
+from .federation import register_dataset, get_dataset, list_datasets, federated_frame, summary_aggregate
+from .export import EXPORT_FORMATS, EXPORT_CHUNK_ROWS, check_export_format, stream_export, stream_export_chunks
+from .schema import profile_schema
+from .llm_cache import summary_cache
+from .renderers import ANALYSIS_RENDERERS, ORJSONRenderer
+from .timing import instrumented, stage, render_prometheus
+from .memory import memory_report
+from .response_cache import (
+    response_cache,
+    response_cache_key,
+    dataset_version,
+    normalize_query,
+    make_etag,
+    etag_matches,
 )
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.DEBUG)
 
+# threads running pandas work for the async analyze view (per process)
+ANALYZE_EXECUTOR_WORKERS = int(os.getenv("ANALYZE_EXECUTOR_WORKERS", "4"))
+_analysis_executor: Optional[ThreadPoolExecutor] = None
+_analysis_executor_lock = threading.Lock()
+# batch analyze: queries per request, and LLM summaries in flight at once (per process, shared by all batches)
+ANALYZE_BATCH_MAX_QUERIES = int(os.getenv("ANALYZE_BATCH_MAX_QUERIES", "50"))
+ANALYZE_BATCH_LLM_CONCURRENCY = int(os.getenv("ANALYZE_BATCH_LLM_CONCURRENCY", "4"))
+_batch_llm_executor: Optional[ThreadPoolExecutor] = None
+
 
 @api_view(["POST"])
 @parser_classes([MultiPartParser, FormParser])
@@ -29,14 +78,26 @@ def upload_view(request):
     """
     POST /api/upload/
     Accepts multipart/form-data with 'file'. Saves file to temp dir and returns its path.
+    Parsing, type casting, profiling and indexing run as a background job; the response
+    carries a job_id to poll at /api/upload/status/. The path can be analyzed right away
+    (the raw file is read until the job has finished). Send background=false to wait for it.
+    With append_to=<dataset> the file holds new rows (e.g. a monthly update) for a registered
+    dataset: it is stored under a unique name and added as a new partition, so only its rows are processed.
     """
     uploaded_file = request.FILES.get("file")
     if not uploaded_file:
         return Response({"error": "No file provided."}, status=status.HTTP_400_BAD_REQUEST)
+    append_to = str(request.data.get("append_to", "")).strip() or None
+    if append_to and get_dataset(append_to) is None:
+        return Response({"error": f"Unknown dataset '{append_to}'."}, status=status.HTTP_404_NOT_FOUND)
 
-    tmpdir = tempfile.gettempdir()
-    save_path = os.path.join(tmpdir, uploaded_file.name)
+    filename = os.path.basename(uploaded_file.name)
+    if append_to:
+        # monthly updates often reuse one file name; never overwrite an existing partition
+        filename = f"{append_to}_{uuid.uuid4().hex[:12]}_{filename}"
+    save_path = os.path.join(UPLOAD_DIR, filename)
     try:
+        os.makedirs(UPLOAD_DIR, exist_ok=True)
         with open(save_path, "wb") as fh:
             for chunk in uploaded_file.chunks():
                 fh.write(chunk)
@@ -44,105 +105,784 @@ def upload_view(request):
         logger.exception("Failed to save uploaded file: %s", e)
         return Response({"error": f"Failed to save file: {str(e)}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
-    return Response({"status": "ok", "path": save_path}, status=status.HTTP_200_OK)
+    background = str(request.data.get("background", "true")).lower() not in ("0", "false", "no")
+    try:
+        job = submit_ingest(save_path, background=background, dataset=append_to)
+    except Exception as e:
+        logger.exception("Failed to start ingestion for %s: %s", save_path, e)
+        if append_to:
+            return Response({"error": f"Failed to append to dataset: {str(e)}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        return Response({"status": "ok", "path": save_path, "columnar": False}, status=status.HTTP_200_OK)
+
+    if not background:
+        if job["state"] == "failed" and append_to:
+            return Response({"error": f"Failed to append to dataset: {job['error']}", "job_id": job["job_id"]}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        body = {"status": "ok", "path": save_path, "columnar": job["columnar"], "job_id": job["job_id"], "rows": job["rows"]}
+        if append_to:
+            body.update(dataset=append_to, dataset_rows=job.get("dataset_rows"))
+        return Response(body, status=status.HTTP_200_OK)
+    body = {"status": "accepted", "path": save_path, "job_id": job["job_id"]}
+    if append_to:
+        body["dataset"] = append_to
+    return Response(body, status=status.HTTP_202_ACCEPTED)
 
 
 @api_view(["GET"])
-def analyze_view(request):
+def upload_status_view(request):
     """
-    GET /api/analyze/?query=<q>&top=<n>&use_llm=true|false&file=<path>
-    Returns JSON: { mode, summary, chart, table }
+    GET /api/upload/status/?job=<job_id>
+    Returns the ingestion job: state (queued|running|done|failed), rows converted so far,
+    progress (0..1, null when the input size is unknown) and error.
     """
-    query = request.GET.get("query", "")
+    job = get_job(request.GET.get("job", ""))
+    if job is None:
+        return Response({"error": "Unknown job."}, status=status.HTTP_404_NOT_FOUND)
+    return Response(job, status=status.HTTP_200_OK)
+
+
+def _build_analysis(df: pd.DataFrame, query: str, top: int, table_opts: Optional[Dict[str, Any]] = None) -> Tuple[Dict[str, Any], pd.DataFrame]:
+    """
+    The pandas part of an analyze request: selection, chart and one table page (see table_page).
+    Returns (payload without summary, filtered rows).
+    """
+    with stage("select"):
+        mode, localities, positions = select_query(df, query, top=top)
+        df_filtered = rows_at(df, positions)
+
+    # Build chart data (served from the dataset's aggregate cube when possible)
+    with stage("aggregate"):
+        chart = aggregate_selection(df, positions, df_filtered=df_filtered, price_col="price", demand_col="demand")
+        if localities:
+            chart["comparison"] = aggregate_comparison(df, localities, price_col="price", demand_col="demand")
+
+    with stage("table"):
+        table, page = table_page(df_filtered, **(table_opts or {}))
+    payload = {
+        "mode": mode,
+        "summary": None,
+        "chart": chart,
+        "table": table,
+        "table_page": page,
+        "query": query,
+        "did_you_mean": did_you_mean(df, query),
+    }
+    return payload, df_filtered
+
+
+def _llm_prompt(chart: Dict[str, Any], n_rows: int, query: str) -> str:
+    prompt = (
+        f"Given aggregated data: years {chart.get('labels', [])}, average prices {chart.get('price', [])}, "
+        f"demands {chart.get('demand', [])}. Also {n_rows} raw rows from query '{query}'. "
+    )
+    if chart.get("comparison"):
+        prompt += "Per-locality average prices: " + "; ".join(
+            f"{s['label']} {s['data']}" for s in chart["comparison"]["price"]
+        ) + ". "
+    prompt += (
+        "Provide a concise 3-sentence analysis highlighting the price trend, demand observation, and one actionable insight."
+    )
+    return prompt
+
+
+def _analyze(df: pd.DataFrame, query: str, top: int, use_llm: bool, table_opts: Optional[Dict[str, Any]] = None) -> Tuple[Dict[str, Any], bool]:
+    """
+    Build the analyze response body for an already loaded dataset.
+    Returns (payload, cacheable); a requested LLM summary that failed is not cacheable.
+    """
+    payload, df_filtered = _build_analysis(df, query, top, table_opts)
+
+    # Build summary (LLM optional)
+    summary_text: Optional[str] = None
+    if use_llm:
+        try:
+            with stage("llm"):
+                summary_text = generate_llm_summary(_llm_prompt(payload["chart"], len(df_filtered), query))
+        except Exception as e:
+            logger.exception("LLM generation failed: %s", e)
+            summary_text = None
+
+    cacheable = bool(summary_text) or not use_llm
+    if not summary_text:
+        with stage("summary"):
+            summary_text = make_summary(df_filtered, payload["chart"], query)
+    payload["summary"] = summary_text
+    return payload, cacheable
+
+
+def _analyze_params(request) -> Tuple[str, int, bool, Optional[str], Dict[str, Any]]:
+    """
+    Parse the analyze query string; raises ValueError for malformed numbers.
+    The last item holds the table options passed to table_page.
+    """
+    query = normalize_query(request.GET.get("query", ""))
     top = int(request.GET.get("top", 200))
     use_llm_raw = request.GET.get("use_llm", "false").lower()
-    use_llm = use_llm_raw in ("1", "true", "yes")
+    use_llm = use_llm_raw in ("1", "true", "yes") and bool(os.getenv("OPENAI_API_KEY"))
     file_path = request.GET.get("file")  # optional path returned after upload
+    columns = [c.strip() for c in request.GET.get("columns", "").split(",") if c.strip()]
+    table_opts = {
+        "offset": int(request.GET.get("offset", 0)),
+        "limit": int(request.GET.get("limit", 500)),
+        "columns": columns or None,
+        "fmt": request.GET.get("table_format", "records").lower(),
+    }
+    return query, top, use_llm, file_path, table_opts
+
+
+def _analyze_cache_key(query: str, top: int, use_llm: bool, file_path: Optional[str], table_opts: Dict[str, Any]) -> Optional[str]:
+    if response_cache is None:
+        return None
+    try:
+        version = dataset_version(resolve_dataset_path(file_path))
+    except OSError:
+        return None  # missing file: loading the dataset reports it
+    variant = f"{table_opts['offset']}:{table_opts['limit']}:{table_opts['fmt']}:{','.join(table_opts['columns'] or [])}"
+    return response_cache_key(query, top, use_llm, version, variant)
+
+
+def _negotiated_renderer(request):
+    """
+    Renderer for the plain Django views, picked from ANALYSIS_RENDERERS by the Accept header (JSON by default).
+    """
+    accept = request.headers.get("Accept", "")
+    for renderer_class in ANALYSIS_RENDERERS[1:]:
+        if renderer_class.media_type in accept:
+            return renderer_class()
+    return ORJSONRenderer()
+
+
+def _cached_response(payload: Dict[str, Any], etag: str, request, cache_status: str, renderer=None):
+    if etag_matches(request.headers.get("If-None-Match"), etag):
+        resp = HttpResponse(status=status.HTTP_304_NOT_MODIFIED) if renderer else Response(status=status.HTTP_304_NOT_MODIFIED)
+    elif renderer:
+        with stage("render"):
+            body = renderer.render(payload)
+        resp = HttpResponse(body, content_type=renderer.media_type, status=status.HTTP_200_OK)
+    else:
+        resp = Response(payload, status=status.HTTP_200_OK)
+    resp["ETag"] = etag
+    # browsers keep the body but revalidate it with If-None-Match on every request
+    resp["Cache-Control"] = "private, no-cache"
+    resp["X-Cache"] = cache_status
+    return resp
+
+
+@instrumented("analyze")
+@api_view(["GET"])
+@renderer_classes(ANALYSIS_RENDERERS)
+def analyze_view(request):
+    """
+    GET /api/analyze/?query=<q>&top=<n>&use_llm=true|false&file=<path>
+    Returns JSON: { mode, summary, chart, table, did_you_mean }
+    Misspelled localities are matched by trigram similarity; did_you_mean lists the
+    corrections and, for ambiguous terms, the close alternatives.
+    Comparison queries ("A vs B", "compare A, B and C") are resolved into one
+    locality each; chart.comparison then holds one price and one demand series per locality.
+    Responses are cached by (normalized query, top, LLM flag, dataset content hash) and carry
+    an ETag, so clients can revalidate with If-None-Match and receive 304 Not Modified.
+    Accept: application/msgpack or application/vnd.apache.arrow.stream selects a binary encoding.
+    Stage durations are reported in the Server-Timing header (see timing.py).
+    """
+    try:
+        query, top, use_llm, file_path, table_opts = _analyze_params(request)
+    except ValueError as e:
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    with stage("cache"):
+        cache_key = _analyze_cache_key(query, top, use_llm, file_path, table_opts)
+        cached = response_cache.get(cache_key) if cache_key else None
+    if cached:
+        etag, payload = cached
+        return _cached_response(payload, etag, request, "HIT")
 
     # Load dataset
     try:
-        df = load_dataset_from_path(file_path, top=50000)
+        with stage("load"):
+            df = load_dataset_from_path(file_path, top=ANALYSIS_MAX_ROWS)
     except Exception as e:
         logger.exception("Failed to load dataset: %s", e)
         return Response({"error": f"Failed to load dataset: {str(e)}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
-    # Filter by area/query
     try:
-        df_filtered = filter_by_area(df, query, top=top)
+        payload, cacheable = _analyze(df, query, top, use_llm, table_opts)
+    except ValueError as e:
+        # invalid table options (unknown column, format)
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
     except Exception as e:
         logger.exception("Filtering failed: %s", e)
         return Response({"error": f"Filtering failed: {str(e)}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
-    # Coerce year if present
-    if "year" in df_filtered.columns:
-        try:
-            df_filtered["year"] = pd.to_numeric(df_filtered["year"], errors="coerce").astype("Int64")
-        except Exception:
-            pass
+    with stage("etag"):
+        etag = make_etag(payload)
+        if cache_key and cacheable:
+            response_cache.set(cache_key, (etag, payload))
+    return _cached_response(payload, etag, request, "MISS")
 
-    # Build chart data
-    chart = aggregate_for_chart(df_filtered, year_col="year", price_col="price", demand_col="demand")
 
-    # Build summary (LLM optional)
+def _run_blocking(fn, *args):
+    """
+    Run pandas work on the bounded analysis executor so the event loop stays free.
+    The caller's context goes along, so stage timings recorded in the thread reach the request.
+    """
+    ctx = contextvars.copy_context()
+    return asyncio.get_running_loop().run_in_executor(_get_analysis_executor(), ctx.run, functools.partial(fn, *args))
+
+
+def _get_analysis_executor() -> ThreadPoolExecutor:
+    global _analysis_executor
+    with _analysis_executor_lock:
+        if _analysis_executor is None:
+            _analysis_executor = ThreadPoolExecutor(max_workers=max(1, ANALYZE_EXECUTOR_WORKERS), thread_name_prefix="analyze")
+        return _analysis_executor
+
+
+@instrumented("analyze_async")
+@require_GET
+async def analyze_async_view(request):
+    """
+    GET /api/analyze/async/ - same parameters and response as /api/analyze/.
+    Native async view for ASGI deployments: loading, filtering and aggregation run on a
+    bounded thread pool (ANALYZE_EXECUTOR_WORKERS) and the LLM call is awaited with the
+    async OpenAI client, so one worker can hold many in-flight LLM requests.
+    """
+    renderer = _negotiated_renderer(request)
+    try:
+        query, top, use_llm, file_path, table_opts = _analyze_params(request)
+    except ValueError as e:
+        return HttpResponse(renderer.render({"error": str(e)}), content_type=renderer.media_type, status=status.HTTP_400_BAD_REQUEST)
+
+    # the first call for a file hashes its contents, so it also runs off the loop
+    with stage("cache"):
+        cache_key = await _run_blocking(_analyze_cache_key, query, top, use_llm, file_path, table_opts)
+        cached = response_cache.get(cache_key) if cache_key else None
+    if cached:
+        etag, payload = cached
+        return _cached_response(payload, etag, request, "HIT", renderer=renderer)
+
+    try:
+        with stage("load"):
+            df = await _run_blocking(load_dataset_from_path, file_path, ANALYSIS_MAX_ROWS)
+    except Exception as e:
+        logger.exception("Failed to load dataset: %s", e)
+        return HttpResponse(renderer.render({"error": f"Failed to load dataset: {str(e)}"}), content_type=renderer.media_type,
+                            status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+    try:
+        payload, df_filtered = await _run_blocking(_build_analysis, df, query, top, table_opts)
+    except ValueError as e:
+        return HttpResponse(renderer.render({"error": str(e)}), content_type=renderer.media_type, status=status.HTTP_400_BAD_REQUEST)
+    except Exception as e:
+        logger.exception("Filtering failed: %s", e)
+        return HttpResponse(renderer.render({"error": f"Filtering failed: {str(e)}"}), content_type=renderer.media_type,
+                            status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
     summary_text: Optional[str] = None
-    if use_llm and os.getenv("OPENAI_API_KEY"):
+    if use_llm:
         try:
-            prompt = (
-                f"Given aggregated data: years {chart.get('labels', [])}, average prices {chart.get('price', [])}, "
-                f"demands {chart.get('demand', [])}. Also {len(df_filtered)} raw rows from query '{query}'. "
-                "Provide a concise 3-sentence analysis highlighting the price trend, demand observation, and one actionable insight."
-            )
-            llm_res = generate_llm_summary(prompt)
-            if llm_res:
-                summary_text = llm_res
+            with stage("llm"):
+                summary_text = await generate_llm_summary_async(_llm_prompt(payload["chart"], len(df_filtered), query))
         except Exception as e:
             logger.exception("LLM generation failed: %s", e)
             summary_text = None
-
+    cacheable = bool(summary_text) or not use_llm
     if not summary_text:
-        summary_text = make_summary(df_filtered, chart, query)
+        with stage("summary"):
+            summary_text = await _run_blocking(make_summary, df_filtered, payload["chart"], query)
+    payload["summary"] = summary_text
+
+    with stage("etag"):
+        etag = make_etag(payload)
+        if cache_key and cacheable:
+            response_cache.set(cache_key, (etag, payload))
+    return _cached_response(payload, etag, request, "MISS", renderer=renderer)
+
+
+def _sse(event: str, data: Any, renderer: ORJSONRenderer) -> bytes:
+    return b"event: " + event.encode("ascii") + b"\ndata: " + renderer.render(data) + b"\n\n"
+
+
+def _iter_analysis_events(payload: Dict[str, Any], df_filtered: Optional[pd.DataFrame], query: str, use_llm: bool,
+                          cache_key: Optional[str]) -> Iterator[bytes]:
+    """
+    SSE events of a streamed analysis: "result" (everything but the summary), then "token" events
+    while the LLM writes, then "summary" with the final text and "done".
+    """
+    renderer = ORJSONRenderer()
+    yield _sse("result", {k: v for k, v in payload.items() if k != "summary"}, renderer)
+
+    if payload.get("summary"):
+        # served from the response cache
+        yield _sse("summary", {"summary": payload["summary"]}, renderer)
+        yield _sse("done", {}, renderer)
+        return
+
+    pieces = []
+    if use_llm:
+        try:
+            for piece in stream_llm_summary(_llm_prompt(payload["chart"], len(df_filtered), query)):
+                pieces.append(piece)
+                yield _sse("token", {"text": piece}, renderer)
+        except Exception as e:
+            logger.exception("LLM streaming failed: %s", e)
+            yield _sse("error", {"error": "LLM summary unavailable; using the built-in summary."}, renderer)
+    summary_text = "".join(pieces).strip()
+    cacheable = bool(summary_text) or not use_llm
+    payload["summary"] = summary_text or make_summary(df_filtered, payload["chart"], query)
+    yield _sse("summary", {"summary": payload["summary"]}, renderer)
+
+    if cache_key and cacheable:
+        response_cache.set(cache_key, (make_etag(payload), payload))
+    yield _sse("done", {}, renderer)
+
+
+@require_GET
+def analyze_stream_view(request):
+    """
+    GET /api/analyze/stream/ - same parameters as /api/analyze/, answered as Server-Sent Events.
+    The chart and table are sent as soon as pandas is done ("result" event); the summary
+    follows token by token ("token" events) and in full ("summary"), then "done".
+    A plain Django view: DRF content negotiation would reject EventSource's Accept header.
+    """
+    try:
+        query, top, use_llm, file_path, table_opts = _analyze_params(request)
+    except ValueError as e:
+        return JsonResponse({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    cache_key = _analyze_cache_key(query, top, use_llm, file_path, table_opts)
+    cached = response_cache.get(cache_key) if cache_key else None
+    if cached:
+        payload, df_filtered = dict(cached[1]), None
+    else:
+        try:
+            df = load_dataset_from_path(file_path, top=ANALYSIS_MAX_ROWS)
+        except Exception as e:
+            logger.exception("Failed to load dataset: %s", e)
+            return JsonResponse({"error": f"Failed to load dataset: {str(e)}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        try:
+            payload, df_filtered = _build_analysis(df, query, top, table_opts)
+        except ValueError as e:
+            return JsonResponse({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        except Exception as e:
+            logger.exception("Filtering failed: %s", e)
+            return JsonResponse({"error": f"Filtering failed: {str(e)}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+    resp = StreamingHttpResponse(_iter_analysis_events(payload, df_filtered, query, use_llm, cache_key), content_type="text/event-stream")
+    resp["Cache-Control"] = "no-cache"
+    resp["X-Accel-Buffering"] = "no"  # keep nginx-style proxies from buffering the events
+    return resp
+
+
+def _float_param(request, name: str) -> Optional[float]:
+    raw = request.GET.get(name)
+    return float(raw) if raw not in (None, "") else None
+
+
+@api_view(["GET"])
+def geo_view(request):
+    """
+    GET /api/geo/?bbox=<min_lat>,<min_lng>,<max_lat>,<max_lng>
+    GET /api/geo/?near=<locality>&radius_km=<km>   (or lat=<lat>&lng=<lng>&radius_km=<km>)
+    Returns one aggregated point per locality (mean coordinates, rows, average price, total demand)
+    from a grid index built once per dataset; radius results are nearest first with distance_km.
+    Without bbox/near/lat every locality is returned. Optional: file=<path>, limit=<n>.
+    """
+    try:
+        bbox = [float(v) for v in request.GET["bbox"].split(",")] if request.GET.get("bbox") else None
+        lat, lng = _float_param(request, "lat"), _float_param(request, "lng")
+        radius_km = _float_param(request, "radius_km")
+        limit = int(request.GET["limit"]) if request.GET.get("limit") else None
+    except ValueError:
+        return Response({"error": "bbox, lat, lng, radius_km and limit must be numbers."}, status=status.HTTP_400_BAD_REQUEST)
+    if limit is not None and limit < 1:
+        return Response({"error": f"Invalid limit '{limit}'; it must be at least 1."}, status=status.HTTP_400_BAD_REQUEST)
+    if bbox is not None and len(bbox) != 4:
+        return Response({"error": "bbox must be min_lat,min_lng,max_lat,max_lng."}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        if bbox is not None:
+            check_point(bbox[0], bbox[1])
+            check_point(bbox[2], bbox[3])
+        if lat is not None or lng is not None:
+            check_point(lat if lat is not None else 0.0, lng if lng is not None else 0.0)
+        if radius_km is not None:
+            check_radius(radius_km)
+    except ValueError as e:
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    near = (request.GET.get("near") or "").strip()
+
+    try:
+        df = load_dataset_from_path(request.GET.get("file"), top=ANALYSIS_MAX_ROWS)
+        index = geo_index(df)
+    except Exception as e:
+        logger.exception("Geo: failed to load dataset: %s", e)
+        return Response({"error": f"Failed to load dataset: {str(e)}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+    if index is None:
+        return Response({"error": "Dataset has no locality latitude/longitude columns."}, status=status.HTTP_400_BAD_REQUEST)
+
+    center = None
+    if near:
+        label = locality_index(df).detect(near) or near
+        found = index.find(label)
+        if found is None:
+            return Response({"error": f"No coordinates found for '{near}'."}, status=status.HTTP_404_NOT_FOUND)
+        center = {"label": index.labels[found], "lat": float(index.lat[found]), "lng": float(index.lng[found])}
+    elif lat is not None and lng is not None:
+        center = {"label": None, "lat": lat, "lng": lng}
+
+    if center is not None:
+        positions = index.radius(center["lat"], center["lng"], radius_km if radius_km is not None else 5.0)
+        points = index.points(positions[:limit], origin=(center["lat"], center["lng"]))
+    else:
+        positions = index.bbox(*bbox) if bbox is not None else np.arange(len(index))
+        points = index.points(positions[:limit])
+
+    return Response(
+        {
+            "points": points,
+            "count": len(positions),
+            "center": center,
+            "price_col": index.price_col,
+            "demand_col": index.demand_col,
+        },
+        status=status.HTTP_200_OK,
+    )
+
+
+def _list_param(request, name: str) -> List[str]:
+    """
+    Values of a list parameter given as repeated keys and/or comma-separated.
+    """
+    return [v.strip() for raw in request.GET.getlist(name) for v in raw.split(",") if v.strip()]
+
+
+@api_view(["GET"])
+def aggregate_view(request):
+    """
+    GET /api/aggregate/?metrics=<col>,<col>&agg=mean,sum,median,p90&group_by=year|locality|city
+    Every metric aggregated with every function in one grouped pass, as series aligned on the
+    group labels (ready for the multi-line and multi-bar charts). Optional: query=<text> to
+    aggregate only the rows the analyze endpoint would select, file=<path>.
+    Defaults: the detected price and demand columns, agg=mean, group_by=year.
+    """
+    query = request.GET.get("query", "")
+    group_by = (request.GET.get("group_by") or "year").strip()
+    metrics = _list_param(request, "metrics")
+    aggs = _list_param(request, "agg")
+
+    try:
+        df = load_dataset_from_path(request.GET.get("file"), top=ANALYSIS_MAX_ROWS)
+    except Exception as e:
+        logger.exception("Aggregate: failed to load dataset: %s", e)
+        return Response({"error": f"Failed to load dataset: {str(e)}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+    try:
+        positions = select_query(df, query, top=None)[2] if normalize_query(query) else None
+        result = aggregate_by(df, metrics, aggs, group_by, positions)
+    except ValueError as e:
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    return Response(result, status=status.HTTP_200_OK)
+
+
+def _int_param(request, name: str) -> Optional[int]:
+    raw = request.GET.get(name)
+    return int(raw) if raw not in (None, "") else None
+
+
+@api_view(["GET", "POST"])
+def datasets_view(request):
+    """
+    GET /api/datasets/ lists the registered multi-file datasets.
+    POST /api/datasets/ with JSON {"name": "pune", "paths": ["/tmp/pune_2022.csv", ...]} groups
+    files (e.g. uploaded paths, one per city and year) into one logical dataset. Files are
+    converted and profiled in parallel worker processes before the response is sent.
+    """
+    if request.method == "GET":
+        return Response({"datasets": list_datasets()}, status=status.HTTP_200_OK)
+
+    name = str(request.data.get("name", "")).strip()
+    paths = request.data.get("paths") or []
+    if isinstance(paths, str):
+        paths = [p.strip() for p in paths.split(",") if p.strip()]
+    try:
+        manifest = register_dataset(name, paths)
+    except ValueError as e:
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    except Exception as e:
+        logger.exception("Failed to register dataset %s: %s", name, e)
+        return Response({"error": f"Failed to register dataset: {str(e)}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+    return Response(manifest, status=status.HTTP_201_CREATED)
+
+
+@api_view(["GET"])
+def dataset_query_view(request, name: str):
+    """
+    GET /api/datasets/<name>/?query=wakad&city=pune&year_from=2021&year_to=2023
+    Filter and aggregate across the partitions of a registered dataset. Partitions whose
+    recorded cities, years or localities cannot match are skipped without being opened. Aggregation
+    takes the /api/aggregate/ parameters (metrics, agg, group_by); the table the analyze ones
+    (offset, limit, columns, table_format). With limit=0, no query or city and per-year
+    mean/sum/count, the aggregate comes from the manifest summary and no partition is opened.
+    Without parameters the manifest is returned.
+    """
+    manifest = get_dataset(name)
+    if manifest is None:
+        return Response({"error": f"Unknown dataset '{name}'."}, status=status.HTTP_404_NOT_FOUND)
+    if not request.GET:
+        return Response(manifest, status=status.HTTP_200_OK)
+
+    query = normalize_query(request.GET.get("query", ""))
+    city = (request.GET.get("city") or "").strip() or None
+    try:
+        year_from, year_to = _int_param(request, "year_from"), _int_param(request, "year_to")
+        table_opts = _analyze_params(request)[4]
+    except ValueError:
+        return Response({"error": "year_from, year_to, offset and limit must be integers."}, status=status.HTTP_400_BAD_REQUEST)
 
-    table_json = df_filtered.fillna("").head(500).to_dict(orient="records")
+    metrics, aggs = _list_param(request, "metrics"), _list_param(request, "agg")
+    group_by = (request.GET.get("group_by") or "year").strip()
+    if not query and not city and group_by == "year" and table_opts["limit"] == 0:
+        # no rows wanted: whole-year sums, counts and means come from the manifest summary
+        try:
+            answered = summary_aggregate(manifest, metrics, aggs, year_from, year_to)
+            if answered is not None:
+                aggregate, rows, empty = answered
+                table, page = table_page(empty, **table_opts)
+                page.update(total=rows, next_offset=page["offset"] if page["offset"] < rows else None)
+                return Response(
+                    {
+                        "dataset": name,
+                        "rows": rows,
+                        "partitions": {"scanned": [], "pruned": [], "summary": True},
+                        "aggregate": aggregate,
+                        "table": table,
+                        "table_page": page,
+                    },
+                    status=status.HTTP_200_OK,
+                )
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
-    mode = "comparison" if (" vs " in query.lower() or "compare " in query.lower() or ("," in query and len([x for x in query.split(",") if x.strip()]) > 1)) else "single"
+    try:
+        df, partitions = federated_frame(manifest, query, city, year_from, year_to)
+    except Exception as e:
+        logger.exception("Dataset %s: query failed: %s", name, e)
+        return Response({"error": f"Failed to query dataset: {str(e)}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+    try:
+        aggregate = aggregate_by(df, metrics, aggs, group_by)
+        table, page = table_page(df, **table_opts)
+    except ValueError as e:
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
     return Response(
         {
-            "mode": mode,
-            "summary": summary_text,
-            "chart": chart,
-            "table": table_json,
-            "query": query,
+            "dataset": name,
+            "rows": len(df),
+            "partitions": partitions,
+            "aggregate": aggregate,
+            "table": table,
+            "table_page": page,
         },
         status=status.HTTP_200_OK,
     )
 
 
+def _batch_params(data) -> Tuple[List[str], int, bool, Optional[str], Dict[str, Any]]:
+    """
+    Parse the JSON body of a batch request: the query list plus the analyze options, which
+    apply to every query. Raises ValueError for a missing or oversized list and malformed numbers.
+    """
+    queries = data.get("queries") if isinstance(data, dict) else None
+    if isinstance(queries, str):
+        queries = [queries]
+    if not isinstance(queries, list) or not queries:
+        raise ValueError("'queries' must be a non-empty list of query strings.")
+    if len(queries) > ANALYZE_BATCH_MAX_QUERIES:
+        raise ValueError(f"At most {ANALYZE_BATCH_MAX_QUERIES} queries per batch.")
+    use_llm = str(data.get("use_llm", "false")).lower() in ("1", "true", "yes") and bool(os.getenv("OPENAI_API_KEY"))
+    columns = data.get("columns") or []
+    if isinstance(columns, str):
+        columns = columns.split(",")
+    table_opts = {
+        "offset": int(data.get("offset", 0)),
+        "limit": int(data.get("limit", 500)),
+        "columns": [str(c).strip() for c in columns if str(c).strip()] or None,
+        "fmt": str(data.get("table_format", "records")).lower(),
+    }
+    return [normalize_query(str(q)) for q in queries], int(data.get("top", 200)), use_llm, data.get("file"), table_opts
+
+
+def _build_batch(df: pd.DataFrame, queries: List[str], top: int, table_opts: Dict[str, Any]) -> Dict[str, Tuple[Dict[str, Any], pd.DataFrame]]:
+    """
+    _build_analysis for several distinct queries on one dataset. The charts of every selection,
+    and of every locality of the comparison queries, come from a single aggregate_selections call.
+    Returns {query: (payload without summary, filtered rows)}.
+    """
+    with stage("select"):
+        selected = {query: select_query(df, query, top=top) for query in queries}
+        filtered = {query: rows_at(df, positions) for query, (_, _, positions) in selected.items()}
+
+    with stage("aggregate"):
+        selections = [positions for _, _, positions in selected.values()]
+        compared = [rows for _, localities, _ in selected.values() for _, rows in localities]
+        charts = aggregate_selections(df, selections + compared, price_col="price", demand_col="demand")
+        locality_charts = iter(charts[len(selections):])
+        for (_, localities, _), chart in zip(selected.values(), charts):
+            if localities:
+                chart["comparison"] = align_comparison(localities, [next(locality_charts) for _ in localities])
+
+    built = {}
+    with stage("table"):
+        for (query, (mode, _, _)), chart in zip(selected.items(), charts):
+            table, page = table_page(filtered[query], **table_opts)
+            built[query] = ({
+                "mode": mode,
+                "summary": None,
+                "chart": chart,
+                "table": table,
+                "table_page": page,
+                "query": query,
+                "did_you_mean": did_you_mean(df, query),
+            }, filtered[query])
+    return built
+
+
+def _get_batch_llm_executor() -> ThreadPoolExecutor:
+    global _batch_llm_executor
+    with _analysis_executor_lock:
+        if _batch_llm_executor is None:
+            _batch_llm_executor = ThreadPoolExecutor(max_workers=max(1, ANALYZE_BATCH_LLM_CONCURRENCY), thread_name_prefix="batch-llm")
+        return _batch_llm_executor
+
+
+def _batch_llm_summaries(built: Dict[str, Tuple[Dict[str, Any], pd.DataFrame]]) -> Dict[str, Optional[str]]:
+    """
+    LLM summaries of a batch, requested concurrently on the shared batch pool, so at most
+    ANALYZE_BATCH_LLM_CONCURRENCY calls per process are in flight. Failed ones are None.
+    """
+    executor = _get_batch_llm_executor()
+    futures = {
+        query: executor.submit(generate_llm_summary, _llm_prompt(payload["chart"], len(df_filtered), query))
+        for query, (payload, df_filtered) in built.items()
+    }
+    summaries: Dict[str, Optional[str]] = {}
+    for query, future in futures.items():
+        try:
+            summaries[query] = future.result()
+        except Exception as e:
+            logger.exception("LLM generation failed for '%s': %s", query, e)
+            summaries[query] = None
+    return summaries
+
+
+@instrumented("analyze_batch")
+@api_view(["POST"])
+def analyze_batch_view(request):
+    """
+    POST /api/analyze/batch/ with JSON {"queries": ["wakad", "compare aundh and baner", ...], "file": <path>}
+    Analyzes many queries against one dataset at once, e.g. the locality cards of a dashboard.
+    top, use_llm, offset, limit, columns and table_format are accepted as for /api/analyze/ and
+    apply to every query. The dataset is loaded once, all charts come from one grouped
+    aggregation and LLM summaries run concurrently (ANALYZE_BATCH_LLM_CONCURRENCY at most).
+    Returns {"results": [...], "cached": n}: one /api/analyze/ body per query in request order.
+    Results share the /api/analyze/ response cache, so cards seen before are not recomputed.
+    """
+    try:
+        queries, top, use_llm, file_path, table_opts = _batch_params(request.data)
+    except (TypeError, ValueError) as e:
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    distinct = list(dict.fromkeys(queries))
+    payloads: Dict[str, Dict[str, Any]] = {}
+    with stage("cache"):
+        cache_keys = {query: _analyze_cache_key(query, top, use_llm, file_path, table_opts) for query in distinct}
+        for query, cache_key in cache_keys.items():
+            cached = response_cache.get(cache_key) if cache_key else None
+            if cached:
+                payloads[query] = cached[1]
+    missing = [query for query in distinct if query not in payloads]
+
+    if missing:
+        try:
+            with stage("load"):
+                df = load_dataset_from_path(file_path, top=ANALYSIS_MAX_ROWS)
+        except Exception as e:
+            logger.exception("Failed to load dataset: %s", e)
+            return Response({"error": f"Failed to load dataset: {str(e)}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+        try:
+            built = _build_batch(df, missing, top, table_opts)
+        except ValueError as e:
+            # invalid table options (unknown column, format)
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        except Exception as e:
+            logger.exception("Batch filtering failed: %s", e)
+            return Response({"error": f"Filtering failed: {str(e)}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+        summaries: Dict[str, Optional[str]] = {}
+        if use_llm:
+            with stage("llm"):
+                summaries = _batch_llm_summaries(built)
+        with stage("summary"):
+            for query, (payload, df_filtered) in built.items():
+                summary_text = summaries.get(query)
+                cacheable = bool(summary_text) or not use_llm
+                payload["summary"] = summary_text or make_summary(df_filtered, payload["chart"], query)
+                if cache_keys[query] and cacheable:
+                    response_cache.set(cache_keys[query], (make_etag(payload), payload))
+                payloads[query] = payload
+
+    return Response({"results": [payloads[query] for query in queries], "cached": len(distinct) - len(missing)}, status=status.HTTP_200_OK)
+
+
+@instrumented("download")
 @api_view(["GET"])
 def download_view(request):
     """
-    Simple CSV download endpoint (optional).
-    GET /api/download/?query=wakad&file=/tmp/...
-    Returns a CSV of the filtered rows (max 500 rows).
+    Streaming export of the filtered rows.
+    GET /api/download/?query=wakad&file=/tmp/...&limit=<n|all>&output=csv|csv.gz|ndjson|parquet
+    Rows are encoded and sent chunk by chunk, so large exports do not build the whole body in memory.
+    Server-Timing covers loading and selection; the encoding time goes to the "stream" histogram.
+    `limit` defaults to 500 rows; `limit=all` (or 0) exports every matching row.
     """
     query = request.GET.get("query", "")
     file_path = request.GET.get("file")
+    fmt = request.GET.get("output", "csv").lower()  # "format" is reserved by DRF content negotiation
+    limit_raw = request.GET.get("limit", "500").strip().lower()
+    try:
+        check_export_format(fmt)
+    except ValueError as e:
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        limit: Optional[int] = None if limit_raw in ("0", "all", "none") else int(limit_raw)
+    except ValueError:
+        return Response({"error": f"Invalid limit '{limit_raw}'."}, status=status.HTTP_400_BAD_REQUEST)
+    if limit is not None and limit < 1:
+        return Response({"error": f"Invalid limit '{limit_raw}'; it must be at least 1, or all."}, status=status.HTTP_400_BAD_REQUEST)
+
     try:
-        df = load_dataset_from_path(file_path, top=50000)
-        df_filtered = filter_by_area(df, query, top=500)
+        columnar = None if limit is not None and limit <= ANALYSIS_MAX_ROWS else fresh_columnar_path(resolve_dataset_path(file_path))
+        if columnar:
+            # larger exports of a converted file: rows are selected on its location columns and
+            # read chunk by chunk from the memory-mapped file, so the whole frame is never loaded
+            with stage("select"):
+                empty, positions = select_query_on_disk(columnar, query, top=limit)
+            chunks = stream_export_chunks(iter_columnar_rows(columnar, positions, EXPORT_CHUNK_ROWS, like=empty), empty, fmt)
+        else:
+            # the analysis-sized frame is usually cached already; a larger export of a raw upload
+            # reads every row once, without keeping the frame in the dataset cache
+            large = limit is None or limit > ANALYSIS_MAX_ROWS
+            with stage("load"):
+                df = load_dataset_from_path(file_path, top=None if large else ANALYSIS_MAX_ROWS, use_cache=not large)
+            with stage("select"):
+                _, _, positions = select_query(df, query, top=limit)
+            chunks = stream_export(df, positions, fmt)
     except Exception as e:
         logger.exception("Download: data load/filter failed: %s", e)
         return Response({"error": f"Failed to prepare download: {str(e)}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
-    # Convert to CSV bytes
-    try:
-        csv_bytes = df_filtered.head(500).to_csv(index=False).encode("utf-8")
-        resp = HttpResponse(csv_bytes, content_type="text/csv")
-        resp["Content-Disposition"] = f'attachment; filename="filtered_{query or "dataset"}.csv"'
-        return resp
-    except Exception as e:
-        logger.exception("Failed to build CSV: %s", e)
-        return Response({"error": f"Failed to build CSV: {str(e)}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+    content_type, extension = EXPORT_FORMATS[fmt]
+    resp = StreamingHttpResponse(chunks, content_type=content_type)
+    resp["Content-Disposition"] = f'attachment; filename="filtered_{query or "dataset"}.{extension}"'
+    return resp
 
 
 @api_view(["GET"])
@@ -150,27 +890,161 @@ def schema_view(request):
     """
     Minimal schema endpoint used by the front-end / docs.
     Returns a JSON object describing a few API endpoints, parameters and examples.
+    With ?file=<path> (or when the sample dataset exists) it also returns the detected
+    column roles and the numeric columns offered by the MetricSelector.
     """
     schema: Dict[str, Any] = {
         "endpoints": {
             "/api/upload/ (POST)": {
-                "description": "Upload CSV/XLSX file. Returns { path } to pass to analyze.",
+                "description": "Upload CSV/XLSX file. Returns { path, job_id }; pass path to analyze.",
                 "form_field": "file (multipart/form-data)",
+                "params": {"background": "true (default) to ingest in the background, false to wait"},
+            },
+            "/api/upload/status/ (GET)": {
+                "description": "Progress of an ingestion job: state, rows, progress, error.",
+                "params": {"job": "job_id returned by upload"},
             },
             "/api/analyze/ (GET)": {
                 "description": "Analyze dataset for a query (area).",
                 "params": {
-                    "query": "text query, e.g., 'Wakad' or 'Compare A,B'",
+                    "query": "text query, e.g., 'Wakad' or 'Compare A,B'; misspelled localities are matched (see did_you_mean)",
                     "top": "max rows to consider (int)",
                     "use_llm": "true/false - whether to call OpenAI (backend must have OPENAI_API_KEY)",
                     "file": "optional path returned by upload endpoint to analyze uploaded file",
+                    "offset": "first table row to return (default 0); table_page.next_offset gives the next page",
+                    "limit": "table rows per page (default 500)",
+                    "columns": "comma-separated table columns to return (default all)",
+                    "table_format": "records (default) or columnar: {columns, values: [one array per column]}",
                 },
+                "formats": "Accept: application/json (default), application/msgpack or application/vnd.apache.arrow.stream "
+                           "(table as an Arrow record batch, other fields as JSON in the schema metadata 'analysis')",
+                "headers": "responses carry an ETag; send If-None-Match to get 304 when unchanged",
                 "example": "/api/analyze/?query=wakad&use_llm=false",
             },
+            "/api/analyze/async/ (GET)": {
+                "description": "Same as /api/analyze/, as a native async view for ASGI deployments.",
+            },
+            "/api/analyze/stream/ (GET)": {
+                "description": "Same parameters as /api/analyze/, as Server-Sent Events: "
+                               "result (chart, table), token (summary text as it is generated), summary, done.",
+            },
+            "/api/analyze/batch/ (POST)": {
+                "description": "Analyze many queries against one dataset in one request; one analyze body per query.",
+                "body": {
+                    "queries": "list of queries, at most ANALYZE_BATCH_MAX_QUERIES",
+                    "file, top, use_llm, offset, limit, columns, table_format": "as for analyze, applied to every query",
+                },
+                "example": {"queries": ["wakad", "aundh", "compare baner and balewadi"], "limit": 20},
+            },
             "/api/download/ (GET)": {
-                "description": "Download filtered CSV",
-                "example": "/api/download/?query=wakad",
+                "description": "Stream the filtered rows as a file download",
+                "params": {
+                    "query": "same as analyze",
+                    "limit": "max rows (default 500); 'all' exports every matching row",
+                    "output": "csv (default), csv.gz, ndjson or parquet",
+                    "file": "optional path returned by upload endpoint",
+                },
+                "example": "/api/download/?query=wakad&limit=all&output=csv.gz",
+            },
+            "/api/geo/ (GET)": {
+                "description": "Per-locality map points (mean lat/lng, rows, average price, total demand).",
+                "params": {
+                    "bbox": "min_lat,min_lng,max_lat,max_lng",
+                    "near": "locality name; with radius_km (default 5) returns localities around it, nearest first",
+                    "lat, lng": "centre for a radius query instead of near",
+                    "limit": "max points returned",
+                    "file": "optional path returned by upload endpoint",
+                },
+                "example": "/api/geo/?near=wakad&radius_km=5",
+            },
+            "/api/aggregate/ (GET)": {
+                "description": "Several metrics x aggregation functions per year, locality or city, as aligned chart series.",
+                "params": {
+                    "metrics": "comma-separated numeric columns (default: detected price and demand columns)",
+                    "agg": "comma-separated: mean (default), sum, median, min, max, count or a percentile like p90",
+                    "group_by": "year (default), locality or city",
+                    "query": "optional; aggregate only the rows analyze would select for it",
+                    "file": "optional path returned by upload endpoint",
+                },
+                "example": "/api/aggregate/?metrics=flat - weighted average rate,total units&agg=mean,p90&group_by=locality",
+            },
+            "/api/datasets/ (GET, POST)": {
+                "description": "List registered multi-file datasets, or register one: JSON {name, paths: [file, ...]}.",
+            },
+            "/api/datasets/<name>/ (GET)": {
+                "description": "Filter and aggregate across a dataset's files; files that cannot match city/year are pruned.",
+                "params": {
+                    "query": "locality query, as for analyze",
+                    "city": "only rows (and files) of this city",
+                    "year_from, year_to": "inclusive year range",
+                    "metrics, agg, group_by": "as for /api/aggregate/",
+                    "offset, limit, columns, table_format": "table page, as for analyze",
+                },
+                "example": "/api/datasets/pune/?query=wakad&year_from=2022&agg=mean,p90",
+            },
+            "/api/cache/stats/ (GET)": {
+                "description": "Parsed-dataset cache counters for the worker that serves the request.",
+            },
+            "/api/memory/ (GET)": {
+                "description": "Per-column memory use of a loaded dataset and the savings of the memory-optimized mode (DATASET_COMPACT).",
+                "params": {"file": "optional path returned by upload endpoint"},
+            },
+            "/api/metrics/ (GET)": {
+                "description": "Per-stage latency histograms of analyze/download in the Prometheus text format (per worker).",
             },
         }
     }
+    try:
+        df = load_dataset_from_path(request.GET.get("file"), top=ANALYSIS_MAX_ROWS)
+        schema["dataset"] = profile_schema(df).as_dict()
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        logger.exception("Schema profiling failed: %s", e)
     return JsonResponse(schema, status=200)
+
+
+@api_view(["GET"])
+def cache_stats_view(request):
+    """
+    GET /api/cache/stats/
+    Returns hit/miss/eviction counters of the parsed-dataset cache.
+    Counters are per process, so each gunicorn worker reports its own (see "pid").
+    "llm_summary_cache" holds the LLM summary cache counters (hits, misses, coalesced, failures).
+    """
+    stats = dataset_cache.stats()
+    stats["llm_summary_cache"] = summary_cache.stats()
+    return Response(stats, status=status.HTTP_200_OK)
+
+
+@api_view(["GET"])
+def memory_view(request):
+    """
+    GET /api/memory/?file=<path>
+    Memory report of one dataset as the analyze endpoints load it: per-column dtype and bytes,
+    the compact dtype and bytes of the memory-optimized mode (DATASET_COMPACT=true) and the saving.
+    With the mode on the saving is measured against the frame as parsed; with it off each column
+    is compacted here to measure it. Memory-mapped columns (converted uploads) are shared between
+    workers and are reported as mapped_bytes. "cached" lists every frame held by this worker.
+    """
+    try:
+        df = load_dataset_from_path(request.GET.get("file"), top=ANALYSIS_MAX_ROWS)
+    except FileNotFoundError as e:
+        return Response({"error": str(e)}, status=status.HTTP_404_NOT_FOUND)
+    except Exception as e:
+        logger.exception("Failed to load dataset: %s", e)
+        return Response({"error": f"Failed to load dataset: {str(e)}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+    report = memory_report(df, loaded_usage(df))
+    report["cached"] = dataset_cache.entries()
+    return Response(report, status=status.HTTP_200_OK)
+
+
+@require_GET
+def metrics_view(request):
+    """
+    GET /api/metrics/
+    Stage latency histograms (load, select, aggregate, table, llm, summary, render, total, ...)
+    of the instrumented views in the Prometheus text format. Like the cache stats they are per process.
+    """
+    return HttpResponse(render_prometheus(), content_type="text/plain; version=0.0.4; charset=utf-8")
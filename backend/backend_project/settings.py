@@ -9,6 +9,8 @@ ALLOWED_HOSTS / CORS settings.
 from pathlib import Path
 import os
 
+from django.core.exceptions import ImproperlyConfigured
+
 # BASE_DIR points to backend_project's parent (the backend folder)
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -121,7 +123,8 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 # REST framework basic settings 
 REST_FRAMEWORK = {
     "DEFAULT_RENDERER_CLASSES": [
-        "rest_framework.renderers.JSONRenderer",
+        # orjson with NumPy support; falls back to DRF's JSONRenderer when orjson is missing
+        "analysis.renderers.ORJSONRenderer",
     ],
     "DEFAULT_PARSER_CLASSES": [
         "rest_framework.parsers.JSONParser",
@@ -130,6 +133,27 @@ REST_FRAMEWORK = {
     ],
 }
 
+# Cache framework - used by the shared analyze response cache (ANALYZE_CACHE_BACKEND=django).
+# Set REDIS_URL to share entries between gunicorn workers; otherwise each process has its own.
+REDIS_URL = os.getenv("REDIS_URL", "")
+if REDIS_URL:
+    try:
+        import redis  # noqa: F401
+    except ImportError as e:
+        raise ImproperlyConfigured("REDIS_URL is set but the 'redis' package is not installed (pip install -r requirements.txt).") from e
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        }
+    }
+
 # CORS settings - liberal for development
 
 if DEBUG:
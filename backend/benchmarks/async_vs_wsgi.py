@@ -0,0 +1,165 @@
+# backend/benchmarks/async_vs_wsgi.py
+"""
+Throughput of the sync analyze view (WSGI, a fixed number of sync workers) against the
+async view (ASGI, one event loop) when every request waits on a slow LLM.
+Requests are fed straight into the project's WSGI and ASGI application objects
+(Django's test AsyncClient handles one request at a time, which would hide the difference).
+
+    cd backend
+    python -m benchmarks.async_vs_wsgi --requests 60 --llm-delay 0.5 --wsgi-workers 3
+
+The LLM is a local stub server, so no API key or network access is needed.
+"""
+import os
+import sys
+import time
+import asyncio
+import argparse
+import tempfile
+from io import BytesIO
+from urllib.parse import urlencode
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from .stub_llm import start_stub_llm, StubLLMHandler
+
+
+def _write_dataset(rows: int) -> str:
+    rng = np.random.default_rng(0)
+    localities = [f"Locality {i}" for i in range(20)]
+    df = pd.DataFrame({
+        "final location": rng.choice(localities, rows),
+        "year": rng.integers(2015, 2025, rows),
+        "flat - weighted average rate": rng.uniform(4000, 15000, rows).round(2),
+        "total sold - igr": rng.integers(0, 500, rows),
+    })
+    path = os.path.join(tempfile.gettempdir(), f"bench_async_{rows}.csv")
+    df.to_csv(path, index=False)
+    return path
+
+
+def _setup_django(llm_url: str) -> None:
+    os.environ["OPENAI_API_KEY"] = os.environ.get("OPENAI_API_KEY") or "sk-benchmark"
+    os.environ["OPENAI_BASE_URL"] = llm_url
+    # measure the views, not the response cache
+    os.environ["ANALYZE_CACHE_BACKEND"] = "off"
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "backend_project.settings")
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    import django
+
+    django.setup()
+
+
+def _params(path: str, i: int) -> dict:
+    # an empty query selects the first `top` rows, so every request builds a distinct prompt
+    return {"query": "", "top": 100 + i, "file": path, "use_llm": "true"}
+
+
+def _wsgi_get(application, path: str, params: dict) -> int:
+    environ = {
+        "REQUEST_METHOD": "GET", "PATH_INFO": path, "QUERY_STRING": urlencode(params), "SCRIPT_NAME": "",
+        "SERVER_NAME": "localhost", "SERVER_PORT": "80", "SERVER_PROTOCOL": "HTTP/1.1", "HTTP_HOST": "localhost",
+        "wsgi.version": (1, 0), "wsgi.url_scheme": "http", "wsgi.input": BytesIO(b""), "wsgi.errors": sys.stderr,
+        "wsgi.multithread": True, "wsgi.multiprocess": False, "wsgi.run_once": False,
+    }
+    status = []
+    body = application(environ, lambda s, headers, exc_info=None: status.append(s))
+    for _ in body:
+        pass
+    if hasattr(body, "close"):
+        body.close()
+    return int(status[0].split(" ", 1)[0])
+
+
+async def _asgi_get(application, path: str, params: dict) -> int:
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET", "scheme": "http",
+        "path": path, "raw_path": path.encode(), "query_string": urlencode(params).encode(), "root_path": "",
+        "headers": [(b"host", b"localhost")], "client": ("127.0.0.1", 0), "server": ("localhost", 80),
+    }
+    received = False
+    status = []
+
+    async def receive():
+        nonlocal received
+        if not received:
+            received = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        await asyncio.Event().wait()  # the client never disconnects
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            status.append(message["status"])
+
+    await application(scope, receive, send)
+    return status[0]
+
+
+def run_wsgi(path: str, n: int, workers: int) -> float:
+    from backend_project.wsgi import application
+    from analysis.llm_cache import summary_cache
+
+    summary_cache.clear()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as ex:
+        codes = list(ex.map(lambda i: _wsgi_get(application, "/api/analyze/", _params(path, i)), range(n)))
+    elapsed = time.perf_counter() - start
+    assert all(c == 200 for c in codes), codes
+    return elapsed
+
+
+def run_asgi(path: str, n: int, concurrency: int) -> float:
+    from backend_project.asgi import application
+    from analysis.llm_cache import summary_cache
+
+    summary_cache.clear()
+
+    async def main() -> list:
+        limit = asyncio.Semaphore(concurrency)
+
+        async def one(i: int) -> int:
+            async with limit:
+                return await _asgi_get(application, "/api/analyze/async/", _params(path, i))
+
+        return await asyncio.gather(*(one(i) for i in range(n)))
+
+    start = time.perf_counter()
+    codes = asyncio.run(main())
+    elapsed = time.perf_counter() - start
+    assert all(c == 200 for c in codes), codes
+    return elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=60)
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--llm-delay", type=float, default=0.5, help="seconds the stub LLM takes per call")
+    parser.add_argument("--wsgi-workers", type=int, default=3, help="sync workers (Procfile uses 3)")
+    parser.add_argument("--asgi-concurrency", type=int, default=64, help="in-flight requests on the event loop")
+    args = parser.parse_args()
+
+    server = start_stub_llm(delay=args.llm_delay)
+    _setup_django(f"http://127.0.0.1:{server.server_port}/v1")
+    path = _write_dataset(args.rows)
+
+    from analysis.utils import load_dataset_from_path
+    from analysis.ingest import ANALYSIS_MAX_ROWS
+
+    load_dataset_from_path(path, top=ANALYSIS_MAX_ROWS)  # both paths start from a warm dataset cache
+
+    results = {}
+    for name, run, width in (("wsgi", run_wsgi, args.wsgi_workers), ("asgi", run_asgi, args.asgi_concurrency)):
+        calls_before = StubLLMHandler.calls
+        elapsed = run(path, args.requests, width)
+        results[name] = elapsed
+        print(f"{name:5s} {args.requests} requests in {elapsed:6.2f}s  "
+              f"{args.requests / elapsed:7.2f} req/s  (concurrency {width}, {StubLLMHandler.calls - calls_before} LLM calls)")
+    print(f"asgi/wsgi throughput: {results['wsgi'] / results['asgi']:.1f}x")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,257 @@
+# backend/benchmarks/pipeline.py
+"""
+Timings of the load -> filter -> aggregate -> serialize pipeline on synthetic IGR-shaped
+datasets (the 28 columns of sample_data/uploaded.csv, many localities, cities and years).
+
+    cd backend
+    python -m benchmarks.pipeline --sizes 10k,100k,1m --output bench.json
+    python -m benchmarks.pipeline --sizes 10k,100k,1m --compare bench.json   # exit 1 on a slowdown
+
+Every stage runs --repeat times; the JSON records min / median / max seconds per stage and size.
+With --compare a stage is flagged when its median is more than --threshold slower than in the
+baseline file (stages faster than --min-seconds in both runs are ignored as noise).
+Generated files are kept in --data-dir and reused by later runs.
+"""
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+import statistics
+import subprocess
+import tempfile
+from typing import Callable, Dict, Any, List, Optional
+
+import numpy as np
+import pandas as pd
+
+COLUMNS = [
+    "final location", "year", "city", "loc_lat", "loc_lng",
+    "total_sales - igr", "total sold - igr", "flat_sold - igr", "office_sold - igr", "others_sold - igr",
+    "shop_sold - igr", "commercial_sold - igr", "other_sold - igr", "residential_sold - igr",
+    "flat - weighted average rate", "office - weighted average rate", "others - weighted average rate",
+    "shop - weighted average rate", "flat - most prevailing rate - range", "office - most prevailing rate - range",
+    "others - most prevailing rate - range", "shop - most prevailing rate - range", "total units",
+    "total carpet area supplied (sqft)", "flat total", "shop total", "office total", "others total",
+]
+CITIES = {"Pune": (18.52, 73.86), "Mumbai": (19.08, 72.88), "Nagpur": (21.15, 79.09), "Nashik": (20.00, 73.79)}
+NAMED_LOCALITIES = ["Wakad", "Aundh", "Akurdi", "Ambegaon Budruk", "Hinjewadi", "Baner", "Kharadi", "Hadapsar"]
+QUERIES = ["Give me analysis of Wakad", "Compare Ambegaon Budruk and Aundh demand trends", "Show price growth for Locality 0042"]
+GENERATE_CHUNK_ROWS = 250_000
+
+_SIZE_SUFFIXES = {"k": 1_000, "m": 1_000_000}
+
+
+def parse_size(text: str) -> int:
+    text = text.strip().lower()
+    if text[-1:] in _SIZE_SUFFIXES:
+        return int(float(text[:-1]) * _SIZE_SUFFIXES[text[-1]])
+    return int(text)
+
+
+def _range_strings(rng: np.random.Generator, rate: np.ndarray) -> pd.Series:
+    low = (rate * rng.uniform(0.85, 0.95, len(rate))).astype(np.int64).astype(str)
+    high = (rate * rng.uniform(1.05, 1.15, len(rate))).astype(np.int64).astype(str)
+    return pd.Series(low) + "-" + pd.Series(high)
+
+
+def _chunk(rng: np.random.Generator, n: int, n_localities: int) -> pd.DataFrame:
+    names = NAMED_LOCALITIES + [f"Locality {i:04d}" for i in range(max(0, n_localities - len(NAMED_LOCALITIES)))]
+    loc = rng.integers(0, len(names), n)
+    city_names = list(CITIES)
+    city = loc % len(city_names)
+    centre = np.array([CITIES[c] for c in city_names])[city]
+    # every locality has a fixed position around its city's centre
+    offset = np.stack([np.sin(loc * 12.9898), np.cos(loc * 78.233)], axis=1) * 0.15
+
+    sold = {k: rng.integers(0, 400, n) for k in ("flat", "office", "others", "shop")}
+    rate = {k: rng.uniform(lo, hi, n) for k, (lo, hi) in
+            {"flat": (4000, 15000), "office": (6000, 20000), "others": (3000, 14000), "shop": (8000, 25000)}.items()}
+    total_sold = sum(sold.values())
+    data = {
+        "final location": np.array(names, dtype=object)[loc],
+        "year": rng.integers(2010, 2025, n),
+        "city": np.array(city_names, dtype=object)[city],
+        "loc_lat": centre[:, 0] + offset[:, 0],
+        "loc_lng": centre[:, 1] + offset[:, 1],
+        "total_sales - igr": (total_sold * rate["flat"] * 900).round(0),
+        "total sold - igr": total_sold,
+        "flat_sold - igr": sold["flat"],
+        "office_sold - igr": sold["office"],
+        "others_sold - igr": sold["others"],
+        "shop_sold - igr": sold["shop"],
+        "commercial_sold - igr": sold["office"] + sold["shop"],
+        "other_sold - igr": np.where(rng.random(n) < 0.1, np.nan, rng.integers(0, 20, n)),
+        "residential_sold - igr": sold["flat"] + sold["others"],
+        **{f"{k} - weighted average rate": rate[k] for k in rate},
+        **{f"{k} - most prevailing rate - range": _range_strings(rng, rate[k]) for k in rate},
+        "total units": total_sold + rng.integers(0, 800, n),
+        "total carpet area supplied (sqft)": rng.uniform(1e5, 4e6, n).round(5),
+        "flat total": sold["flat"] + rng.integers(0, 500, n),
+        "shop total": sold["shop"] + rng.integers(0, 100, n),
+        "office total": sold["office"] + rng.integers(0, 100, n),
+        "others total": sold["others"] + rng.integers(0, 100, n),
+    }
+    return pd.DataFrame(data, columns=COLUMNS)
+
+
+def generate_dataset(rows: int, data_dir: str, n_localities: int = 500, seed: int = 0) -> str:
+    """
+    Write (or reuse) a synthetic CSV of `rows` rows with the sample data's 28 columns.
+    """
+    path = os.path.join(data_dir, f"igr_{rows}_{n_localities}_{seed}.csv")
+    if os.path.exists(path):
+        return path
+    os.makedirs(data_dir, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    tmp_path = path + ".tmp"
+    written = 0
+    while written < rows:
+        n = min(GENERATE_CHUNK_ROWS, rows - written)
+        _chunk(rng, n, n_localities).to_csv(tmp_path, mode="a" if written else "w", header=not written, index=False)
+        written += n
+    os.replace(tmp_path, path)
+    return path
+
+
+def _setup_django() -> None:
+    # measure the pipeline, not the response cache or an LLM
+    os.environ["ANALYZE_CACHE_BACKEND"] = "off"
+    os.environ.pop("OPENAI_API_KEY", None)
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "backend_project.settings")
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    import django
+
+    django.setup()
+
+
+def _time(fn: Callable[[], Any], repeat: int) -> Dict[str, Any]:
+    runs = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        runs.append(time.perf_counter() - start)
+    return {"min": min(runs), "median": statistics.median(runs), "max": max(runs), "runs": len(runs)}
+
+
+def bench_size(path: str, repeat: int, top: int) -> Dict[str, Dict[str, Any]]:
+    """
+    Time every pipeline stage on one dataset file.
+    """
+    from django.test import Client
+    from analysis.ingest import convert_to_columnar, columnar_path_for, derived_path_for, ANALYSIS_MAX_ROWS
+    from analysis.utils import (
+        load_dataset_from_path, filter_by_area, extract_area_from_query_using_values,
+        aggregate_for_chart, make_summary, dataset_cache,
+    )
+
+    def drop_columnar() -> None:
+        for stale in (columnar_path_for(path), derived_path_for(columnar_path_for(path))):
+            if os.path.exists(stale):
+                os.remove(stale)
+
+    stages: Dict[str, Dict[str, Any]] = {}
+    dataset_cache.clear()
+    drop_columnar()  # a converted file from an earlier run would be read instead of the CSV
+    stages["load_raw"] = _time(lambda: load_dataset_from_path(path, top=None, use_cache=False), repeat)
+    stages["convert_columnar"] = _time(lambda: (drop_columnar(), convert_to_columnar(path)), 1)
+    stages["load_columnar"] = _time(lambda: load_dataset_from_path(path, top=None, use_cache=False), repeat)
+    stages["load_cached"] = _time(lambda: load_dataset_from_path(path, top=ANALYSIS_MAX_ROWS), repeat)
+
+    df = load_dataset_from_path(path, top=ANALYSIS_MAX_ROWS)
+    query = QUERIES[0]
+    stages["extract_area"] = _time(lambda: extract_area_from_query_using_values(df, query), repeat)
+    stages["filter_by_area"] = _time(lambda: filter_by_area(df, query, top=top), repeat)
+    filtered = filter_by_area(df, query, top=top)
+    stages["aggregate_for_chart"] = _time(lambda: aggregate_for_chart(filtered), repeat)
+    chart = aggregate_for_chart(filtered)
+    stages["make_summary"] = _time(lambda: make_summary(filtered, chart, query), repeat)
+
+    client = Client()
+    for i, q in enumerate(QUERIES):
+        def request(q=q) -> None:
+            resp = client.get("/api/analyze/", {"query": q, "top": top, "file": path, "use_llm": "false"})
+            assert resp.status_code == 200, resp.content[:200]
+        stages[f"analyze_request_{i}"] = _time(request, repeat)
+    return stages
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL, text=True).strip()
+    except Exception:
+        return None
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], threshold: float, min_seconds: float) -> List[Dict[str, Any]]:
+    """
+    Stages whose median got more than `threshold` (0.1 = 10%) slower than in the baseline.
+    """
+    regressions = []
+    for size, stages in current["results"].items():
+        for stage, timing in stages.items():
+            before = baseline.get("results", {}).get(size, {}).get(stage)
+            if before is None or max(before["median"], timing["median"]) < min_seconds:
+                continue
+            ratio = timing["median"] / before["median"] if before["median"] else float("inf")
+            if ratio > 1 + threshold:
+                regressions.append({"rows": size, "stage": stage, "before": before["median"], "after": timing["median"], "ratio": round(ratio, 3)})
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="10k,100k,1m", help="comma-separated row counts (10k ... 5m)")
+    parser.add_argument("--localities", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--top", type=int, default=200, help="top passed to filter_by_area and /api/analyze/")
+    parser.add_argument("--data-dir", default=os.path.join(tempfile.gettempdir(), "analysis_bench"))
+    parser.add_argument("--output", help="write results to this JSON file")
+    parser.add_argument("--compare", help="baseline JSON from an earlier run")
+    parser.add_argument("--threshold", type=float, default=0.10, help="allowed slowdown before a stage is flagged")
+    parser.add_argument("--min-seconds", type=float, default=0.002, help="ignore stages faster than this")
+    args = parser.parse_args()
+
+    _setup_django()
+    results: Dict[str, Any] = {}
+    for rows in (parse_size(s) for s in args.sizes.split(",") if s.strip()):
+        start = time.perf_counter()
+        path = generate_dataset(rows, args.data_dir, args.localities)
+        print(f"{rows:>9,d} rows  dataset ready in {time.perf_counter() - start:.1f}s ({path})")
+        results[str(rows)] = bench_size(path, args.repeat, args.top)
+        for stage, timing in results[str(rows)].items():
+            print(f"{'':11s}{stage:22s} median {timing['median'] * 1000:10.2f} ms   min {timing['min'] * 1000:10.2f} ms")
+
+    report = {
+        "meta": {
+            "timestamp": time.time(),
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "pandas": pd.__version__,
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "repeat": args.repeat,
+            "localities": args.localities,
+            "top": args.top,
+        },
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as fh:
+            json.dump(report, fh, indent=2)
+        print(f"results written to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as fh:
+            baseline = json.load(fh)
+        regressions = compare(report, baseline, args.threshold, args.min_seconds)
+        for r in regressions:
+            print(f"SLOWER  {int(r['rows']):>9,d} rows  {r['stage']:22s} {r['before'] * 1000:9.2f} ms -> {r['after'] * 1000:9.2f} ms  ({r['ratio']:.2f}x)")
+        if regressions:
+            sys.exit(1)
+        print(f"no stage slower than {args.threshold:.0%} against {args.compare}")
+
+
+if __name__ == "__main__":
+    main()
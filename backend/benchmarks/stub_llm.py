@@ -0,0 +1,76 @@
+# backend/benchmarks/stub_llm.py
+import json
+import time
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+
+class StubLLMHandler(BaseHTTPRequestHandler):
+    """
+    Minimal OpenAI-compatible /v1/chat/completions endpoint that answers after a fixed delay.
+    The next `failures` calls answer 500 instead, to exercise error handling.
+    """
+
+    delay = 0.5
+    calls = 0
+    failures = 0
+    _lock = threading.Lock()
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        with self._lock:
+            type(self).calls += 1
+            fail = type(self).failures > 0
+            if fail:
+                type(self).failures -= 1
+        time.sleep(self.delay)
+        if fail:
+            data = json.dumps({"error": {"message": "stub failure", "type": "server_error"}}).encode("utf-8")
+            self.send_response(500)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+            return
+        prompt = body.get("messages", [{}])[-1].get("content", "")
+        text = f"Stub summary of a {len(prompt)}-character prompt."
+        if body.get("stream"):
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.end_headers()
+            for word in text.split(" "):
+                chunk = {
+                    "id": "stub", "object": "chat.completion.chunk", "created": 0, "model": body.get("model"),
+                    "choices": [{"index": 0, "delta": {"content": word + " "}, "finish_reason": None}],
+                }
+                self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+                self.wfile.flush()
+            self.wfile.write(b"data: [DONE]\n\n")
+            return
+        data = json.dumps({
+            "id": "stub", "object": "chat.completion", "created": 0, "model": body.get("model"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+        }).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+def start_stub_llm(delay: float = 0.5, port: int = 0) -> ThreadingHTTPServer:
+    """
+    Serve the stub on 127.0.0.1 in a daemon thread; point OPENAI_BASE_URL at
+    f"http://127.0.0.1:{server.server_port}/v1".
+    """
+    StubLLMHandler.delay = delay
+    StubLLMHandler.calls = 0
+    StubLLMHandler.failures = 0
+    server = ThreadingHTTPServer(("127.0.0.1", port), StubLLMHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
@@ -4,6 +4,8 @@ import UploadPanel from "./components/UploadPanel";
 import QueryBar from "./components/QueryBar";
 import ResultsPanel from "./components/ResultsPanel";
 
+const TABLE_PAGE_ROWS = 25;
+
 function App() {
   const [filePath, setFilePath] = useState(null); // path returned by upload endpoint
   const [query, setQuery] = useState("");
@@ -12,18 +14,51 @@ function App() {
   const [result, setResult] = useState(null);
   const [errorMsg, setErrorMsg] = useState("");
 
+  // LLM summaries are streamed: chart and table render first, then the summary as it is written
+  const runStreamingAnalysis = (params) => {
+    const source = new EventSource(`/api/analyze/stream/?${params.toString()}`);
+    let received = false;
+    source.addEventListener("result", (e) => {
+      received = true;
+      setResult({ ...JSON.parse(e.data), summary: "" });
+      setLoading(false);
+    });
+    source.addEventListener("token", (e) => {
+      const { text } = JSON.parse(e.data);
+      setResult((r) => (r ? { ...r, summary: (r.summary || "") + text } : r));
+    });
+    source.addEventListener("summary", (e) => {
+      const { summary } = JSON.parse(e.data);
+      setResult((r) => (r ? { ...r, summary } : r));
+    });
+    source.addEventListener("done", () => source.close());
+    source.onerror = () => {
+      source.close();
+      if (!received) {
+        setErrorMsg("Streaming analysis failed.");
+        setLoading(false);
+      }
+    };
+  };
+
   // helper to call analyze endpoint
   const runAnalysis = async (q = query) => {
     setErrorMsg("");
     setLoading(true);
     setResult(null);
-    try {
-      const params = new URLSearchParams();
-      params.append("query", q || "");
-      params.append("top", "200");
-      params.append("use_llm", useLLM ? "true" : "false");
-      if (filePath) params.append("file", filePath);
+    const params = new URLSearchParams();
+    params.append("query", q || "");
+    params.append("top", "200");
+    params.append("use_llm", useLLM ? "true" : "false");
+    if (filePath) params.append("file", filePath);
+    params.append("table_format", "columnar");
+    params.append("limit", String(TABLE_PAGE_ROWS));
 
+    if (useLLM && typeof EventSource !== "undefined") {
+      runStreamingAnalysis(params);
+      return;
+    }
+    try {
       const resp = await fetch(`/api/analyze/?${params.toString()}`, {
         headers: {
           Accept: "application/json",
@@ -61,6 +96,30 @@ function App() {
     }
   };
 
+  // fetch another page of the table (only the displayed columns) and keep the chart and summary
+  const loadTablePage = async (offset, columns) => {
+    if (!result) return;
+    const params = new URLSearchParams();
+    params.append("query", result.query || "");
+    params.append("top", "200");
+    if (filePath) params.append("file", filePath);
+    params.append("table_format", "columnar");
+    params.append("limit", String(TABLE_PAGE_ROWS));
+    params.append("offset", String(offset));
+    if (columns && columns.length) params.append("columns", columns.join(","));
+    try {
+      const resp = await fetch(`/api/analyze/?${params.toString()}`, { headers: { Accept: "application/json" } });
+      if (!resp.ok) {
+        setErrorMsg(`Failed to load rows: ${(await resp.text()).slice(0, 300)}`);
+        return;
+      }
+      const data = await resp.json();
+      setResult((r) => (r ? { ...r, table: data.table, table_page: data.table_page } : r));
+    } catch (e) {
+      setErrorMsg(e.message || String(e));
+    }
+  };
+
   // when filePath changes, re-runs last query (if present)
   useEffect(() => {
     if (filePath && query) {
@@ -95,6 +154,7 @@ function App() {
             result={result}
             errorMsg={errorMsg}
             onReRun={() => runAnalysis()}
+            onTablePage={loadTablePage}
             filePath={filePath}
             query={query}
           />
@@ -46,6 +46,7 @@ export default function MetricSelector({ numericColumns = [], value = {}, onChan
           <select value={aggregateBy} onChange={(e) => onChange({ selectedMetrics, chartType, aggregateBy: e.target.value })} className="form-select form-select-sm" style={{ width: 160, display: "inline-block" }}>
             <option value="year">year</option>
             <option value="total">total (per location)</option>
+            <option value="city">city</option>
           </select>
         </div>
       </div>
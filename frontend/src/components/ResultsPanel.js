@@ -1,7 +1,24 @@
 import React, { useMemo } from "react";
 import ChartView from "./ChartView";
+import MultiSeriesLine from "./MultiSeriesLine";
+import MultiBarChart from "./MultiBarChart";
 
-export default function ResultsPanel({ result, errorMsg, onReRun, filePath, query }) {
+// the table arrives as records ([{col: value}]) or columnar ({columns, values: [one array per column]})
+function tableToRows(table) {
+  if (!table) return [];
+  if (Array.isArray(table)) return table;
+  const { columns = [], values = [] } = table;
+  const n = values.length ? values[0].length : 0;
+  const rows = [];
+  for (let i = 0; i < n; i++) {
+    const row = {};
+    columns.forEach((c, j) => { row[c] = values[j][i]; });
+    rows.push(row);
+  }
+  return rows;
+}
+
+export default function ResultsPanel({ result, errorMsg, onReRun, onTablePage, filePath, query }) {
   // Use environment variable or default to localhost:8000
   const API_URL = process.env.REACT_APP_API_URL || "http://localhost:8000";
 
@@ -17,11 +34,18 @@ export default function ResultsPanel({ result, errorMsg, onReRun, filePath, quer
     };
   }, [result]);
 
+  // one series per locality for comparison queries
+  const comparison = result && result.chart ? result.chart.comparison : null;
+
   const tableRows = useMemo(() => {
     if (!result || !result.table) return [];
-    return result.table;
+    return tableToRows(result.table);
   }, [result]);
 
+  const page = result ? result.table_page : null;
+  const shownColumns = tableRows.length > 0 ? Object.keys(tableRows[0]).slice(0, 8) : [];
+  const total = page ? page.total : tableRows.length;
+
   return (
     <div>
       {errorMsg && (
@@ -67,25 +91,51 @@ export default function ResultsPanel({ result, errorMsg, onReRun, filePath, quer
         </div>
       )}
 
+      {comparison && comparison.price && comparison.price.length > 0 && (
+        <div className="card">
+          <h3 className="card-title">Price comparison</h3>
+          <MultiSeriesLine labels={comparison.labels} series={comparison.price} options={{ xLabel: "Year", yLabel: "Average Price" }} />
+        </div>
+      )}
+
+      {comparison && comparison.demand && comparison.demand.length > 0 && (
+        <div className="card">
+          <h3 className="card-title">Demand comparison</h3>
+          <MultiBarChart labels={comparison.labels} series={comparison.demand} />
+        </div>
+      )}
+
       {tableRows && tableRows.length > 0 && (
         <div className="card">
-          <h3 className="card-title">Filtered rows ({tableRows.length})</h3>
+          <h3 className="card-title">Filtered rows ({total})</h3>
           <div className="table-wrap">
             <table className="results-table">
               <thead>
                 <tr>
-                  {Object.keys(tableRows[0]).slice(0, 8).map((h) => <th key={h}>{h}</th>)}
+                  {shownColumns.map((h) => <th key={h}>{h}</th>)}
                 </tr>
               </thead>
               <tbody>
                 {tableRows.slice(0, 25).map((r, idx) => (
                   <tr key={idx}>
-                    {Object.keys(tableRows[0]).slice(0, 8).map((k) => <td key={k}>{String(r[k] ?? "")}</td>)}
+                    {shownColumns.map((k) => <td key={k}>{String(r[k] ?? "")}</td>)}
                   </tr>
                 ))}
               </tbody>
             </table>
-            {tableRows.length > 25 && <div className="muted">Showing first 25 rows.</div>}
+            {page && onTablePage ? (
+              <div className="muted">
+                Rows {page.offset + 1}–{page.offset + tableRows.length} of {page.total}{" "}
+                {page.offset > 0 && (
+                  <button className="btn btn-ghost" onClick={() => onTablePage(Math.max(0, page.offset - page.limit), shownColumns)}>Previous</button>
+                )}
+                {page.next_offset != null && (
+                  <button className="btn btn-ghost" onClick={() => onTablePage(page.next_offset, shownColumns)}>Next</button>
+                )}
+              </div>
+            ) : (
+              tableRows.length > 25 && <div className="muted">Showing first 25 rows.</div>
+            )}
           </div>
         </div>
       )}
@@ -10,6 +10,26 @@ export default function UploadPanel({ onUpload }) {
     setStatus("");
   };
 
+  // poll the background ingestion job started by the upload
+  const pollJob = async (jobId) => {
+    for (;;) {
+      await new Promise((r) => setTimeout(r, 1000));
+      const resp = await fetch(`/api/upload/status/?job=${encodeURIComponent(jobId)}`);
+      if (!resp.ok) return;
+      const job = await resp.json();
+      if (job.state === "done") {
+        setStatus(`Upload successful. ${job.rows} rows indexed.`);
+        return;
+      }
+      if (job.state === "failed") {
+        setStatus(`Upload saved, but indexing failed: ${job.error}`);
+        return;
+      }
+      const pct = job.progress != null ? ` (${Math.round(job.progress * 100)}%)` : "";
+      setStatus(`Upload successful. Indexing ${job.rows} rows${pct}…`);
+    }
+  };
+
   const upload = async () => {
     if (!file) {
       setStatus("Please choose a file first.");
@@ -34,6 +54,9 @@ export default function UploadPanel({ onUpload }) {
         if (j.path) {
           setStatus("Upload successful.");
           onUpload(j.path);
+          if (j.job_id && j.status === "accepted") {
+            pollJob(j.job_id).catch(() => {});
+          }
         } else {
           setStatus("Upload succeeded (no path returned).");
         }